@@ -0,0 +1,199 @@
+import math
+import faiss
+import numpy as np
+from config import (
+    INDEX_TYPE,
+    ANN_AUTO_TYPE,
+    ANN_THRESHOLD,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    IVF_NLIST,
+    IVF_NPROBE,
+    PQ_BYTES,
+    INDEX_METRIC
+)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+METRICS = ("l2", "cosine")
+MIN_TRAIN_PER_LIST = 39  # FAISS k-means wants ~39 points per centroid
+PQ_CODEBOOK_SIZE = 256   # 8-bit sub-quantizers need 256 training points each
+
+
+def ivf_nlist(num_vectors: int) -> int:
+    """Inverted lists for ``num_vectors``: configured, or ~4*sqrt(n) rounded to a power of two."""
+    if IVF_NLIST:
+        nlist = IVF_NLIST
+    else:
+        nlist = 2 ** round(math.log2(max(1, 4 * math.sqrt(num_vectors))))
+    return max(1, min(nlist, num_vectors // MIN_TRAIN_PER_LIST))
+
+
+def resolve_index_type(num_vectors: int, index_type: str = INDEX_TYPE) -> str:
+    """Pick the concrete index type for an index of ``num_vectors`` vectors.
+
+    ``"auto"`` stays exact below ``ANN_THRESHOLD``. IVF types fall back to
+    flat until there are enough vectors to train them.
+    """
+    if index_type == "auto":
+        index_type = ANN_AUTO_TYPE if num_vectors >= ANN_THRESHOLD else "flat"
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type!r}")
+
+    if index_type == "ivf_flat" and num_vectors < MIN_TRAIN_PER_LIST:
+        return "flat"
+    if index_type == "ivf_pq" and num_vectors < PQ_CODEBOOK_SIZE * MIN_TRAIN_PER_LIST:
+        return "flat"
+    return index_type
+
+
+def index_type_of(index) -> str:
+    """Concrete type name of an existing FAISS index."""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def metric_of(index) -> str:
+    """``"cosine"`` for inner-product indexes (vectors stored normalized), else ``"l2"``."""
+    return "cosine" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+
+
+def prepare_vectors(vectors, metric: str) -> np.ndarray:
+    """Vectors as a float32 matrix, rows L2-normalized for ``"cosine"`` (a copy)."""
+    vectors = np.array(vectors, dtype=np.float32, order="C", ndmin=2)
+    if metric == "cosine":
+        faiss.normalize_L2(vectors)  # Zero rows are left as-is
+    return vectors
+
+
+def similarities(index, raw: np.ndarray) -> np.ndarray:
+    """FAISS search scores as similarities (higher is better), elementwise.
+
+    Cosine indexes already return cosine similarity; L2 distances map to
+    ``1 / (1 + distance)``.
+    """
+    if metric_of(index) == "cosine":
+        return raw
+    return 1.0 / (1.0 + np.maximum(raw, 0.0))
+
+
+def range_radius(index, threshold: float) -> float:
+    """``range_search`` radius that keeps results with similarity >= ``threshold``."""
+    if metric_of(index) == "cosine":
+        return threshold
+    return 1.0 / threshold - 1.0
+
+
+def build_index(vectors: np.ndarray, index_type: str, metric: str = INDEX_METRIC):
+    """Create, train and fill a FAISS index of ``index_type``.
+
+    ``metric="cosine"`` builds an inner-product index; callers pass vectors
+    through ``prepare_vectors`` first so scores are cosine similarities.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown index metric: {metric!r}")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dim = vectors.shape
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == "cosine" else faiss.METRIC_L2
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim) if metric == "cosine" else faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss_metric)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif index_type == "ivf_flat":
+        index = faiss.index_factory(dim, f"IVF{ivf_nlist(num_vectors)},Flat", faiss_metric)
+    elif index_type == "ivf_pq":
+        if dim % PQ_BYTES:
+            raise ValueError(f"PQ_BYTES={PQ_BYTES} must divide the embedding dim {dim}")
+        index = faiss.index_factory(dim, f"IVF{ivf_nlist(num_vectors)},PQ{PQ_BYTES}", faiss_metric)
+    else:
+        raise ValueError(f"Unknown index type: {index_type!r}")
+
+    if not index.is_trained:
+        index.train(vectors)
+    if num_vectors:
+        index.add(vectors)
+    apply_search_params(index)
+    return index
+
+
+def apply_search_params(index):
+    """Set query-time knobs (nprobe / efSearch); FAISS doesn't persist all of them."""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(IVF_NPROBE, index.nlist)
+
+
+def all_vectors(index) -> np.ndarray:
+    """Read every stored vector back (exact for flat/HNSW/IVF-Flat, decoded for PQ)."""
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def needs_rebuild(index) -> bool:
+    """True when the configured type (or IVF list count) no longer fits the index size."""
+    current = index_type_of(index)
+    wanted = resolve_index_type(index.ntotal)
+    # Hysteresis: don't fall back to flat until well under the threshold
+    if wanted == "flat" and current != "flat" and index.ntotal >= ANN_THRESHOLD // 2:
+        return False
+    if current != wanted:
+        return True
+    # Re-cluster once the corpus has outgrown its inverted lists
+    if isinstance(index, faiss.IndexIVF) and not IVF_NLIST:
+        return ivf_nlist(index.ntotal) >= index.nlist * 4
+    return False
+
+
+def rebuild_if_needed(vectorstore):
+    """Switch a LangChain FAISS store to the configured index type for its size.
+
+    Vectors are re-added in the same order, so ``index_to_docstore_id`` stays
+    valid, and the index keeps its metric.
+    """
+    index = vectorstore.index
+    if not needs_rebuild(index):
+        return False
+
+    wanted = resolve_index_type(index.ntotal)
+    print(f"🏗️ Rebuilding index: {index_type_of(index)} → {wanted} ({index.ntotal} vectors)")
+    vectorstore.index = build_index(all_vectors(index), wanted, metric_of(index))
+    return True
+
+
+def delete_ids(vectorstore, ids: list[str]) -> list[int]:
+    """Delete chunks by id for any index type, keeping FAISS labels == store positions.
+
+    Returns the removed positions, so position-keyed side indexes can follow.
+
+    Flat indexes compact on ``remove_ids`` in order, like the chunk store.
+    HNSW can't remove at all and IVF keeps stale labels, so those are
+    refilled from their remaining vectors (training is kept).
+    """
+    store = vectorstore.docstore
+    doomed = {store.position_of(chunk_id) for chunk_id in ids}
+    keep = [p for p in range(len(store)) if p not in doomed]
+
+    if index_type_of(vectorstore.index) == "flat":
+        vectorstore.index.remove_ids(np.fromiter(doomed, dtype=np.int64))
+    else:
+        remaining = all_vectors(vectorstore.index)[keep]
+        index = faiss.clone_index(vectorstore.index)
+        index.reset()
+        if len(remaining):
+            index.add(remaining)
+        apply_search_params(index)
+        vectorstore.index = index
+
+    store.keep_positions(keep)
+    return sorted(doomed)
@@ -0,0 +1,211 @@
+import re
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from metrics import CACHE_LOOKUPS
+from config import (
+    ANSWER_CACHE_SIMILARITY,
+    ANSWER_CACHE_TTL_S,
+    ANSWER_CACHE_MAX_ENTRIES
+)
+
+
+# Terms that change a question's answer while barely moving its embedding
+KEY_TERM = re.compile(r"\d+(?:[.,:/-]\d+)*|\b(?:not|no|never|none|without|except|neither|nor)\b|n't\b")
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form, ignoring trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+
+def key_terms(question: str) -> tuple:
+    """Numbers, dates and negations in ``question``; near-duplicates must share them."""
+    return tuple(sorted(KEY_TERM.findall(normalize_question(question))))
+
+
+class _ScopeVectors:
+    """Unit question vectors of one cache scope, as rows of one matrix.
+
+    A semantic lookup is a single matrix-vector product over the scope's
+    entries instead of a Python loop over the whole cache. Removal moves
+    the last row into the hole, so the matrix stays dense.
+    """
+
+    def __init__(self, dim: int):
+        self.matrix = np.empty((16, dim), dtype=np.float32)
+        self.keys = []
+        self.rows = {}  # key -> row
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key, vector: np.ndarray):
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.matrix):
+                grown = np.empty((2 * row, self.matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self.matrix
+                self.matrix = grown
+            self.rows[key] = row
+            self.keys.append(key)
+        self.matrix[row] = vector
+
+    def remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        last = self.keys.pop()
+        if row < len(self.keys):
+            self.matrix[row] = self.matrix[len(self.keys)]
+            self.keys[row] = last
+            self.rows[last] = row
+
+    def above(self, vector: np.ndarray, threshold: float) -> list:
+        """Keys whose cosine with ``vector`` is at least ``threshold``, best first."""
+        if not self.keys or vector.shape[0] != self.matrix.shape[1]:
+            return []
+        scores = self.matrix[:len(self.keys)] @ vector
+        rows = np.flatnonzero(scores >= threshold)
+        return [self.keys[r] for r in rows[np.argsort(-scores[rows], kind="stable")]]
+
+
+class AnswerCache:
+    """Process-wide cache of LLM answers for repeated and near-duplicate questions.
+
+    Entries are keyed by a scope (namespace, index version, document filter)
+    plus the normalized question. Lookups try the exact key first, then the
+    closest cached question embedding in the same scope above
+    ``ANSWER_CACHE_SIMILARITY`` (cosine) that has the same numbers, dates
+    and negations (``key_terms``): "fees in 2023" vs. "fees in 2024" embed
+    almost identically but must not share an answer. A new index version
+    for a namespace drops that namespace's older entries.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl_s: float = ANSWER_CACHE_TTL_S,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.similarity = similarity
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (scope, question) -> entry dict
+        self._vectors = {}             # scope -> _ScopeVectors of its entries
+        self._versions = {}            # namespace -> latest index version seen
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def scope(namespace: str, version: float, doc_ids: list[str] = None) -> tuple:
+        return namespace, version, tuple(sorted(doc_ids or ()))
+
+    def _unit(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop_stale_versions(self, scope: tuple):
+        namespace, version = scope[0], scope[1]
+        if self._versions.get(namespace) == version:
+            return
+        self._versions[namespace] = version
+        for key in [k for k in self._entries if k[0][0] == namespace and k[0][1] != version]:
+            self._remove(key)
+
+    def _remove(self, key):
+        del self._entries[key]
+        vectors = self._vectors.get(key[0])
+        if vectors is not None:
+            vectors.remove(key)
+            if not len(vectors):
+                del self._vectors[key[0]]
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return now - entry["created"] > self.ttl_s
+
+    def lookup(self, scope: tuple, question: str, embedding=None):
+        """Return a cached entry (``answer``, ``type``, ``sources``) or None."""
+        key = (scope, normalize_question(question))
+        now = time.time()
+        with self._lock:
+            self._drop_stale_versions(scope)
+
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry, now):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                CACHE_LOOKUPS.inc(cache="answer", result="hit")
+                return entry
+
+            vectors = self._vectors.get(scope)
+            if embedding is not None and self.similarity < 1.0 and vectors is not None:
+                terms = key_terms(question)
+                for candidate in vectors.above(self._unit(embedding), self.similarity):
+                    entry = self._entries[candidate]
+                    if entry["terms"] == terms and not self._expired(entry, now):
+                        self._entries.move_to_end(candidate)
+                        self.semantic_hits += 1
+                        CACHE_LOOKUPS.inc(cache="answer", result="hit")
+                        return entry
+
+            self.misses += 1
+            CACHE_LOOKUPS.inc(cache="answer", result="miss")
+            return None
+
+    def store(self, scope: tuple, question: str, embedding, answer: str,
+              answer_type: str, sources: list = None):
+        """Cache an answer; the least recently used entries go once the cache is full."""
+        key = (scope, normalize_question(question))
+        with self._lock:
+            self._drop_stale_versions(scope)
+            vector = self._unit(embedding)
+            self._entries[key] = {
+                "answer": answer,
+                "type": answer_type,
+                "sources": sources or [],
+                "terms": key_terms(question),
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            if scope not in self._vectors:
+                self._vectors[scope] = _ScopeVectors(len(vector))
+            self._vectors[scope].add(key, vector)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, namespace: str = None):
+        """Drop all entries, or just one namespace's."""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                self._vectors.clear()
+            else:
+                for key in [k for k in self._entries if k[0][0] == namespace]:
+                    self._remove(key)
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Return the process-wide answer cache."""
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache()
+        return _answer_cache
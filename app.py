@@ -1,9 +1,22 @@
 import streamlit as st
 import os
-from pdf_processor import PDFProcessor
-from vector_store import VectorStore
-from rag_chain import RAGChain
+import html
+import re
+import time
+import threading
+import uuid
 from styles import get_custom_css
+from session_indexes import SESSION_PREFIX, prune_session_indexes
+from config import (
+    LLM_BACKEND,
+    PREWARM_MODELS,
+    CHAT_RENDER_RECENT,
+    CHAT_HISTORY_MAX,
+    NAMESPACE_PATTERN,
+    SESSION_CLEANUP_INTERVAL_S
+)
+
+INGEST_POLL_S = 0.5  # Rerun interval while an upload is being ingested
 
 # Page configuration
 st.set_page_config(
@@ -16,6 +29,49 @@ st.set_page_config(
 # Apply custom CSS first to hide toggle
 st.markdown(get_custom_css(), unsafe_allow_html=True)
 
+# LangChain, FAISS and the embedding model are imported on first use (or by
+# the prewarm thread), so the upload screen renders before they are loaded
+def warm_up_models():
+    """Import the RAG stack and load the shared embedding model."""
+    start = time.perf_counter()
+    try:
+        import rag_chain, ingest_jobs  # noqa: F401
+        from embeddings import warmup_embeddings
+        warmup_embeddings()
+    except Exception as e:
+        # Not fatal: whatever failed is retried (and reported) on first use
+        print(f"⚠️ Prewarm failed: {e}")
+        return
+    print(f"🔥 Models prewarmed in {time.perf_counter() - start:.1f}s")
+
+@st.cache_resource(show_spinner=False)
+def start_prewarm():
+    """Warm up once per server process in the background; the page doesn't wait."""
+    thread = threading.Thread(target=warm_up_models, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+def prune_sessions_forever():
+    """Delete expired anonymous session indexes, now and every interval after."""
+    while True:
+        try:
+            prune_session_indexes()
+        except Exception as e:
+            print(f"⚠️ Session index cleanup failed: {e}")
+        time.sleep(SESSION_CLEANUP_INTERVAL_S)
+
+@st.cache_resource(show_spinner=False)
+def start_session_cleanup():
+    """One cleanup thread per server process."""
+    thread = threading.Thread(target=prune_sessions_forever, name="session-cleanup", daemon=True)
+    thread.start()
+    return thread
+
+def ingest_queue():
+    """The shared ingest queue (imports PDF parsing and FAISS on first call)."""
+    from ingest_jobs import get_ingest_queue
+    return get_ingest_queue()
+
 # Initialize session state
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
@@ -23,6 +79,26 @@ if "pdf_uploaded" not in st.session_state:
     st.session_state.pdf_uploaded = False
 if "rag_chain" not in st.session_state:
     st.session_state.rag_chain = None
+if "memory" not in st.session_state:
+    st.session_state.memory = None  # ConversationMemory, created with the first question
+if "answer_cancel" not in st.session_state:
+    st.session_state.answer_cancel = None
+if "active_doc_ids" not in st.session_state:
+    st.session_state.active_doc_ids = []
+if "ingest_job_id" not in st.session_state:
+    st.session_state.ingest_job_id = None
+if "namespace" not in st.session_state:
+    # ?tenant=<name> shares an index across a tenant's sessions; otherwise
+    # each browser session gets its own so concurrent uploads never collide
+    tenant = st.experimental_get_query_params().get("tenant", [None])[0]
+    if tenant:
+        namespace = f"tenant-{tenant}"
+        if not re.fullmatch(NAMESPACE_PATTERN, namespace):
+            st.error("❌ Invalid tenant name: use letters, digits, '-' and '_' (up to 90 characters)")
+            st.stop()
+        st.session_state.namespace = namespace
+    else:
+        st.session_state.namespace = f"{SESSION_PREFIX}{uuid.uuid4().hex}"
 
 def main():
     # Header
@@ -46,7 +122,7 @@ def main():
         
         if uploaded_file is not None:
             # Show file info
-            file_size_mb = len(uploaded_file.getvalue()) / (1024 * 1024)
+            file_size_mb = uploaded_file.size / (1024 * 1024)
             st.write(f"📎 **{uploaded_file.name}**")
             st.write(f"📊 Size: {file_size_mb:.2f} MB")
             
@@ -55,6 +131,8 @@ def main():
             else:
                 if st.button("🔄 Process PDF", type="primary"):
                     process_pdf(uploaded_file)
+
+        ingest_running = render_ingest_progress()
         
         st.markdown("---")
         
@@ -76,8 +154,28 @@ def main():
         
         st.markdown("---")
         
+        # Indexed documents: scope retrieval or remove a document
+        if st.session_state.rag_chain is not None:
+            documents = st.session_state.rag_chain.vector_store.list_documents()
+            if documents:
+                st.markdown("### 📚 Indexed Documents")
+                st.session_state.active_doc_ids = st.multiselect(
+                    "Search in (empty = all documents)",
+                    options=list(documents),
+                    default=[d for d in st.session_state.active_doc_ids if d in documents],
+                    format_func=lambda doc_id: documents[doc_id]["name"]
+                )
+                for doc_id, info in documents.items():
+                    if st.button(f"🗑️ {info['name']}", key=f"remove_{doc_id}"):
+                        st.session_state.rag_chain.vector_store.remove_document(doc_id)
+                        st.session_state.pdf_uploaded = len(documents) > 1
+                        st.experimental_rerun()
+                st.markdown("---")
+        
         if st.button("🗑️ Clear Chat History"):
             st.session_state.chat_history = []
+            if st.session_state.memory is not None:
+                st.session_state.memory.clear()
             st.experimental_rerun()
     
     # Main chat interface
@@ -87,22 +185,17 @@ def main():
         # Chat container
         st.markdown('<div class="chat-container">', unsafe_allow_html=True)
         
-        # Display chat history
-        if st.session_state.chat_history:
-            for message in st.session_state.chat_history:
-                if message["role"] == "user":
-                    st.markdown(f"""
-                    <div class="user-message">
-                        <strong>You:</strong> {message["content"]}
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    response_class = "pdf-response" if message["type"] == "pdf" else "general-response"
-                    st.markdown(f"""
-                    <div class="bot-message {response_class}">
-                        <strong>Assistant:</strong> {message["content"]}
-                    </div>
-                    """, unsafe_allow_html=True)
+        # Display chat history: only recent messages are drawn on every rerun
+        history = st.session_state.chat_history
+        if history:
+            earlier, recent = history[:-CHAT_RENDER_RECENT], history[-CHAT_RENDER_RECENT:]
+            if earlier and st.checkbox(f"Show {len(earlier)} earlier messages"):
+                # One element for all of them, without their sources
+                st.markdown("".join(m["html"] for m in earlier), unsafe_allow_html=True)
+            for message in recent:
+                st.markdown(message["html"], unsafe_allow_html=True)
+                if message.get("sources"):
+                    render_sources(message["sources"])
         else:
             st.markdown("""
             <div style="text-align: center; padding: 2rem; color: #666;">
@@ -125,88 +218,172 @@ def main():
         if submit_button and question:
             handle_chat(question)
 
+    # Poll the background ingest instead of blocking this session on it
+    if ingest_running:
+        time.sleep(INGEST_POLL_S)
+        st.experimental_rerun()
+
+def render_sources(sources):
+    """Show compact citations; expanding one highlights the stored chunk text."""
+    from context_builder import merge_chunks
+    with st.expander(f"📎 Sources ({len(sources)})"):
+        vector_store = st.session_state.rag_chain.vector_store
+        for ref in sources:
+            pages = f"page {ref['page']}"
+            if ref.get("page_end") and ref["page_end"] != ref["page"]:
+                pages = f"pages {ref['page']}–{ref['page_end']}"
+            st.markdown(f"**[{ref['ref']}] {ref.get('name') or ref['doc_id']}** — {pages}")
+            # A cited passage may be several merged chunks; show their text once
+            last = ref.get("chunk_end", ref["chunk_index"])
+            chunks = [vector_store.get_chunk(ref["doc_id"], i) for i in range(ref["chunk_index"], last + 1)]
+            for passage in merge_chunks([(chunk, 0.0) for chunk in chunks if chunk is not None]):
+                # PDF text is untrusted: escape it before it goes into HTML
+                st.markdown(f"<mark>{html.escape(passage.text)}</mark>", unsafe_allow_html=True)
+
 def process_pdf(uploaded_file):
-    """Process the uploaded PDF file."""
+    """Queue the uploaded PDF for background ingestion."""
     try:
         # Check file size (limit to 10MB)
-        file_size = len(uploaded_file.getvalue())
-        if file_size > 10 * 1024 * 1024:  # 10MB limit
+        pdf_bytes = uploaded_file.getvalue()
+        if len(pdf_bytes) > 10 * 1024 * 1024:  # 10MB limit
             st.error("❌ File too large! Please upload a PDF smaller than 10MB.")
             return
         
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        with st.spinner("🔄 Processing PDF..."):
-            # Step 1: Extract text (30% progress)
-            status_text.text("📄 Extracting text from PDF...")
-            pdf_processor = PDFProcessor()
-            text = pdf_processor.extract_text_from_pdf(uploaded_file)
-            progress_bar.progress(30)
-            
-            # Check if text is too short
-            if len(text.strip()) < 100:
-                st.error("❌ PDF contains very little text. Please upload a text-based PDF.")
-                return
-            
-            # Step 2: Create chunks (50% progress)
-            status_text.text("✂️ Creating text chunks...")
-            chunks = pdf_processor.create_chunks(text)
-            progress_bar.progress(50)
-            
-            # Step 3: Create vector store (80% progress)
-            status_text.text("🔍 Creating search database...")
-            vector_store = VectorStore()
-            vector_store.create_vectorstore(chunks)
-            progress_bar.progress(80)
-            
-            # Step 4: Initialize RAG chain (100% progress)
-            status_text.text("🤖 Initializing AI...")
-            st.session_state.rag_chain = RAGChain()
-            st.session_state.pdf_uploaded = True
-            progress_bar.progress(100)
-            
-            # Clear progress indicators
-            progress_bar.empty()
-            status_text.empty()
-            
-            st.success("✅ PDF processed successfully! You can now start chatting.")
-            st.balloons()  # Celebration effect
+        if st.session_state.rag_chain is None:
+            with st.spinner("🤖 Initializing AI..."):
+                from rag_chain import RAGChain
+                st.session_state.rag_chain = RAGChain(st.session_state.namespace)
+
+        # Extraction, chunking, embedding and indexing run on the shared
+        # ingest queue; the sidebar polls the job for progress
+        job = ingest_queue().submit(
+            st.session_state.namespace, uploaded_file.name, pdf_bytes
+        )
+        st.session_state.ingest_job_id = job.id
             
     except Exception as e:
         st.error(f"❌ Error processing PDF: {str(e)}")
-        # Reset state on error
-        st.session_state.pdf_uploaded = False
-        st.session_state.rag_chain = None
+        # Previously indexed documents are still usable
+        rag_chain = st.session_state.rag_chain
+        st.session_state.pdf_uploaded = bool(rag_chain and rag_chain.vector_store.documents)
         
         # Clean up any partial files
         if os.path.exists("./chroma_db"):
             import shutil
             shutil.rmtree("./chroma_db")
 
+def render_ingest_progress() -> bool:
+    """Show the session's ingest job; returns True while it is still running."""
+    job_id = st.session_state.ingest_job_id
+    job = ingest_queue().get(job_id) if job_id else None
+    if job is None:
+        return False
+
+    if not job.finished:
+        if job.stage == "indexing":
+            status = f"🗂️ Indexing {job.chunks_embedded} chunks..."
+        elif job.status == "queued":
+            status = "⏳ Waiting for a free ingest worker..."
+        else:
+            status = (f"🔍 Pages {job.pages_done}/{job.pages_total or '?'} · "
+                      f"{job.chunks_embedded} chunks embedded")
+        st.progress(job.fraction)
+        st.caption(status)
+        if st.button("⏹️ Cancel processing"):
+            ingest_queue().cancel(job.id)
+        return True
+
+    st.session_state.ingest_job_id = None
+    if job.status == "done":
+        st.session_state.pdf_uploaded = True
+        st.success("✅ PDF processed successfully! You can now start chatting.")
+        st.balloons()  # Celebration effect
+    elif job.status == "cancelled":
+        st.info("⏹️ Processing cancelled")
+    else:
+        st.error(f"❌ Error processing PDF: {job.error}")
+    return False
+
+def message_html(role: str, content: str, response_type: str = None) -> str:
+    """A chat message as HTML, built once when the message is added."""
+    if role == "user":
+        return f"""
+        <div class="user-message">
+            <strong>You:</strong> {content}
+        </div>
+        """
+    response_class = "pdf-response" if response_type == "pdf" else "general-response"
+    return f"""
+    <div class="bot-message {response_class}">
+        <strong>Assistant:</strong> {content}
+    </div>
+    """
+
+def add_message(message: dict):
+    """Append to the chat history, keeping at most ``CHAT_HISTORY_MAX`` messages."""
+    message["html"] = message_html(message["role"], message["content"], message.get("type"))
+    history = st.session_state.chat_history
+    history.append(message)
+    # Older turns live on in the conversation summary
+    del history[:-CHAT_HISTORY_MAX]
+
 def handle_chat(question):
     """Handle chat interaction."""
     if not st.session_state.pdf_uploaded:
         st.warning("⚠️ Please upload a PDF first!")
         return
     
+    if st.session_state.memory is None:
+        st.session_state.memory = st.session_state.rag_chain.new_memory()
+
     # Add user message to history
-    st.session_state.chat_history.append({
+    add_message({
         "role": "user",
         "content": question
     })
     
+    # Cancel any answer still streaming for this session
+    if st.session_state.answer_cancel is not None:
+        st.session_state.answer_cancel.set()
+    cancel_event = threading.Event()
+    st.session_state.answer_cancel = cancel_event
+    
     try:
-        with st.spinner("🤔 Thinking..."):
-            # Get response from RAG chain
-            response, response_type = st.session_state.rag_chain.answer_question(question)
-            
-            # Add assistant response to history
-            st.session_state.chat_history.append({
-                "role": "assistant",
-                "content": response,
-                "type": response_type
-            })
+        placeholder = st.empty()
+        response = ""
+        response_type = "general"
+        sources = []
+        
+        # Render tokens as they arrive instead of waiting for the full answer
+        # Follow-ups are rewritten from the conversation memory before retrieval
+        for kind, value in st.session_state.rag_chain.stream_answer(
+            question, cancel_event, doc_ids=st.session_state.active_doc_ids,
+            memory=st.session_state.memory
+        ):
+            if kind == "sources":
+                sources = value
+            elif kind == "token":
+                response += value
+                placeholder.markdown(f"""
+                <div class="bot-message">
+                    <strong>Assistant:</strong> {response}▌
+                </div>
+                """, unsafe_allow_html=True)
+            else:
+                response_type = value
+        
+        # A newer question took over; drop this partial answer
+        if cancel_event.is_set():
+            return
+        
+        # Add assistant response to history
+        add_message({
+            "role": "assistant",
+            "content": response,
+            "type": response_type,
+            "sources": sources
+        })
+        st.session_state.answer_cancel = None
             
         st.experimental_rerun()
         
@@ -215,9 +392,12 @@ def handle_chat(question):
 
 if __name__ == "__main__":
     # Check for Gemini API key
-    if not os.getenv("GEMINI_API_KEY"):
+    if LLM_BACKEND == "gemini" and not os.getenv("GEMINI_API_KEY"):
         st.error("❌ Please set your GEMINI_API_KEY in the .env file")
         st.info("Create a .env file with: GEMINI_API_KEY=your_api_key_here")
         st.stop()
     
+    start_session_cleanup()
+    if PREWARM_MODELS:
+        start_prewarm()
     main()
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""Recall@k vs. query latency for each index type against the exact flat baseline.
+
+Usage: python benchmarks/bench_ann_index.py --vectors 50000 --queries 500 --k 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from ann_index import INDEX_TYPES, build_index
+
+
+def synthetic_corpus(num_vectors: int, num_queries: int, dim: int, seed: int = 0):
+    """Clustered unit vectors, roughly like sentence embeddings of a document set."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(8, num_vectors // 500), dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), num_vectors + num_queries)
+    data = centers[labels] + 0.6 * rng.standard_normal((len(labels), dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data[:num_vectors], data[num_vectors:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus, queries = synthetic_corpus(args.vectors, args.queries, args.dim)
+    print(f"Corpus: {args.vectors} x {args.dim}, {args.queries} queries, k={args.k}")
+
+    truth = None
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = build_index(corpus, index_type)
+        build_s = time.perf_counter() - start
+
+        # One query at a time, like the chat path
+        start = time.perf_counter()
+        found = np.vstack([index.search(q[None, :], args.k)[1] for q in queries])
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        if truth is None:
+            truth = found  # Flat is first: exact ground truth
+        recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+        print(
+            f"{index_type:>8} | build {build_s:6.2f}s | "
+            f"{latency_ms:6.3f} ms/query | recall@{args.k} {recall:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
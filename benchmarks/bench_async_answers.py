@@ -0,0 +1,93 @@
+"""Concurrent questions: threads calling answer_question vs. asyncio.gather over aanswer_question.
+
+Runs offline against the stub LLM (LLM_BACKEND="stub"), and reports
+throughput plus how long calls waited on the process-wide LLM limiter.
+
+Usage: python benchmarks/bench_async_answers.py --questions 100 --rpm 600
+       python benchmarks/bench_async_answers.py --questions 100 --hash-embeddings  # no model download
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _build_chain(pages: int, latency: float, hash_embeddings: bool):
+    import embeddings as shared
+    import vector_store
+    import pdf_processor
+    from synthetic_pdf import make_pdf
+    from bench_ingest_throughput import _hash_embeddings
+    from stub_llm import StubChatModel
+    from rag_chain import RAGChain
+
+    shared.EMBEDDING_CACHE_ENABLED = False
+    if hash_embeddings:
+        shared._embeddings = _hash_embeddings()
+    vector_store.FAISS_INDEX_PATH = tempfile.mkdtemp()
+    pdf_processor.MAX_FILE_SIZE_MB = 1024
+
+    chain = RAGChain("bench", llm=StubChatModel(latency=latency))
+    chain.answer_cache = None  # Every question must reach retrieval and the LLM
+    processor = pdf_processor.PDFProcessor()
+    pages_iter = processor.iter_pages(io.BytesIO(make_pdf(pages)))
+    chain.vector_store.add_document(processor.iter_chunks(pages_iter), name="bench")
+    return chain
+
+
+def _reset_limiter(chain, inflight: int, rpm: int):
+    from llm import LLMLimiter
+    chain.limiter = LLMLimiter(max_inflight=inflight, requests_per_minute=rpm)
+    return chain.limiter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--inflight", type=int, default=32)
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute (0 = unlimited)")
+    parser.add_argument("--hash-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    questions = [f"What does clause {i} say about delivery {i % 13}?" for i in range(args.questions)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        chain = _build_chain(args.pages, args.llm_latency, args.hash_embeddings)
+
+        limiter = _reset_limiter(chain, args.inflight, args.rpm or None)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(chain.answer_question, questions))
+        thread_time = time.perf_counter() - start
+        thread_stats = limiter.stats()
+
+        async def run_async():
+            return await asyncio.gather(*(chain.aanswer_question(q) for q in questions))
+
+        limiter = _reset_limiter(chain, args.inflight, args.rpm or None)
+        start = time.perf_counter()
+        asyncio.run(run_async())
+        async_time = time.perf_counter() - start
+        async_stats = limiter.stats()
+
+    n = len(questions)
+    print(f" threads ({args.threads}): {n} questions | {thread_time:.2f}s | {n / thread_time:.1f} q/s "
+          f"| limiter wait {thread_stats['waited_s']:.1f}s")
+    print(f"  asyncio: {n} questions | {async_time:.2f}s | {n / async_time:.1f} q/s "
+          f"| limiter wait {async_stats['waited_s']:.1f}s")
+    print(f"  limits: {args.inflight} in flight, {args.rpm or 'unlimited'} requests/min, "
+          f"stub latency {args.llm_latency}s")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
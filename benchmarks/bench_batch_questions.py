@@ -0,0 +1,85 @@
+"""Bulk question answering: answer_question in a loop vs. one answer_questions call.
+
+The LLM is a local stub that sleeps ``--llm-latency`` seconds per call, so
+the numbers show retrieval batching plus LLM concurrency, not Gemini.
+
+Usage: python benchmarks/bench_batch_questions.py --questions 200
+       python benchmarks/bench_batch_questions.py --questions 200 --hash-embeddings  # offline
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _stub_llm(latency: float):
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+
+    def respond(prompt):
+        time.sleep(latency)
+        return AIMessage(content=f"Stub answer ({len(prompt.to_string())} prompt chars)")
+
+    return RunnableLambda(respond)
+
+
+def _build_chain(pages: int, latency: float, hash_embeddings: bool):
+    import embeddings as shared
+    import vector_store
+    import pdf_processor
+    from synthetic_pdf import make_pdf
+    from bench_ingest_throughput import _hash_embeddings
+    from rag_chain import RAGChain
+
+    shared.EMBEDDING_CACHE_ENABLED = False
+    if hash_embeddings:
+        shared._embeddings = _hash_embeddings()
+    vector_store.FAISS_INDEX_PATH = tempfile.mkdtemp()
+    pdf_processor.MAX_FILE_SIZE_MB = 1024
+
+    chain = RAGChain("bench", llm=_stub_llm(latency))
+    chain.answer_cache = None  # Every question must reach retrieval and the LLM
+    processor = pdf_processor.PDFProcessor()
+    pages_iter = processor.iter_pages(io.BytesIO(make_pdf(pages)))
+    chain.vector_store.add_document(processor.iter_chunks(pages_iter), name="bench")
+    return chain
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--hash-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    questions = [f"What does section {i} say about payment term {i % 17}?" for i in range(args.questions)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        chain = _build_chain(args.pages, args.llm_latency, args.hash_embeddings)
+
+        start = time.perf_counter()
+        looped = [chain.answer_question(q) for q in questions]
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = chain.answer_questions(questions, max_concurrency=args.concurrency)
+        batch_time = time.perf_counter() - start
+
+    errors = sum(1 for r in batched if r["error"])
+    same_type = sum(1 for (_, t), r in zip(looped, batched) if t == r["type"])
+    print(f"    loop: {len(questions)} questions | {loop_time:.2f}s | {len(questions) / loop_time:.1f} q/s")
+    print(f"   batch: {len(questions)} questions | {batch_time:.2f}s | {len(questions) / batch_time:.1f} q/s "
+          f"| {errors} errors | {same_type}/{len(questions)} same answer type")
+    print(f" speedup: {loop_time / batch_time:.1f}x (concurrency {args.concurrency}, "
+          f"LLM latency {args.llm_latency}s)")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,79 @@
+"""Prompt context: retrieved chunks stuffed verbatim vs. merged, de-duplicated and budget-packed.
+
+For each question the retrieved chunks become a prompt context both ways.
+Reported per setting: estimated context tokens (mean, max), how often the
+chunk holding the target line is still in the context, and build time.
+Fewer tokens at the same hit rate is the win: less LLM latency and cost.
+
+Usage: python benchmarks/bench_context_builder.py --pages 100 --queries 200
+       python benchmarks/bench_context_builder.py --hash-embeddings  # offline
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_hybrid_search import _build_store, _test_set
+
+
+def stuffed(relevant_docs, **_) -> str:
+    """The old context: every chunk verbatim, numbered."""
+    return "\n\n".join(
+        f"[{n}] (page {doc.metadata.get('page')})\n{doc.page_content}"
+        for n, (doc, _score) in enumerate(relevant_docs, start=1)
+    )
+
+
+def built(relevant_docs, **kwargs) -> str:
+    from context_builder import build_context
+    return build_context(relevant_docs, **kwargs)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--hybrid", action="store_true", help="Retrieve with HYBRID_SEARCH on")
+    parser.add_argument("--hash-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    import vector_store
+    from llm import estimate_tokens
+    from context_builder import merge_chunks
+    vector_store.HYBRID_SEARCH = args.hybrid
+    with contextlib.redirect_stdout(io.StringIO()):
+        store, text_pages = _build_store(args.pages, args.hash_embeddings)
+        tests = _test_set(text_pages, args.queries)
+        retrieved = [(store.similarity_search(q), line_id) for q, line_id in tests]
+    retrieved = [(docs, line_id) for docs, line_id in retrieved if docs]
+    print(f"{len(tests)} queries, {len(retrieved)} with results, "
+          f"{statistics.mean(len(d) for d, _ in retrieved):.1f} chunks each, "
+          f"{statistics.mean(len(merge_chunks(d)) for d, _ in retrieved):.1f} passages after merging")
+
+    settings = {"stuffed": (stuffed, {})}
+    for budget in (1000, 500, 250):
+        settings[f"built {budget}"] = (built, {"max_tokens": budget, "mmr_lambda": None})
+    settings["built 500 mmr 0.7"] = (built, {"max_tokens": 500, "mmr_lambda": 0.7})
+
+    for name, (fn, kwargs) in settings.items():
+        tokens, hits, elapsed = [], 0, 0.0
+        for docs, line_id in retrieved:
+            start = time.perf_counter()
+            context = fn(docs, **kwargs)
+            elapsed += time.perf_counter() - start
+            tokens.append(estimate_tokens(context))
+            hits += bool(re.search(rf"(^|\n){re.escape(line_id)} ", context))
+        print(
+            f"{name:>18} | tokens mean {statistics.mean(tokens):6.0f} max {max(tokens):5d} | "
+            f"target kept {hits / len(retrieved):4.0%} | {1e6 * elapsed / len(retrieved):6.0f} us/build"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Long conversations: per-turn cost with the bounded memory vs. replaying the full history.
+
+Answers a conversation of alternating standalone and follow-up questions
+against the stub LLM, with a ``ConversationMemory``. Reported per stretch
+of turns: time per turn, and the estimated tokens of conversation sent
+with each follow-up rewrite compared with sending the whole history. The
+memory's size should stay flat while the full history grows linearly.
+
+Usage: python benchmarks/bench_conversation_memory.py --turns 300
+       python benchmarks/bench_conversation_memory.py --hash-embeddings  # offline
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FOLLOW_UPS = ["What about clause {}?", "And the notice period in {}?", "Does that also apply to {}?"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--hash-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LLM_BACKEND", "stub")
+    from bench_async_answers import _build_chain
+    from llm import estimate_tokens
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        chain = _build_chain(args.pages, args.llm_latency, args.hash_embeddings)
+        chain.limiter.requests_per_minute = None
+        memory = chain.new_memory()
+
+        stats, full_history = [], 0
+        for turn in range(args.turns):
+            clause = f"{turn % args.pages + 1}.{turn % 7 + 1}"
+            question = (f"What does clause {clause} say about liability?" if turn % 2 == 0
+                        else FOLLOW_UPS[turn % len(FOLLOW_UPS)].format(clause))
+            memory_tokens = estimate_tokens(memory.render())
+            start = time.perf_counter()
+            answer, _ = chain.answer_question(question, memory=memory)
+            stats.append((time.perf_counter() - start, memory_tokens, full_history))
+            full_history += estimate_tokens(question + answer)
+
+    print(f"{args.turns} turns, window {memory.window_tokens} + summary {memory.summary_tokens} tokens")
+    stretch = max(1, args.turns // 5)
+    for first in range(0, args.turns, stretch):
+        rows = stats[first:first + stretch]
+        print(
+            f"turns {first + 1:>4}-{first + len(rows):<4} | {1000 * statistics.mean(r[0] for r in rows):6.2f} ms/turn | "
+            f"memory {statistics.mean(r[1] for r in rows):5.0f} tokens | "
+            f"full history {statistics.mean(r[2] for r in rows):7.0f} tokens"
+        )
+
+
+if __name__ == "__main__":
+    main()
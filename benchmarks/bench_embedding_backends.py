@@ -0,0 +1,132 @@
+"""torch (sentence-transformers) vs. int8 ONNX embeddings: speed, memory and retrieval agreement.
+
+Each backend runs in its own process (clean RSS) and embeds the chunks of
+a synthetic PDF plus a set of questions. Reported per backend: model load
+time, RSS after load and after embedding, chunks/sec for batched ingest,
+and single-query latency. Then the vectors are compared: cosine between
+backends per chunk, and top-k overlap of each question's results, both
+with each backend on its own index and with ONNX queries against an index
+built by torch (an existing index after switching backends).
+
+The first ONNX run exports and quantizes the model (needs torch once).
+
+Usage: python benchmarks/bench_embedding_backends.py --pages 50 --queries 200 --threads 4
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import psutil
+
+BACKENDS = ("torch", "onnx")
+
+
+def child(backend: str, pages: int, queries: int, out_dir: str):
+    """Runs in a subprocess so the other backend's libraries aren't loaded."""
+    import pdf_processor
+    from synthetic_pdf import make_pdf
+    from bench_hybrid_search import _test_set
+    from embeddings import _create_embeddings
+
+    pdf_processor.MAX_FILE_SIZE_MB = 1024
+    processor = pdf_processor.PDFProcessor()
+    text_pages = list(processor.iter_pages(io.BytesIO(make_pdf(pages))))
+    texts = [chunk.page_content for chunk in processor.iter_chunks(iter(text_pages))]
+    questions = [question for question, _ in _test_set(text_pages, queries)]
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+
+    start = time.perf_counter()
+    model = _create_embeddings(backend)
+    model.embed_query("warmup")
+    load_s = time.perf_counter() - start
+    rss_loaded = process.memory_info().rss
+
+    start = time.perf_counter()
+    vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+    ingest_s = time.perf_counter() - start
+
+    latencies = []
+    query_vectors = []
+    for question in questions:
+        start = time.perf_counter()
+        query_vectors.append(model.embed_query(question))
+        latencies.append(time.perf_counter() - start)
+
+    np.save(os.path.join(out_dir, f"{backend}-chunks.npy"), vectors)
+    np.save(os.path.join(out_dir, f"{backend}-queries.npy"), np.asarray(query_vectors, dtype=np.float32))
+    latencies.sort()
+    print(json.dumps({
+        "chunks": len(texts),
+        "load_s": load_s,
+        "chunks_per_s": len(texts) / ingest_s,
+        "query_p50_ms": 1000 * statistics.median(latencies),
+        "query_p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        "model_rss_mb": (rss_loaded - rss_before) / 1024 ** 2,
+        "peak_rss_mb": process.memory_info().rss / 1024 ** 2,
+    }))
+
+
+def top_k(index_vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    from ann_index import build_index, prepare_vectors
+    index = build_index(prepare_vectors(index_vectors, "cosine"), "flat", "cosine")
+    return index.search(prepare_vectors(queries, "cosine"), k)[1]
+
+
+def overlap(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean([len(set(x) & set(y)) / len(x) for x, y in zip(a, b)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX_THREADS for the onnx backend")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--child", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.pages, args.queries, args.out)
+        return
+
+    out_dir = tempfile.mkdtemp()
+    for backend in BACKENDS:
+        command = [sys.executable, os.path.abspath(__file__), "--child", backend, "--out", out_dir,
+                   "--pages", str(args.pages), "--queries", str(args.queries)]
+        env = {**os.environ, "ONNX_THREADS": str(args.threads)}
+        result = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        print(
+            f"{backend:>6} | load {stats['load_s']:5.1f}s | {stats['chunks_per_s']:7.1f} chunks/s | "
+            f"query p50 {stats['query_p50_ms']:6.2f} ms p95 {stats['query_p95_ms']:6.2f} ms | "
+            f"model RSS {stats['model_rss_mb']:6.0f} MB | peak {stats['peak_rss_mb']:6.0f} MB"
+        )
+
+    torch_chunks, onnx_chunks, torch_queries, onnx_queries = (
+        np.load(os.path.join(out_dir, f"{backend}-{kind}.npy"))
+        for kind in ("chunks", "queries") for backend in BACKENDS
+    )
+    torch_chunks, onnx_chunks = (v / np.linalg.norm(v, axis=1, keepdims=True) for v in (torch_chunks, onnx_chunks))
+    cosine = np.sum(torch_chunks * onnx_chunks, axis=1)
+    print(f"chunk cosine torch vs onnx: min {cosine.min():.4f}, mean {cosine.mean():.4f}")
+
+    reference = top_k(torch_chunks, torch_queries, args.k)
+    print(f"top-{args.k} overlap, onnx index + onnx queries: "
+          f"{overlap(reference, top_k(onnx_chunks, onnx_queries, args.k)):.3f}")
+    print(f"top-{args.k} overlap, torch index + onnx queries: "
+          f"{overlap(reference, top_k(torch_chunks, onnx_queries, args.k)):.3f}")
+
+
+if __name__ == "__main__":
+    main()
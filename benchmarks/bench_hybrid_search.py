@@ -0,0 +1,103 @@
+"""Dense vs. hybrid (dense + BM25, RRF) retrieval: query latency, fallback rate and hit rate.
+
+The test set mixes exact-identifier questions ("What does clause 12.7
+say?") with topical ones built from a line's words. A query "falls back"
+when no chunk passes the relevance filters (the general-knowledge path);
+a "hit" is when the chunk holding the target line is returned.
+
+Usage: python benchmarks/bench_hybrid_search.py --pages 100 --queries 200
+       python benchmarks/bench_hybrid_search.py --hash-embeddings  # offline
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _build_store(pages: int, hash_embeddings: bool):
+    import embeddings as shared
+    import vector_store
+    import pdf_processor
+    from synthetic_pdf import make_pdf
+    from bench_ingest_throughput import _hash_embeddings
+
+    shared.EMBEDDING_CACHE_ENABLED = False
+    if hash_embeddings:
+        shared._embeddings = _hash_embeddings()
+    vector_store.FAISS_INDEX_PATH = tempfile.mkdtemp()
+    pdf_processor.MAX_FILE_SIZE_MB = 1024
+
+    store = vector_store.VectorStore("bench")
+    processor = pdf_processor.PDFProcessor()
+    text_pages = list(processor.iter_pages(io.BytesIO(make_pdf(pages))))
+    store.add_document(processor.iter_chunks(iter(text_pages)), name="bench")
+    return store, text_pages
+
+
+def _test_set(text_pages, count: int, seed: int = 0):
+    """(question, line id) pairs; half cite the line id, half paraphrase its words."""
+    rng = random.Random(seed)
+    lines = [
+        match for _, text in text_pages
+        for match in re.finditer(r"^(\d+\.\d+) (.+)\.$", text, flags=re.M)
+        if not match.group(1).endswith(".0")
+    ]
+    tests = []
+    for n in range(count):
+        line_id, words = rng.choice(lines).groups()
+        if n % 2 == 0:
+            tests.append((f"What does clause {line_id} say?", line_id))
+        else:
+            tests.append((" ".join(words.split()[:6]), line_id))
+    return tests
+
+
+def _run(store, tests, hybrid: bool):
+    import vector_store
+    vector_store.HYBRID_SEARCH = hybrid
+    latencies, fallbacks, hits = [], 0, 0
+    for question, line_id in tests:
+        embedding = store.embed_query(question)  # Embedding cost is the same for both modes
+        start = time.perf_counter()
+        results = store.similarity_search(question, embedding=embedding)
+        latencies.append(time.perf_counter() - start)
+        fallbacks += not results
+        hits += any(re.search(rf"(^|\n){re.escape(line_id)} ", doc.page_content) for doc, _ in results)
+    return latencies, fallbacks, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--hash-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        store, text_pages = _build_store(args.pages, args.hash_embeddings)
+        tests = _test_set(text_pages, args.queries)
+        results = {mode: _run(store, tests, mode == "hybrid") for mode in ("dense", "hybrid")}
+
+    print(f"{len(store.vectorstore.docstore)} chunks, {len(tests)} queries "
+          f"({len(tests) // 2 + len(tests) % 2} exact-id, {len(tests) // 2} topical)")
+    for mode, (latencies, fallbacks, hits) in results.items():
+        ms = sorted(t * 1000 for t in latencies)
+        print(
+            f"{mode:>7}: mean {statistics.mean(ms):.2f}ms p95 {ms[int(0.95 * (len(ms) - 1))]:.2f}ms | "
+            f"fallback {fallbacks / len(tests):.0%} | hit rate {hits / len(tests):.0%}"
+        )
+    added = statistics.mean(results["hybrid"][0]) - statistics.mean(results["dense"][0])
+    print(f"  added: {added * 1000:+.2f}ms per query")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
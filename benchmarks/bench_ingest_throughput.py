@@ -0,0 +1,136 @@
+"""Ingest throughput (chunks/sec) and peak RSS: one-pass IndexBuilder vs. per-batch merge_from.
+
+Usage: python benchmarks/bench_ingest_throughput.py --pages 200
+       python benchmarks/bench_ingest_throughput.py --pages 200 --hash-embeddings  # offline, indexing cost only
+"""
+import argparse
+import gc
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil
+
+
+class PeakRSS:
+    """Sample this process's RSS in the background and keep the maximum."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        process = psutil.Process()
+        while not self._stop.is_set():
+            self.peak = max(self.peak, process.memory_info().rss)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _hash_embeddings():
+    import hashlib
+    import numpy as np
+    from langchain_core.embeddings import Embeddings
+
+    class HashEmbeddings(Embeddings):
+        """Deterministic bag-of-words hashing, so only indexing cost is measured."""
+
+        def embed_query(self, text):
+            vector = np.zeros(384, dtype=np.float32)
+            for word in text.split():
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 384] += 1.0
+            return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+        def embed_documents(self, texts):
+            return [self.embed_query(t) for t in texts]
+
+    return HashEmbeddings()
+
+
+def _chunks(pages: int):
+    import pdf_processor
+    from synthetic_pdf import make_pdf
+    pdf_processor.MAX_FILE_SIZE_MB = 1024
+    processor = pdf_processor.PDFProcessor()
+    pdf = io.BytesIO(make_pdf(pages))
+    return list(processor.iter_chunks(processor.iter_pages(pdf)))
+
+
+def _legacy_ingest(chunks, embeddings):
+    """The old create_vectorstore: one FAISS per BATCH_SIZE chunks, merged one by one."""
+    from langchain_community.vectorstores import FAISS
+    from config import BATCH_SIZE
+    stores = []
+    for i in range(0, len(chunks), BATCH_SIZE):
+        stores.append(FAISS.from_documents(documents=chunks[i:i + BATCH_SIZE], embedding=embeddings))
+        gc.collect()
+    merged = stores[0]
+    for store in stores[1:]:
+        merged.merge_from(store)
+    return merged.index.ntotal
+
+
+def _builder_ingest(chunks, embeddings):
+    import vector_store
+    vector_store.FAISS_INDEX_PATH = tempfile.mkdtemp()
+    store = vector_store.VectorStore("bench")
+    store.embeddings = embeddings
+    store.add_document(chunks, name="bench")
+    return store.vectorstore.index.ntotal
+
+
+def _run(mode, pages, hash_embeddings, queue):
+    import contextlib
+    import embeddings as shared
+    shared.EMBEDDING_CACHE_ENABLED = False  # Measure embedding work, not cache hits
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = _hash_embeddings() if hash_embeddings else shared.get_embeddings()
+        shared._embeddings = model
+        chunks = _chunks(pages)
+
+        ingest = _legacy_ingest if mode == "legacy" else _builder_ingest
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            indexed = ingest(chunks, model)
+            elapsed = time.perf_counter() - start
+    queue.put((mode, len(chunks), indexed, elapsed, rss.peak))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--hash-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    for mode in ("legacy", "builder"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(mode, args.pages, args.hash_embeddings, queue))
+        proc.start()
+        mode, chunks, indexed, elapsed, peak = queue.get()
+        proc.join()
+        print(
+            f"{mode:>8}: {indexed}/{chunks} chunks | {elapsed:.2f}s | "
+            f"{chunks / elapsed:.0f} chunks/s | peak RSS {peak / (1024 * 1024):.0f}MB"
+        )
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,96 @@
+"""Cost of the instrumentation layer: per call, and per answered question.
+
+Per-call numbers compare a live Counter/Histogram with the no-op stand-in
+used when METRICS_ENABLED is off. The end-to-end run answers questions
+with a zero-latency stub LLM (so instrumentation is as large a share of
+the time as it can be) in child processes with metrics off, on, and on
+with a trace log.
+
+Usage: python benchmarks/bench_metrics_overhead.py --questions 500
+       python benchmarks/bench_metrics_overhead.py --hash-embeddings  # offline
+"""
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def per_call_ns(fn, calls: int = 200000) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) * 1e9 / calls
+
+
+def micro():
+    import metrics
+    counter, histogram = metrics.Counter("c", ""), metrics.Histogram("h", "")
+    null = metrics._NullMetric()
+
+    def timed(metric):
+        with metric.time(stage="x"):
+            pass
+
+    calls = {
+        "counter.inc": (lambda: counter.inc(stage="x"), lambda: null.inc(stage="x")),
+        "histogram.observe": (lambda: histogram.observe(0.01, stage="x"),
+                              lambda: null.observe(0.01, stage="x")),
+        "histogram.time": (lambda: timed(histogram), lambda: timed(null)),
+    }
+    for name, (live, off) in calls.items():
+        print(f"{name:>20} | live {per_call_ns(live):6.0f} ns | off {per_call_ns(off):6.0f} ns")
+
+
+def child(questions: int, hash_embeddings: bool):
+    """Runs in a subprocess so METRICS_ENABLED is read fresh."""
+    from bench_async_answers import _build_chain
+    with contextlib.redirect_stdout(io.StringIO()):
+        chain = _build_chain(20, 0.0, hash_embeddings)
+        chain.limiter.requests_per_minute = None
+        words = "liability notice pricing supplier annex term breach customer".split()
+        prompts = [" ".join(words[i % 5:i % 5 + 3]) + f" {i}" for i in range(questions)]
+        chain.answer_question(prompts[0])  # Warm up
+        start = time.perf_counter()
+        for prompt in prompts:
+            chain.answer_question(prompt)
+        elapsed = time.perf_counter() - start
+    print(f"{1000 * elapsed / questions:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--hash-embeddings", action="store_true")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.questions, args.hash_embeddings)
+        return
+
+    micro()
+    trace_log = os.path.join(tempfile.mkdtemp(), "trace.jsonl")
+    runs = {
+        "metrics off": {"METRICS_ENABLED": "false"},
+        "metrics on": {"METRICS_ENABLED": "true"},
+        "metrics + trace log": {"METRICS_ENABLED": "true", "TRACE_LOG_PATH": trace_log},
+    }
+    for name, env in runs.items():
+        command = [sys.executable, os.path.abspath(__file__), "--child",
+                   "--questions", str(args.questions)]
+        if args.hash_embeddings:
+            command.append("--hash-embeddings")
+        child_env = {k: v for k, v in os.environ.items() if k != "TRACE_LOG_PATH"}
+        child_env.update(LLM_BACKEND="stub", **env)
+        out = subprocess.run(command, env=child_env, capture_output=True, text=True, check=True)
+        print(f"{name:>20} | {float(out.stdout.strip().splitlines()[-1]):7.3f} ms/question")
+
+
+if __name__ == "__main__":
+    main()
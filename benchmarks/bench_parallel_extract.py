@@ -0,0 +1,52 @@
+"""Page-extraction scaling with worker count on a synthetic multi-hundred-page PDF.
+
+Usage: python benchmarks/bench_parallel_extract.py --pages 400 --workers 1 2 4 8
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_processor
+from pdf_processor import PDFProcessor
+from synthetic_pdf import make_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pdf_bytes = make_pdf(args.pages)
+    print(f"Synthetic PDF: {args.pages} pages, {len(pdf_bytes) / (1024 * 1024):.1f}MB")
+
+    # Lift the app's memory caps for the benchmark only
+    pdf_processor.MAX_PAGES = args.pages
+    pdf_processor.MAX_FILE_SIZE_MB = max(pdf_processor.MAX_FILE_SIZE_MB, len(pdf_bytes) // 2**20 + 1)
+
+    baseline = None
+    expected = None
+    for workers in args.workers:
+        processor = PDFProcessor(extract_workers=workers)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            text = processor.extract_text_from_pdf(io.BytesIO(pdf_bytes))
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        baseline = baseline or best
+        expected = expected or text
+        print(
+            f"workers={workers:>2} | best {best:.2f}s | "
+            f"{args.pages / best:.0f} pages/s | speedup x{baseline / best:.2f} | "
+            f"identical output: {text == expected}"
+        )
+
+
+if __name__ == "__main__":
+    main()
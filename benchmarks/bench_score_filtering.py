@@ -0,0 +1,115 @@
+"""Score conversion + threshold filtering: per-result Python loop vs. NumPy over a query batch.
+
+Compares the old path (L2 index, ``1 / (1 + distance)`` per result in a
+loop) with the cosine path (normalized vectors, inner product, mask over
+the whole batch) at several k and batch sizes, plus range search. The
+corpus vectors get random norms, as unnormalized embeddings do, to show
+how the L2 threshold's pass rate depends on vector length while the
+cosine one doesn't.
+
+Usage: python benchmarks/bench_score_filtering.py --vectors 50000 --queries 256
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from bench_ann_index import synthetic_corpus
+from ann_index import build_index, prepare_vectors, range_radius, similarities
+from config import SIMILARITY_THRESHOLD, COSINE_THRESHOLD
+
+
+def loop_filter(index, raw, labels, threshold):
+    """The old path: scores converted and filtered one result at a time."""
+    results = []
+    for row_distances, row_labels in zip(raw, labels):
+        filtered = []
+        for distance, label in zip(row_distances, row_labels):
+            similarity = 1 / (1 + distance)
+            if label >= 0 and similarity >= threshold:
+                filtered.append((int(label), float(similarity)))
+        results.append(filtered)
+    return results
+
+
+def array_filter(index, raw, labels, threshold):
+    """Conversion and threshold as array ops over the whole batch."""
+    scores = similarities(index, raw)
+    keep = (labels >= 0) & (scores >= threshold)
+    return [list(zip(l[m].tolist(), s[m].tolist())) for l, s, m in zip(labels, scores, keep)]
+
+
+def range_filter(index, queries, threshold):
+    lims, raw, labels = index.range_search(queries, range_radius(index, threshold))
+    scores = similarities(index, raw)
+    return [list(zip(labels[a:b].tolist(), scores[a:b].tolist())) for a, b in zip(lims[:-1], lims[1:])]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    results = fn(*args)
+    return (time.perf_counter() - start) * 1000, results
+
+
+def summary(results) -> str:
+    counts = [len(r) for r in results]
+    empty = sum(c == 0 for c in counts) / len(counts)
+    return f"{np.mean(counts):5.1f} results/query, {empty:4.0%} empty"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    corpus, queries = synthetic_corpus(args.vectors, args.queries, args.dim)
+    rng = np.random.default_rng(1)
+    corpus *= rng.uniform(0.5, 1.5, (len(corpus), 1)).astype(np.float32)
+    l2 = build_index(corpus, "flat", "l2")
+    cosine = build_index(prepare_vectors(corpus, "cosine"), "flat", "cosine")
+    cosine_queries = prepare_vectors(queries, "cosine")
+    print(f"Corpus: {args.vectors} x {args.dim}, {args.queries} queries")
+
+    # Filtering cost alone (search results precomputed), per query
+    for k in (2, 10, 50, 200):
+        l2_raw, l2_labels = l2.search(queries, k)
+        raw, labels = cosine.search(cosine_queries, k)
+        for batch in (1, args.queries):
+            loop_ms = array_ms = 0.0
+            for start in range(0, len(queries), batch):
+                rows = slice(start, start + batch)
+                loop_ms += timed(loop_filter, l2, l2_raw[rows], l2_labels[rows], SIMILARITY_THRESHOLD)[0]
+                array_ms += timed(array_filter, cosine, raw[rows], labels[rows], COSINE_THRESHOLD)[0]
+            print(
+                f"k={k:<4} batch {batch:>4} | loop {1000 * loop_ms / len(queries):8.1f} us/query | "
+                f"arrays {1000 * array_ms / len(queries):8.1f} us/query"
+            )
+
+    l2_results = array_filter(l2, *l2.search(queries, 50), SIMILARITY_THRESHOLD)
+    cosine_results = array_filter(cosine, *cosine.search(cosine_queries, 50), COSINE_THRESHOLD)
+    range_ms, range_results = timed(range_filter, cosine, cosine_queries, COSINE_THRESHOLD)
+    print(f"l2 threshold {SIMILARITY_THRESHOLD}, k=50     | {summary(l2_results)}")
+    print(f"cosine threshold {COSINE_THRESHOLD}, k=50  | {summary(cosine_results)}")
+    print(
+        f"cosine range search        | {summary(range_results)} "
+        f"({range_ms / len(queries):.3f} ms/query)"
+    )
+
+    # Calibration: does passing the threshold depend on the stored vector's length?
+    norms = np.linalg.norm(corpus, axis=1)
+    short, long = norms < np.median(norms), norms >= np.median(norms)
+    for name, results in (("l2", l2_results), ("cosine", cosine_results)):
+        passed = np.array([label for row in results for label, _ in row], dtype=np.int64)
+        print(
+            f"{name:>6}: passing chunks with short vectors {short[passed].sum():6d}, "
+            f"long vectors {long[passed].sum():6d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
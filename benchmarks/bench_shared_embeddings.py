@@ -0,0 +1,89 @@
+"""Per-upload latency and RSS with N concurrent sessions: per-instance vs shared embedding model.
+
+Usage: python benchmarks/bench_shared_embeddings.py --sessions 4
+"""
+import argparse
+import os
+import sys
+import time
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil
+
+SAMPLE_CHUNKS = [f"Sample contract clause {i} about payment terms and delivery." for i in range(12)]
+
+
+def _session_per_instance():
+    """Old behaviour: every upload loads two fresh models (VectorStore + RAGChain)."""
+    from langchain_community.embeddings import SentenceTransformerEmbeddings
+    from config import EMBEDDING_MODEL, BATCH_SIZE
+    start = time.perf_counter()
+    models = []
+    for _ in range(2):
+        models.append(SentenceTransformerEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'batch_size': BATCH_SIZE},
+        ))
+    models[0].embed_documents(SAMPLE_CHUNKS)
+    models[1].embed_query("What are the payment terms?")
+    return time.perf_counter() - start, models
+
+
+def _session_shared():
+    """New behaviour: every upload reuses the process-wide model."""
+    from embeddings import get_embeddings
+    start = time.perf_counter()
+    embeddings = get_embeddings()
+    embeddings.embed_documents(SAMPLE_CHUNKS)
+    get_embeddings().embed_query("What are the payment terms?")
+    return time.perf_counter() - start, [embeddings]
+
+
+def _run(mode, sessions, queue):
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    if mode == "shared":
+        from embeddings import warmup_embeddings
+        warmup_embeddings()
+        session = _session_shared
+    else:
+        session = _session_per_instance
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        results = list(pool.map(lambda _: session(), range(sessions)))
+
+    latencies = sorted(r[0] for r in results)
+    queue.put({
+        "mode": mode,
+        "mean_s": sum(latencies) / len(latencies),
+        "max_s": latencies[-1],
+        "rss_mb": (process.memory_info().rss - rss_before) / (1024 * 1024),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=4)
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    for mode in ("per-instance", "shared"):
+        # Fresh interpreter per mode so RSS numbers don't bleed into each other
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(mode, args.sessions, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+        print(
+            f"{result['mode']:>12}: {args.sessions} sessions | "
+            f"mean upload {result['mean_s']:.2f}s | max {result['max_s']:.2f}s | "
+            f"RSS +{result['rss_mb']:.0f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
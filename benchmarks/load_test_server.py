@@ -0,0 +1,164 @@
+"""Load test for server.py with the stub LLM: latency percentiles and requests/sec.
+
+Starts the API in-process on a free port (stub LLM, temporary index root),
+ingests a synthetic PDF, then fires ``--requests`` queries with
+``--concurrency`` clients at /query and /query/stream.
+
+Usage: python benchmarks/load_test_server.py --requests 500 --concurrency 32
+       python benchmarks/load_test_server.py --hash-embeddings  # no model download
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _start_server(llm_latency: float, hash_embeddings: bool):
+    import uvicorn
+    import embeddings as shared
+    import vector_store
+    import server
+    from stub_llm import StubChatModel
+    from bench_ingest_throughput import _hash_embeddings
+
+    shared.EMBEDDING_CACHE_ENABLED = False
+    if hash_embeddings:
+        shared._embeddings = _hash_embeddings()
+    vector_store.FAISS_INDEX_PATH = tempfile.mkdtemp()
+    server.create_llm = lambda: StubChatModel(latency=llm_latency)
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning")
+    uvicorn_server = uvicorn.Server(config)
+    thread = threading.Thread(target=uvicorn_server.run, daemon=True)
+    thread.start()
+    while not uvicorn_server.started:
+        time.sleep(0.05)
+    return uvicorn_server, f"http://127.0.0.1:{port}"
+
+
+async def _load(base_url: str, path: str, questions, concurrency: int, stream: bool):
+    import httpx
+    from rag_chain import GENERAL_ANSWER_PREFIX
+
+    latencies, first_token, errors = [], [], 0
+    queue = asyncio.Queue()
+    for question in questions:
+        queue.put_nowait(question)
+
+    async def client(http):
+        nonlocal errors
+        while not queue.empty():
+            question = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                if stream:
+                    ttft = None
+                    async with http.stream("POST", path, json={"question": question}) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line or ttft is not None:
+                                continue
+                            event = json.loads(line)
+                            # The canned general-answer prefix is sent before the model starts
+                            if event["event"] == "token" and event["data"] != GENERAL_ANSWER_PREFIX:
+                                ttft = time.perf_counter() - start
+                    if ttft is not None:
+                        first_token.append(ttft)
+                else:
+                    response = await http.post(path, json={"question": question})
+                    response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, first_token, errors, elapsed
+
+
+def _report(label, latencies, first_token, errors, elapsed):
+    if not latencies:
+        print(f"{label:>7}: all {errors} requests failed")
+        return
+    ms = [t * 1000 for t in latencies]
+    line = (
+        f"{label:>7}: {len(latencies)} ok, {errors} errors | {len(latencies) / elapsed:.1f} req/s | "
+        f"p50 {_percentile(ms, 50):.0f}ms p95 {_percentile(ms, 95):.0f}ms "
+        f"p99 {_percentile(ms, 99):.0f}ms mean {statistics.mean(ms):.0f}ms"
+    )
+    if first_token:
+        line += f" | TTFT p50 {_percentile([t * 1000 for t in first_token], 50):.0f}ms"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--hash-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    import httpx
+    import llm
+    from synthetic_pdf import make_pdf
+
+    # The limiter would otherwise cap the stub at the production Gemini rate
+    llm._limiter = llm.LLMLimiter(max_inflight=args.concurrency, requests_per_minute=None)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        uvicorn_server, base_url = _start_server(args.llm_latency, args.hash_embeddings)
+        start = time.perf_counter()
+        response = httpx.post(
+            f"{base_url}/namespaces/load/documents",
+            files={"file": ("load.pdf", make_pdf(args.pages), "application/pdf")},
+            timeout=600,
+        )
+        response.raise_for_status()
+        job = response.json()
+        while job["status"] in ("queued", "running"):
+            time.sleep(0.1)
+            job = httpx.get(f"{base_url}/jobs/{job['job_id']}").json()
+        ingest_time = time.perf_counter() - start
+    if job["status"] != "done":
+        raise Exception(f"Ingest {job['status']}: {job['error']}")
+    print(f" ingest: {job['chunks_embedded']} chunks in {ingest_time:.2f}s")
+
+    # Distinct questions so the answer cache doesn't short-circuit the LLM
+    questions = [f"What does clause {i} say about invoices and delivery {i}?" for i in range(args.requests)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        query = asyncio.run(_load(base_url, "/namespaces/load/query", questions, args.concurrency, False))
+        stream_questions = [q.replace("clause", "section") for q in questions]
+        stream = asyncio.run(_load(base_url, "/namespaces/load/query/stream", stream_questions,
+                                   args.concurrency, True))
+    _report("query", *query)
+    _report("stream", *stream)
+    print(f" config: {args.concurrency} concurrent clients, stub LLM latency {args.llm_latency}s")
+    uvicorn_server.should_exit = True
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
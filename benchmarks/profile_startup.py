@@ -0,0 +1,134 @@
+"""Startup profile: import time and idle RSS of the app's module sets.
+
+Each scenario imports a set of modules in a fresh interpreter (run with
+``-X importtime``) and reports wall time, the RSS of the idle process
+afterwards, and which top-level packages the import time went to:
+
+  ui shell     what app.py imports before the first page renders
+  ingest       + the ingest queue (PDF parsing, FAISS), on first upload
+  rag stack    + rag_chain (LangChain, Gemini client): the old eager imports
+  rag + model  + the embedding model loaded and warmed up (``--no-model`` skips)
+
+``--record`` appends the results as one JSON line, to track startup cost
+across commits.
+
+Usage: python benchmarks/profile_startup.py --repeat 3 --record startup.jsonl
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = {
+    "ui shell": ["streamlit", "styles", "session_indexes", "config"],
+    "ingest": ["streamlit", "styles", "session_indexes", "config", "ingest_jobs"],
+    "rag stack": ["streamlit", "styles", "session_indexes", "config", "ingest_jobs", "rag_chain"],
+    "rag + model": ["streamlit", "styles", "session_indexes", "config", "ingest_jobs", "rag_chain", "embeddings"],
+}
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def child(scenario: str):
+    """Runs in a fresh interpreter: import the scenario's modules, report time and RSS."""
+    import importlib
+    start = time.perf_counter()
+    for module in SCENARIOS[scenario]:
+        importlib.import_module(module)
+    import_s = time.perf_counter() - start
+
+    model_s = 0.0
+    if scenario == "rag + model":
+        from embeddings import warmup_embeddings
+        start = time.perf_counter()
+        warmup_embeddings()
+        model_s = time.perf_counter() - start
+
+    import gc
+    import psutil
+    gc.collect()
+    print(json.dumps({
+        "import_s": import_s,
+        "model_s": model_s,
+        "rss_mb": psutil.Process().memory_info().rss / 1024 ** 2,
+    }))
+
+
+def by_package(importtime: str) -> dict:
+    """Self import time (seconds) summed per top-level package."""
+    totals = defaultdict(float)
+    for match in IMPORTTIME_LINE.finditer(importtime):
+        totals[match.group(4).split(".")[0]] += int(match.group(1)) / 1e6
+    return totals
+
+
+def run(scenario: str) -> dict:
+    command = [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", scenario]
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+        return {"error": error}
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    stats["packages"] = by_package(result.stderr)
+    return stats
+
+
+def git_commit() -> str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                            capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; medians are reported")
+    parser.add_argument("--top", type=int, default=6, help="Slowest top-level packages to list")
+    parser.add_argument("--no-model", action="store_true", help="Skip loading the embedding model")
+    parser.add_argument("--record", help="Append the results as a JSON line to this file")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    results = {}
+    for scenario in SCENARIOS:
+        if scenario == "rag + model" and args.no_model:
+            continue
+        runs = [run(scenario) for _ in range(args.repeat)]
+        failed = next((r for r in runs if "error" in r), None)
+        if failed:
+            print(f"{scenario:>12} | skipped: {failed['error']}")
+            continue
+
+        summary = {key: statistics.median(r[key] for r in runs) for key in ("import_s", "model_s", "rss_mb")}
+        packages = defaultdict(list)
+        for r in runs:
+            for package, seconds in r["packages"].items():
+                packages[package].append(seconds)
+        slowest = sorted(((statistics.median(v), p) for p, v in packages.items()), reverse=True)
+        summary["packages_s"] = {p: round(s, 4) for s, p in slowest[:args.top]}
+        results[scenario] = summary
+
+        model = f" + model {summary['model_s']:5.2f}s" if summary["model_s"] else ""
+        print(f"{scenario:>12} | import {summary['import_s']:5.2f}s{model} | idle RSS {summary['rss_mb']:6.0f} MB")
+        print(" " * 15 + ", ".join(f"{p} {1000 * s:.0f} ms" for s, p in slowest[:args.top]))
+
+    if args.record:
+        record = {"ts": time.time(), "commit": git_commit(), "python": sys.version.split()[0],
+                  "repeat": args.repeat, "scenarios": results}
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"Recorded to {args.record}")
+
+
+if __name__ == "__main__":
+    main()
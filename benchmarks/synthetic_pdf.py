@@ -0,0 +1,61 @@
+"""Generate text-heavy synthetic PDFs for benchmarks (no extra dependencies)."""
+import random
+
+WORDS = (
+    "agreement party shall payment invoice delivery warranty liability clause "
+    "section term notice supplier customer service level breach remedy period "
+    "confidential information termination renewal schedule annex pricing fee"
+).split()
+
+
+def _page_lines(rng: random.Random, page: int, lines: int) -> list[str]:
+    out = [f"Section {page}.0 Page {page} heading"]
+    for n in range(lines):
+        words = " ".join(rng.choice(WORDS) for _ in range(12))
+        out.append(f"{page}.{n} {words}.")
+    return out
+
+
+def make_pdf(num_pages: int = 300, lines_per_page: int = 45, seed: int = 0) -> bytes:
+    """Return PDF bytes with ``num_pages`` pages of plain Helvetica text."""
+    rng = random.Random(seed)
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # Filled in once page ids are known
+    page_ids = []
+    for page in range(1, num_pages + 1):
+        stream_lines = [b"BT /F1 9 Tf 11 TL 40 800 Td"]
+        for line in _page_lines(rng, page, lines_per_page):
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            stream_lines.append(f"({escaped}) '".encode("latin-1"))
+        stream_lines.append(b"ET")
+        stream = b"\n".join(stream_lines)
+        content_id = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_id, font_id, content_id)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref
+    )
+    return bytes(out)
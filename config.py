@@ -4,26 +4,121 @@ from dotenv import load_dotenv
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-FAISS_INDEX_PATH = "./faiss_index"
+FAISS_INDEX_PATH = "./faiss_index"  # Root; each session/tenant gets a subdirectory
+DEFAULT_NAMESPACE = "default"
+NAMESPACE_PATTERN = r"[A-Za-z0-9_-]{1,100}"  # Namespaces are directory names
+SESSION_INDEX_TTL_S = 24 * 3600  # Anonymous session-* indexes unused this long are deleted
+SESSION_CLEANUP_INTERVAL_S = 3600
 
 # ✅ OPTIMIZED FOR 8GB RAM + NO GPU
 # Embedding model - smallest available
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"  # Only 80MB, was paraphrase-MiniLM-L3-v2
 
+# Embedding cache - re-uploaded chunks skip the model
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = "./embedding_cache"
+EMBEDDING_CACHE_MAX_MB = 256  # Size cap, least recently used vectors evicted
+
+# Embedding backend - same model, different CPU runtime
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch" (sentence-transformers) or "onnx" (int8)
+ONNX_MODEL_PATH = "./onnx_models"  # Exported int8 models, one directory per embedding model
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # onnxruntime intra-op threads; 0 = one per core
+ONNX_MIN_COSINE = 0.99      # Export is rejected unless int8 vectors stay this close to the original
+
 # Text chunking
 CHUNK_SIZE = 300           # Reduced from 400
 CHUNK_OVERLAP = 30         # Reduced from 50
 MAX_CHUNKS = 12            # Reduced from 15
 MAX_PAGES = 15             # Reduced from 20
+STREAM_MAX_PAGES = None    # Streaming ingest keeps memory flat, so no page cap
+
+# PDF extraction - >1 splits pages across a process pool
+EXTRACT_WORKERS = 1
+PARALLEL_EXTRACT_MIN_PAGES = 32  # Smaller PDFs aren't worth the pool startup
+
+# Vector index: "flat" (exact), "hnsw", "ivf_flat", "ivf_pq" or "auto"
+INDEX_TYPE = "auto"
+ANN_AUTO_TYPE = "hnsw"      # What "auto" switches to above the threshold
+ANN_THRESHOLD = 20000       # Vectors before "auto" leaves exact search
+HNSW_M = 32                 # Graph neighbours per node
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64         # Higher = better recall, slower queries
+IVF_NLIST = None            # Inverted lists; None = ~4*sqrt(n)
+IVF_NPROBE = 16             # Lists scanned per query
+PQ_BYTES = 48               # IVF-PQ bytes per vector; must divide the embedding dim
+INDEX_METRIC = "cosine"     # New indexes: "cosine" (normalized vectors, inner product) or "l2"
 
 # Vector search
-SIMILARITY_THRESHOLD = 0.65  # Slightly relaxed from 0.6
+SIMILARITY_THRESHOLD = 0.65  # Slightly relaxed from 0.6 (l2 indexes: 1 / (1 + distance))
+COSINE_THRESHOLD = 0.5      # Minimum cosine similarity on cosine indexes
 TOP_K_RESULTS = 2           # Reduced from 3
+RANGE_SEARCH = True         # Return every chunk above the threshold instead of a fixed k
+RANGE_MAX_RESULTS = 8       # ...capped at this many
+
+# Hybrid retrieval - BM25 over chunk text, fused with vector results (RRF)
+HYBRID_SEARCH = False       # The BM25 index is always built; this turns fusion on
+HYBRID_CANDIDATES = 20      # Candidates taken from each retriever before fusion
+RRF_K = 60                  # Reciprocal rank fusion damping constant
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_MIN_SCORE = 3.0        # Lexical hits above this count as relevant on their own
+
+# Prompt context - retrieved chunks merged, de-duplicated and packed into a budget
+CONTEXT_MAX_TOKENS = 1000   # Estimated tokens of PDF context per prompt
+CONTEXT_MERGE_GAP_CHARS = 2  # Same-document chunks this close join into one passage
+CONTEXT_MIN_DUP_CHARS = 40  # Repeated sentences at least this long are sent once
+CONTEXT_MMR_LAMBDA = None   # 0-1 to pack in MMR order (1 = relevance only); None = by score
+
+# Conversation memory - follow-up questions are rewritten using recent turns
+MEMORY_REWRITE = True       # Rewrite follow-ups into standalone questions before retrieval
+MEMORY_WINDOW_TOKENS = 600  # Recent turns kept verbatim
+MEMORY_SUMMARY_TOKENS = 200  # Older turns are folded into a summary of this size
+MEMORY_FOLLOW_UP_WORDS = 3  # Questions this short always count as follow-ups
+CHAT_RENDER_RECENT = 10     # Messages drawn on each rerun; earlier ones on request
+CHAT_HISTORY_MAX = 200      # Messages kept for display (the summary covers older ones)
 
 # Memory limits
 MAX_FILE_SIZE_MB = 8        # Reduced from 10MB
 BATCH_SIZE = 5              # Process chunks in small batches
+# Ingest embeds in batches sized to available RAM (psutil), within these bounds
+MIN_EMBED_BATCH = 8
+MAX_EMBED_BATCH = 128
+EMBED_BYTES_PER_CHUNK = 2 * 1024 * 1024  # Rough peak activation memory per chunk
+INGEST_MEMORY_FRACTION = 0.25            # Share of available RAM an ingest may use
+INDEX_CACHE_MAX_MB = 512    # Loaded indexes kept in memory across sessions
+
+# Answer cache - repeated / near-duplicate questions skip the LLM
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_SIMILARITY = 0.95  # Cosine cutoff for near-duplicate questions
+ANSWER_CACHE_TTL_S = 3600
+ANSWER_CACHE_MAX_ENTRIES = 1000
 
 # LLM settings
 LLM_TEMPERATURE = 0.2       # More deterministic
-LLM_MAX_TOKENS = 512        # Limit response length
\ No newline at end of file
+LLM_MAX_TOKENS = 512        # Limit response length
+LLM_MAX_CONCURRENCY = 4     # Parallel LLM calls in answer_questions
+LLM_TIMEOUT_S = 60          # Per-call timeout for batched answers; also the Gemini request timeout
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # "gemini", or "stub" for offline benchmarks
+LLM_MAX_INFLIGHT = 8        # Process-wide cap on concurrent Gemini calls
+LLM_REQUESTS_PER_MINUTE = 60  # Process-wide Gemini rate limit (None = unlimited)
+STUB_LLM_LATENCY_S = 0.5    # Stub backend: delay before the first token
+STUB_LLM_TOKEN_DELAY_S = 0.01  # Stub backend: delay between streamed tokens
+
+# Headless API server (server.py)
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 8000
+
+# Background ingest queue (ingest_jobs.py), shared by the UI and the server
+INGEST_WORKERS = 2          # Concurrent ingests; more uploads wait in the queue
+INGEST_EXTRACT_WORKERS = 2  # Processes per ingest for PDF text extraction
+INGEST_JOB_HISTORY = 100    # Finished jobs kept for status polling
+INGEST_CACHE_PATH = "./ingest_cache"  # Extracted pages / chunks by file fingerprint
+INGEST_CACHE_MAX_MB = 512   # Oldest files' cached stages are pruned beyond this
+
+# Startup - the UI imports LangChain / FAISS / models on first use
+PREWARM_MODELS = os.getenv("PREWARM_MODELS", "true").lower() == "true"  # Load them in a background thread at app start
+
+# Metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # Off: instrumentation is a no-op
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH")  # JSONL file of per-request stage timings; unset = off
+CHARS_PER_TOKEN = 4         # Prompt token estimate without a tokenizer call
\ No newline at end of file
@@ -0,0 +1,171 @@
+import re
+from llm import estimate_tokens
+from config import (
+    CHARS_PER_TOKEN,
+    CONTEXT_MAX_TOKENS,
+    CONTEXT_MERGE_GAP_CHARS,
+    CONTEXT_MIN_DUP_CHARS,
+    CONTEXT_MMR_LAMBDA
+)
+
+# Sentence / line boundaries, captured so the text can be put back together
+BOUNDARY = re.compile(r"((?<=[.!?])\s+|\n+)")
+WORD = re.compile(r"\w+")
+
+
+class Passage:
+    """Contiguous text from one document: one or more merged chunks, scored by the best."""
+
+    def __init__(self, doc, score: float):
+        meta = doc.metadata
+        self.text = doc.page_content
+        self.score = float(score)
+        self.docs = [doc]
+        self.doc_id = meta.get("doc_id")
+        self.start = meta.get("start_char")
+        self.end = meta.get("end_char")
+
+    @property
+    def page(self):
+        return self.docs[0].metadata.get("page")
+
+    @property
+    def page_end(self):
+        pages = [d.metadata.get("page_end", d.metadata.get("page")) for d in self.docs]
+        return max((p for p in pages if p is not None), default=None)
+
+    def extend(self, doc, score: float) -> bool:
+        """Append the chunk that overlaps or directly follows this passage, if it does."""
+        meta = doc.metadata
+        start, end = meta.get("start_char"), meta.get("end_char")
+        if self.end is None or start is None or meta.get("doc_id") != self.doc_id:
+            return False
+        if start > self.end + CONTEXT_MERGE_GAP_CHARS:
+            return False
+
+        if end > self.end:
+            if start >= self.end:
+                # The splitter dropped the whitespace between them; a line
+                # break keeps line-structured text (ids, lists) intact
+                self.text += ("\n" if start > self.end else "") + doc.page_content
+            else:
+                # Spans come from the splitter, so the overlap must match; if it
+                # doesn't (offset fallback), keep the chunks apart
+                overlap = self.end - start
+                if overlap > len(doc.page_content) or not self.text.endswith(doc.page_content[:overlap]):
+                    return False
+                self.text += doc.page_content[overlap:]
+            self.end = end
+        self.docs.append(doc)
+        self.score = max(self.score, float(score))
+        return True
+
+
+def merge_chunks(relevant_docs) -> list[Passage]:
+    """Merge ``(doc, score)`` chunks that overlap or touch in the same document.
+
+    Adjacent chunks share ``CHUNK_OVERLAP`` characters; merged, that text is
+    sent once. Returns passages best score first.
+    """
+    spanned = [(d, s) for d, s in relevant_docs if d.metadata.get("start_char") is not None]
+    others = [(d, s) for d, s in relevant_docs if d.metadata.get("start_char") is None]
+    spanned.sort(key=lambda item: (str(item[0].metadata.get("doc_id")), item[0].metadata["start_char"]))
+
+    passages = []
+    for doc, score in spanned:
+        if not (passages and passages[-1].extend(doc, score)):
+            passages.append(Passage(doc, score))
+    passages.extend(Passage(doc, score) for doc, score in others)
+    passages.sort(key=lambda p: -p.score)
+    return passages
+
+
+def strip_duplicates(passages: list[Passage]) -> list[Passage]:
+    """Drop sentences already sent in a better-scored passage (e.g. repeated boilerplate).
+
+    Only sentences of at least ``CONTEXT_MIN_DUP_CHARS`` count, so short
+    common phrases stay. Passages left empty are dropped.
+    """
+    seen = set()
+    kept = []
+    for passage in passages:
+        parts = BOUNDARY.split(passage.text)
+        text = []
+        for sentence, separator in zip(parts[::2], parts[1::2] + [""]):
+            key = " ".join(sentence.lower().split())
+            if len(key) >= CONTEXT_MIN_DUP_CHARS:
+                if key in seen:
+                    continue
+                seen.add(key)
+            text.append(sentence + separator)
+        passage.text = "".join(text).strip()
+        if passage.text:
+            kept.append(passage)
+    return kept
+
+
+def _words(text: str) -> set:
+    return set(WORD.findall(text.lower()))
+
+
+def mmr_order(passages: list[Passage], lambda_: float) -> list[Passage]:
+    """Maximal marginal relevance: trade score for novelty against already picked passages.
+
+    Similarity between passages is word-set overlap (Jaccard), so no extra
+    embedding calls are needed.
+    """
+    if len(passages) < 3:
+        return passages
+    top = max(p.score for p in passages) or 1.0
+    words = [_words(p.text) for p in passages]
+    remaining = list(range(len(passages)))
+    order = []
+    while remaining:
+        def value(i):
+            redundancy = max(
+                (len(words[i] & words[j]) / (len(words[i] | words[j]) or 1) for j in order),
+                default=0.0,
+            )
+            return lambda_ * passages[i].score / top - (1 - lambda_) * redundancy
+        best = max(remaining, key=value)
+        order.append(best)
+        remaining.remove(best)
+    return [passages[i] for i in order]
+
+
+def _label(n: int, passage: Passage) -> str:
+    page, page_end = passage.page, passage.page_end
+    if page is None:
+        return f"[{n}]"
+    if page_end is not None and page_end != page:
+        return f"[{n}] (pages {page}-{page_end})"
+    return f"[{n}] (page {page})"
+
+
+def build_context(relevant_docs, max_tokens: int = CONTEXT_MAX_TOKENS,
+                  mmr_lambda: float = CONTEXT_MMR_LAMBDA) -> tuple[str, list[Passage]]:
+    """Prompt context from score-filtered chunks, within ``max_tokens`` (estimated).
+
+    Chunks are merged into passages, repeated sentences removed, then
+    passages are packed best first (or in MMR order with ``mmr_lambda``);
+    one that doesn't fit is skipped in favour of smaller ones after it.
+    Returns the context, numbered for citation, and the passages it holds.
+    """
+    passages = strip_duplicates(merge_chunks(relevant_docs))
+    if mmr_lambda is not None:
+        passages = mmr_order(passages, mmr_lambda)
+
+    blocks, packed, used = [], [], 0
+    for passage in passages:
+        block = f"{_label(len(packed) + 1, passage)}\n{passage.text}"
+        tokens = estimate_tokens(block)
+        if used + tokens > max_tokens:
+            if packed:
+                continue
+            # The best passage alone is over budget: send as much of it as fits
+            block = block[:max_tokens * CHARS_PER_TOKEN].rsplit(" ", 1)[0]
+            tokens = estimate_tokens(block)
+        blocks.append(block)
+        packed.append(passage)
+        used += tokens
+    return "\n\n".join(blocks), packed
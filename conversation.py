@@ -0,0 +1,119 @@
+import re
+import threading
+from collections import deque
+from llm import estimate_tokens
+from config import (
+    CHARS_PER_TOKEN,
+    MEMORY_WINDOW_TOKENS,
+    MEMORY_SUMMARY_TOKENS,
+    MEMORY_FOLLOW_UP_WORDS
+)
+
+# Questions that clearly lean on earlier turns: a pronoun in the first few
+# words ("Does it apply...", "What are their fees?"), a leading connective or
+# an explicit back-reference. A pronoun later on is usually resolved in the
+# question itself, and every match costs a rewrite call before answering.
+FOLLOW_UP = re.compile(
+    r"^\W*(?:\w+\s+){0,2}(it|its|they|them|their|this|that|these|those|he|she|his|her)\b"
+    r"|^\W*(and|but|or|so|then|also|what about|how about|why not)\b"
+    r"|\b(the above|the previous|the same|the former|the latter|mentioned)\b",
+    re.IGNORECASE,
+)
+
+
+def is_follow_up(question: str) -> bool:
+    """Whether ``question`` probably needs the conversation to make sense on its own."""
+    return bool(FOLLOW_UP.search(question)) or len(question.split()) <= MEMORY_FOLLOW_UP_WORDS
+
+
+def _clip(text: str, tokens: int, keep_end: bool = False) -> str:
+    """``text`` cut to about ``tokens`` (estimated)."""
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return "…" + text[-limit:] if keep_end else text[:limit] + "…"
+
+
+class ConversationMemory:
+    """Bounded memory of one conversation: recent turns verbatim, older ones summarized.
+
+    Turns stay in a window of ``window_tokens`` (estimated); turns pushed
+    out of it are folded into a running summary of at most
+    ``summary_tokens`` by ``summarize(summary, turns) -> str``, on a
+    background thread so answering never waits for it. Without a
+    summarizer (or if it fails) the evicted questions are appended to the
+    summary instead. Either way the memory, and so the cost of using it per
+    turn, stays bounded however long the conversation gets.
+    """
+
+    def __init__(self, window_tokens: int = MEMORY_WINDOW_TOKENS,
+                 summary_tokens: int = MEMORY_SUMMARY_TOKENS, summarize=None):
+        self.window_tokens = window_tokens
+        self.summary_tokens = summary_tokens
+        self.summarize = summarize
+        self.summary = ""
+        self.turns = deque()  # (question, answer), oldest first
+        self._tokens = 0
+        self._evicted = []    # Turns waiting to be folded into the summary
+        self._folding = False
+        self._generation = 0  # Bumped by clear(), so a fold in flight is discarded
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.turns or self.summary)
+
+    def add_turn(self, question: str, answer: str):
+        """Record a finished turn; older turns leave the window for the summary."""
+        # A single long answer must not push everything else out
+        turn = (_clip(question, self.window_tokens // 4), _clip(answer, self.window_tokens // 2))
+        with self._lock:
+            self.turns.append(turn)
+            self._tokens += estimate_tokens(turn[0] + turn[1])
+            while len(self.turns) > 1 and self._tokens > self.window_tokens:
+                old = self.turns.popleft()
+                self._tokens -= estimate_tokens(old[0] + old[1])
+                self._evicted.append(old)
+            if not self._evicted or self._folding:
+                return
+            self._folding = True
+        threading.Thread(target=self._fold, daemon=True).start()
+
+    def _fold(self):
+        """Fold evicted turns into the summary until none are left."""
+        while True:
+            with self._lock:
+                turns, self._evicted = self._evicted, []
+                summary, generation = self.summary, self._generation
+                if not turns:
+                    self._folding = False
+                    return
+            folded = None
+            if self.summarize is not None:
+                try:
+                    folded = self.summarize(summary, turns)
+                except Exception as e:
+                    print(f"⚠️ Conversation summary failed: {e}")
+            if folded is None:
+                folded = "\n".join([summary] + [f"- Asked: {q}" for q, _ in turns])
+            with self._lock:
+                if generation == self._generation:
+                    self.summary = _clip(folded.strip(), self.summary_tokens, keep_end=True)
+
+    def clear(self):
+        with self._lock:
+            self.turns.clear()
+            self._evicted = []
+            self._tokens = 0
+            self._generation += 1
+            self.summary = ""
+
+    def render(self) -> str:
+        """Summary and recent turns as prompt text."""
+        with self._lock:
+            summary, turns = self.summary, list(self.turns)
+        recent = format_turns(turns)
+        return f"Summary of earlier conversation: {summary}\n{recent}" if summary else recent
+
+
+def format_turns(turns) -> str:
+    return "\n".join(f"User: {q}\nAssistant: {a}" for q, a in turns)
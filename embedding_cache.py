@@ -0,0 +1,244 @@
+import os
+import re
+import hashlib
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from metrics import CACHE_LOOKUPS
+from config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_MB
+
+KEY_BYTES = 16        # blake2b digest size per cached chunk
+MIN_GROW_ROWS = 1024  # Grow the vector file in steps, not one row at a time
+
+
+def normalize_chunk(text: str) -> str:
+    """Collapse whitespace so re-extracted text hashes the same."""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model name, normalized chunk hash).
+
+    Vectors live in a memory-mapped float32 matrix (``vectors.f32``). The key
+    index (``index.npz``) is two fixed-width arrays: per-slot key digest and
+    last-used tick. Once the size cap is reached, the least recently used
+    slots are recycled.
+    """
+
+    def __init__(self, model_name: str, path: str = EMBEDDING_CACHE_PATH,
+                 max_mb: int = EMBEDDING_CACHE_MAX_MB):
+        self.model_name = model_name
+        self.path = os.path.join(path, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._dim = None
+        self._vectors = None  # np.memmap of shape (rows, dim)
+        self._keys = np.zeros((0, KEY_BYTES), dtype=np.uint8)
+        self._ticks = np.zeros(0, dtype=np.uint64)
+        self._slots = {}      # key digest -> row in the matrix
+        self._size = 0
+        self._tick = 0
+        self._load()
+
+    @property
+    def _vectors_file(self):
+        return os.path.join(self.path, "vectors.f32")
+
+    @property
+    def _index_file(self):
+        return os.path.join(self.path, "index.npz")
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of cached vectors under the size cap."""
+        if self._dim is None:
+            return 0
+        return max(1, self.max_bytes // (self._dim * 4))
+
+    def _key(self, text: str) -> bytes:
+        payload = f"{self.model_name}\0{normalize_chunk(text)}".encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=KEY_BYTES).digest()
+
+    def _load(self):
+        """Open an existing cache; start empty if it is missing or inconsistent."""
+        if not (os.path.exists(self._index_file) and os.path.exists(self._vectors_file)):
+            return
+        try:
+            with np.load(self._index_file, allow_pickle=False) as data:
+                dim = int(data["dim"])
+                keys = data["keys"]
+                ticks = data["ticks"]
+                tick = int(data["tick"])
+
+            rows = os.path.getsize(self._vectors_file) // (dim * 4)
+            if len(keys) > rows:
+                raise ValueError("index has more keys than stored vectors")
+
+            self._dim = dim
+            self._vectors = np.memmap(self._vectors_file, dtype=np.float32,
+                                      mode="r+", shape=(rows, dim))
+            self._keys = np.zeros((rows, KEY_BYTES), dtype=np.uint8)
+            self._ticks = np.zeros(rows, dtype=np.uint64)
+            self._keys[:len(keys)] = keys
+            self._ticks[:len(ticks)] = ticks
+            self._size = len(keys)
+            self._tick = tick
+            self._slots = {self._keys[i].tobytes(): i for i in range(self._size)}
+            print(f"🗃️ Embedding cache: {self._size} vectors loaded")
+
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable embedding cache: {e}")
+            self._dim = None
+            self._vectors = None
+            self._size = 0
+            self._slots = {}
+
+    def _ensure_rows(self, rows: int):
+        """Grow the memory-mapped matrix (and key arrays) to hold ``rows`` vectors."""
+        current = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= current:
+            return
+
+        new_rows = min(self.capacity, max(rows, current * 2, MIN_GROW_ROWS))
+        os.makedirs(self.path, exist_ok=True)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_file, "ab") as f:
+            f.truncate(new_rows * self._dim * 4)
+        self._vectors = np.memmap(self._vectors_file, dtype=np.float32,
+                                  mode="r+", shape=(new_rows, self._dim))
+
+        keys = np.zeros((new_rows, KEY_BYTES), dtype=np.uint8)
+        ticks = np.zeros(new_rows, dtype=np.uint64)
+        keys[:self._size] = self._keys[:self._size]
+        ticks[:self._size] = self._ticks[:self._size]
+        self._keys, self._ticks = keys, ticks
+
+    def _allocate(self, count: int) -> list[int]:
+        """Return ``count`` free slots, evicting least recently used ones if full."""
+        free = max(0, min(count, self.capacity - self._size))
+        self._ensure_rows(self._size + free)
+        slots = list(range(self._size, self._size + free))
+        self._size += free
+        # Fresh slots must not be picked as eviction victims below
+        self._ticks[slots] = self._tick
+
+        evict = count - free
+        if evict > 0:
+            victims = np.argpartition(self._ticks[:self._size], evict - 1)[:evict]
+            for slot in victims:
+                self._slots.pop(self._keys[slot].tobytes(), None)
+            slots.extend(int(s) for s in victims)
+            self.evictions += evict
+        return slots
+
+    def get_many(self, texts: list[str]) -> list:
+        """Look up vectors for ``texts``; misses come back as ``None``."""
+        keys = [self._key(t) for t in texts]
+        results = []
+        with self._lock:
+            self._tick += 1
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    self._ticks[slot] = self._tick
+                    results.append(np.array(self._vectors[slot]))
+        hits = sum(r is not None for r in results)
+        CACHE_LOOKUPS.inc(hits, cache="embedding", result="hit")
+        CACHE_LOOKUPS.inc(len(results) - hits, cache="embedding", result="miss")
+        return results
+
+    def put_many(self, texts: list[str], vectors):
+        """Store vectors for ``texts`` (same order)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) == 0:
+            return
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+            if vectors.shape[1] != self._dim:
+                print(f"⚠️ Embedding cache dim mismatch ({vectors.shape[1]} != {self._dim}), not caching")
+                return
+
+            self._tick += 1
+            pending = {}
+            for text, vector in zip(texts, vectors):
+                key = self._key(text)
+                slot = self._slots.get(key)
+                if slot is not None:
+                    self._ticks[slot] = self._tick
+                else:
+                    pending[key] = vector
+
+            if not pending:
+                return
+
+            slots = self._allocate(min(len(pending), self.capacity))
+            for slot, (key, vector) in zip(slots, pending.items()):
+                self._vectors[slot] = vector
+                self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._ticks[slot] = self._tick
+                self._slots[key] = slot
+
+    def flush(self):
+        """Persist the key index and sync the vector matrix to disk."""
+        with self._lock:
+            if self._vectors is None:
+                return
+            self._vectors.flush()
+            tmp_file = self._index_file + ".tmp"
+            with open(tmp_file, "wb") as f:
+                np.savez(
+                    f,
+                    dim=np.int64(self._dim),
+                    tick=np.int64(self._tick),
+                    keys=self._keys[:self._size],
+                    ticks=self._ticks[:self._size],
+                )
+            os.replace(tmp_file, self._index_file)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and occupancy."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": self._size,
+            "capacity": self.capacity,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the model."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.cache.get_many(texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents([texts[i] for i in missing])
+            self.cache.put_many([texts[i] for i in missing], new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = vector
+
+        print(f"🗃️ Embedding cache: {len(texts) - len(missing)}/{len(texts)} chunks reused")
+        return [np.asarray(v, dtype=np.float32).tolist() for v in vectors]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,57 @@
+import threading
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+from config import EMBEDDING_MODEL, EMBEDDING_BACKEND, MAX_EMBED_BATCH, EMBEDDING_CACHE_ENABLED
+
+
+# Process-wide embedding model, shared by every VectorStore / RAGChain
+# and every Streamlit session running in this server process.
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings():
+    """Return the shared embedding model, loading it on first use."""
+    global _embeddings
+    if _embeddings is not None:
+        return _embeddings
+
+    with _embeddings_lock:
+        # Another thread may have finished loading while we waited
+        if _embeddings is None:
+            print(f"Loading embedding model: {EMBEDDING_MODEL} ({EMBEDDING_BACKEND})")
+            embeddings = _create_embeddings(EMBEDDING_BACKEND)
+            print("✅ Embedding model loaded (CPU mode)")
+
+            # Backends produce interchangeable vectors, so they share the cache
+            if EMBEDDING_CACHE_ENABLED:
+                embeddings = CachedEmbeddings(embeddings, EmbeddingCache(EMBEDDING_MODEL))
+            # Publish only the fully built object to lock-free readers
+            _embeddings = embeddings
+    return _embeddings
+
+
+def _create_embeddings(backend: str):
+    if backend == "onnx":
+        from onnx_embeddings import load_onnx_embeddings
+        return load_onnx_embeddings(EMBEDDING_MODEL)
+    if backend != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend!r}")
+    # Imported here so the onnx backend never loads sentence-transformers
+    from langchain_community.embeddings import SentenceTransformerEmbeddings
+    return SentenceTransformerEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={
+            'device': 'cpu',
+        },
+        encode_kwargs={
+            # Callers size their own batches; don't re-split below that
+            'batch_size': MAX_EMBED_BATCH,
+        }
+    )
+
+
+def warmup_embeddings():
+    """Load the shared model and run one dummy query so the first user doesn't pay for it."""
+    embeddings = get_embeddings()
+    embeddings.embed_query("warmup")
+    return embeddings
@@ -0,0 +1,81 @@
+import psutil
+import numpy as np
+from langchain.schema import Document
+import faiss
+from ann_index import build_index, metric_of, rebuild_if_needed, resolve_index_type
+from index_storage import new_vectorstore
+from config import (
+    INDEX_METRIC,
+    MIN_EMBED_BATCH,
+    MAX_EMBED_BATCH,
+    EMBED_BYTES_PER_CHUNK,
+    INGEST_MEMORY_FRACTION
+)
+
+
+def adaptive_batch_size() -> int:
+    """Embedding batch size that fits in the RAM currently available."""
+    budget = psutil.virtual_memory().available * INGEST_MEMORY_FRACTION
+    return int(max(MIN_EMBED_BATCH, min(MAX_EMBED_BATCH, budget // EMBED_BYTES_PER_CHUNK)))
+
+
+class IndexBuilder:
+    """Collects one document's vectors in a preallocated matrix, then indexes them once.
+
+    Replaces per-batch ``FAISS.from_documents`` + ``merge_from``: vectors go
+    into a single float32 matrix (grown by doubling when the chunk count
+    isn't known up front) and are added to the index in one call, so a new
+    index can be built as the right type for the document's size.
+
+    Memory grows with the document, not the batch: every vector and
+    Document is kept until ``commit``. The chunk text is small next to the
+    pages and model activations the streaming ingest keeps bounded.
+    """
+
+    def __init__(self, expected_chunks: int = 0):
+        self.expected_chunks = expected_chunks
+        self.vectors = None
+        self.count = 0
+        self.ids = []
+        self.documents = []
+
+    def add(self, ids: list[str], documents: list[Document], vectors):
+        """Append one embedded batch."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self._reserve(self.count + len(vectors), vectors.shape[1])
+        self.vectors[self.count:self.count + len(vectors)] = vectors
+        self.count += len(vectors)
+        self.ids.extend(ids)
+        self.documents.extend(documents)
+
+    def _reserve(self, rows: int, dim: int):
+        if self.vectors is None:
+            capacity = max(rows, self.expected_chunks, MIN_EMBED_BATCH)
+            self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        elif rows > len(self.vectors):
+            grown = np.empty((max(rows, 2 * len(self.vectors)), dim), dtype=np.float32)
+            grown[:self.count] = self.vectors[:self.count]
+            self.vectors = grown
+
+    def commit(self, vectorstore, embeddings):
+        """Add everything to ``vectorstore`` (or build a new one); returns the store."""
+        if self.count == 0:
+            return vectorstore
+        matrix = self.vectors[:self.count]
+        metric = INDEX_METRIC if vectorstore is None else metric_of(vectorstore.index)
+        if metric == "cosine":
+            faiss.normalize_L2(matrix)  # In place; the matrix is ours
+
+        if vectorstore is None:
+            # New index: build the right type for its size directly, no flat detour
+            index = build_index(matrix, resolve_index_type(self.count), metric)
+            vectorstore = new_vectorstore(index, embeddings)
+        else:
+            vectorstore.index.add(matrix)
+
+        # FAISS labels and chunk store positions advance together
+        vectorstore.docstore.append(self.ids, self.documents)
+        rebuild_if_needed(vectorstore)
+
+        self.vectors = None
+        return vectorstore
@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from lexical_index import LexicalIndex
+from metrics import CACHE_LOOKUPS
+from config import INDEX_CACHE_MAX_MB
+
+
+class LoadedIndex:
+    """A FAISS index, its BM25 index and document registry, resident in memory."""
+
+    def __init__(self, vectorstore=None, documents: dict = None, version: float = 0.0,
+                 lexical: LexicalIndex = None):
+        self.vectorstore = vectorstore
+        self.documents = documents if documents is not None else {}
+        self.lexical = lexical if lexical is not None else LexicalIndex()
+        # Changes whenever the index is saved; caches keyed on it go stale
+        self.version = version
+        # Serializes writers (and searches) on this one index
+        self.lock = threading.RLock()
+
+    def nbytes(self) -> int:
+        """Approximate resident size: vectors plus chunk data held in memory."""
+        if self.vectorstore is None:
+            return 0
+        index = self.vectorstore.index
+        return (index.ntotal * index.d * 4 + self.vectorstore.docstore.nbytes()
+                + self.lexical.nbytes())
+
+
+class IndexCache:
+    """Process-wide LRU of loaded indexes, bounded by a byte budget.
+
+    Keys are index directories. A miss calls the supplied loader once, even
+    when several sessions ask for the same index at the same time.
+    """
+
+    def __init__(self, max_mb: int = INDEX_CACHE_MAX_MB):
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (LoadedIndex, nbytes)
+        self._load_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, loader) -> LoadedIndex:
+        """Return the cached index for ``key``, loading it on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_LOOKUPS.inc(cache="index", result="hit")
+                return self._entries[key][0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Someone else may have loaded it while we waited
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_LOOKUPS.inc(cache="index", result="hit")
+                    return self._entries[key][0]
+                self.misses += 1
+                CACHE_LOOKUPS.inc(cache="index", result="miss")
+
+            try:
+                entry = loader()
+                self.put(key, entry)
+                return entry
+            finally:
+                # Later misses make a new lock; keeping one per key ever seen would leak
+                with self._lock:
+                    if self._load_locks.get(key) is load_lock:
+                        del self._load_locks[key]
+
+    def put(self, key: str, entry: LoadedIndex):
+        """Insert or re-measure ``entry`` and evict down to the budget."""
+        nbytes = entry.nbytes()
+        with self._lock:
+            self._entries[key] = (entry, nbytes)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def invalidate(self, key: str):
+        """Drop ``key`` so the next access reloads it from disk."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _evict(self):
+        total = sum(nbytes for _, nbytes in self._entries.values())
+        # Never evict the most recently used entry, even if it alone exceeds the budget
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, (_, nbytes) = self._entries.popitem(last=False)
+            total -= nbytes
+            self.evictions += 1
+            print(f"♻️ Evicted index {key} from memory ({nbytes / (1024 * 1024):.1f}MB)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": sum(nbytes for _, nbytes in self._entries.values()),
+            }
+
+
+_index_cache = None
+_index_cache_lock = threading.Lock()
+
+
+def get_index_cache() -> IndexCache:
+    """Return the process-wide index cache."""
+    global _index_cache
+    with _index_cache_lock:
+        if _index_cache is None:
+            _index_cache = IndexCache()
+        return _index_cache
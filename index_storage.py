@@ -0,0 +1,300 @@
+import os
+import json
+import mmap
+import time
+import faiss
+import numpy as np
+from collections.abc import Mapping
+from langchain.schema import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from ann_index import apply_search_params, index_type_of, metric_of
+from config import EMBEDDING_MODEL, EMBEDDING_BACKEND, CHUNK_SIZE, CHUNK_OVERLAP
+
+FORMAT_VERSION = 1
+INDEX_FILE = "index.faiss"
+MANIFEST_FILE = "manifest.json"
+OFFSETS_FILE = "offsets.npy"
+COLUMNS = ("ids", "texts", "meta")  # One <column>.bin file each
+
+# True mmap of the vector codes where FAISS supports it (shared via page cache)
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+class ChunkStore(Docstore, AddableMixin):
+    """Chunk ids, texts and metadata stored column-wise by FAISS position.
+
+    On disk each column is UTF-8 records back to back (``ids.bin``,
+    ``texts.bin``, ``meta.bin``) and ``offsets.npy`` ((n+1) x 3 int64) says
+    where each record starts. Files are memory-mapped, so opening is O(1)
+    and a record is decoded only when a search returns it. Rows added since
+    the last save stay in memory until ``save`` appends them.
+    """
+
+    def __init__(self, path: str = None):
+        self._path = None
+        self._maps = {}
+        self._offsets = np.zeros((1, len(COLUMNS)), dtype=np.int64)
+        self._tail = []           # (chunk id, Document) not yet on disk
+        self._rewrite = False     # A delete compacted rows; save must rewrite
+        self._positions = None    # chunk id -> position, built on first lookup
+        if path and os.path.exists(os.path.join(path, OFFSETS_FILE)):
+            self._open(path)
+
+    def _open(self, path: str):
+        self._close()
+        self._path = path
+        self._offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        for column in COLUMNS:
+            with open(os.path.join(path, f"{column}.bin"), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                # mmap can't map empty files; an empty column has no records anyway
+                self._maps[column] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def _close(self):
+        for column_map in self._maps.values():
+            if isinstance(column_map, mmap.mmap):
+                column_map.close()
+        self._maps = {}
+
+    @property
+    def _base(self) -> int:
+        """Rows stored on disk."""
+        return len(self._offsets) - 1
+
+    def __len__(self) -> int:
+        return self._base + len(self._tail)
+
+    def _record(self, position: int, column: int) -> str:
+        start, end = self._offsets[position, column], self._offsets[position + 1, column]
+        return self._maps[COLUMNS[column]][start:end].decode("utf-8")
+
+    def id_at(self, position: int) -> str:
+        if position < self._base:
+            return self._record(position, 0)
+        return self._tail[position - self._base][0]
+
+    def document_at(self, position: int) -> Document:
+        if position < self._base:
+            return Document(
+                page_content=self._record(position, 1),
+                metadata=json.loads(self._record(position, 2))
+            )
+        return self._tail[position - self._base][1]
+
+    def position_of(self, chunk_id: str) -> int:
+        """Position of a chunk id (builds the id map once, on first use)."""
+        if self._positions is None:
+            self._positions = {self.id_at(p): p for p in range(len(self))}
+        return self._positions[chunk_id]
+
+    def search(self, search):
+        """Docstore lookup by position (what the FAISS wrapper passes) or chunk id."""
+        try:
+            position = search if isinstance(search, (int, np.integer)) else self.position_of(search)
+            return self.document_at(int(position))
+        except (KeyError, IndexError):
+            return f"ID {search} not found."
+
+    def add(self, texts: dict):
+        """Append ``{chunk id: Document}`` in order (AddableMixin API)."""
+        self.append(list(texts), list(texts.values()))
+
+    def append(self, ids: list[str], documents: list[Document]):
+        start = len(self)
+        self._tail.extend(zip(ids, documents))
+        if self._positions is not None:
+            self._positions.update({chunk_id: start + n for n, chunk_id in enumerate(ids)})
+
+    def delete(self, ids: list):
+        """Remove chunks by id; positions after them shift down (like IndexFlat.remove_ids)."""
+        doomed = {self.position_of(chunk_id) for chunk_id in ids}
+        self.keep_positions([p for p in range(len(self)) if p not in doomed])
+
+    def keep_positions(self, keep: list[int]):
+        """Keep only ``keep`` (ascending), renumbered from 0. Rare, so O(n)."""
+        rows = [(self.id_at(p), self.document_at(p)) for p in keep]
+        self._close()
+        self._offsets = np.zeros((1, len(COLUMNS)), dtype=np.int64)
+        self._tail = rows
+        self._positions = None
+        self._rewrite = True
+
+    def nbytes(self) -> int:
+        """Memory not backed by the page cache: unsaved rows and the id map."""
+        tail = sum(len(doc.page_content) for _, doc in self._tail)
+        ids = 0 if self._positions is None else 100 * len(self._positions)
+        return 2 * tail + ids
+
+    def save(self, path: str):
+        """Append new rows to the column files, or rewrite them after a delete."""
+        os.makedirs(path, exist_ok=True)
+        rewrite = self._rewrite or self._path != path
+        if rewrite:
+            rows = [(self.id_at(p), self.document_at(p)) for p in range(len(self))]
+            offsets = [np.zeros(len(COLUMNS), dtype=np.int64)]
+            suffix = ".tmp"
+        else:
+            rows = self._tail
+            offsets = [np.asarray(self._offsets[-1], dtype=np.int64)]
+            suffix = ""
+
+        files = {
+            column: open(os.path.join(path, f"{column}.bin{suffix}"), "wb" if rewrite else "ab")
+            for column in COLUMNS
+        }
+        try:
+            for chunk_id, doc in rows:
+                records = (
+                    chunk_id.encode("utf-8"),
+                    doc.page_content.encode("utf-8"),
+                    json.dumps(doc.metadata).encode("utf-8"),
+                )
+                for column, record in zip(COLUMNS, records):
+                    files[column].write(record)
+                offsets.append(offsets[-1] + [len(r) for r in records])
+        finally:
+            for f in files.values():
+                f.close()
+
+        all_offsets = np.vstack(offsets) if rewrite else np.vstack([self._offsets[:-1]] + offsets)
+        self._close()
+        # offsets.npy goes last: readers never see offsets past what was written
+        if rewrite:
+            for column in COLUMNS:
+                os.replace(os.path.join(path, f"{column}.bin.tmp"), os.path.join(path, f"{column}.bin"))
+        with open(os.path.join(path, OFFSETS_FILE + ".tmp"), "wb") as f:
+            np.save(f, all_offsets)
+        os.replace(os.path.join(path, OFFSETS_FILE + ".tmp"), os.path.join(path, OFFSETS_FILE))
+
+        positions = self._positions
+        self._tail = []
+        self._rewrite = False
+        self._open(path)
+        self._positions = positions
+
+
+class PositionIds(Mapping):
+    """FAISS label -> docstore key. Positions are the keys, so this is a view, not a dict."""
+
+    def __init__(self, store: ChunkStore):
+        self.store = store
+
+    def __getitem__(self, label):
+        if not 0 <= label < len(self.store):
+            raise KeyError(label)
+        return int(label)
+
+    def __iter__(self):
+        return iter(range(len(self.store)))
+
+    def __len__(self):
+        return len(self.store)
+
+
+def distance_strategy(index) -> DistanceStrategy:
+    """How LangChain should read ``index`` scores (for ``as_retriever``)."""
+    if metric_of(index) == "cosine":
+        return DistanceStrategy.MAX_INNER_PRODUCT
+    return DistanceStrategy.EUCLIDEAN_DISTANCE
+
+
+def new_vectorstore(index, embeddings) -> FAISS:
+    """Wrap ``index`` in a LangChain FAISS store backed by an empty ChunkStore."""
+    store = ChunkStore()
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=store,
+        index_to_docstore_id=PositionIds(store),
+        distance_strategy=distance_strategy(index)
+    )
+
+
+def is_mmapped(vectorstore) -> bool:
+    return getattr(vectorstore, "mmapped", False)
+
+
+def make_writable(vectorstore, path: str):
+    """Swap a memory-mapped (read-only) index for an owned copy before mutating it."""
+    if is_mmapped(vectorstore):
+        vectorstore.index = faiss.read_index(os.path.join(path, INDEX_FILE))
+        apply_search_params(vectorstore.index)
+        vectorstore.mmapped = False
+
+
+def save_index(path: str, vectorstore: FAISS) -> dict:
+    """Write index, chunk columns and manifest (returned). Never pickles."""
+    os.makedirs(path, exist_ok=True)
+    if not is_mmapped(vectorstore):
+        tmp_file = os.path.join(path, INDEX_FILE + ".tmp")
+        faiss.write_index(vectorstore.index, tmp_file)
+        os.replace(tmp_file, os.path.join(path, INDEX_FILE))
+    vectorstore.docstore.save(path)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_backend": EMBEDDING_BACKEND,  # Informational: backends are interchangeable
+        "dim": vectorstore.index.d,
+        "metric": metric_of(vectorstore.index),
+        "index_type": index_type_of(vectorstore.index),
+        "num_chunks": len(vectorstore.docstore),
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "updated_at": time.time(),
+    }
+    with open(os.path.join(path, MANIFEST_FILE + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(path, MANIFEST_FILE + ".tmp"), os.path.join(path, MANIFEST_FILE))
+
+    # Drop the old pickle docstore if this directory was written by an older version
+    legacy_file = os.path.join(path, "index.pkl")
+    if os.path.exists(legacy_file):
+        os.remove(legacy_file)
+    return manifest
+
+
+def read_manifest(path: str):
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_index(path: str, embeddings):
+    """Open a saved index: mmap the FAISS file and chunk columns. O(1) in corpus size.
+
+    Returns None if there is no index in the new format at ``path``.
+    """
+    manifest = read_manifest(path)
+    if manifest is None:
+        if os.path.exists(os.path.join(path, "index.pkl")):
+            print("⚠️ Found a legacy pickle index; not loading it. Please re-upload the documents.")
+        return None
+
+    if manifest["format_version"] > FORMAT_VERSION:
+        raise Exception(f"Index format v{manifest['format_version']} is newer than supported v{FORMAT_VERSION}")
+    if manifest["embedding_model"] != EMBEDDING_MODEL:
+        raise Exception(
+            f"Index was built with {manifest['embedding_model']}, "
+            f"but EMBEDDING_MODEL is {EMBEDDING_MODEL}. Re-upload the documents."
+        )
+
+    index = faiss.read_index(os.path.join(path, INDEX_FILE), MMAP_FLAG)
+    apply_search_params(index)
+    store = ChunkStore(path)
+    if index.ntotal != len(store) or index.d != manifest["dim"]:
+        raise Exception(f"Index at {path} is inconsistent ({index.ntotal} vectors, {len(store)} chunks)")
+
+    vectorstore = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=store,
+        index_to_docstore_id=PositionIds(store),
+        distance_strategy=distance_strategy(index)
+    )
+    vectorstore.mmapped = True
+    return vectorstore
@@ -0,0 +1,147 @@
+import os
+import json
+import contextlib
+import uuid
+import shutil
+import hashlib
+import PyPDF2
+from langchain.schema import Document
+from pdf_processor import SEPARATORS, STREAM_SPLIT_CHARS
+from config import (
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    EMBEDDING_MODEL,
+    STREAM_MAX_PAGES,
+    INGEST_CACHE_PATH,
+    INGEST_CACHE_MAX_MB
+)
+
+HEADER_WIDTH = 40
+
+
+def _header(num_pages: int) -> str:
+    # Padded to a fixed width so the real count can overwrite it in place
+    return json.dumps({"num_pages": num_pages}).ljust(HEADER_WIDTH) + "\n"
+
+
+def _digest(*parts) -> str:
+    return hashlib.blake2b(json.dumps(parts).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def fingerprint(file_hash: str) -> dict:
+    """What an ingest's output depends on, stage by stage.
+
+    Each stage's key covers its own settings plus everything upstream, so
+    changing ``CHUNK_SIZE`` invalidates chunks but not extracted pages.
+    """
+    extract = _digest(file_hash, STREAM_MAX_PAGES, PyPDF2.__version__)
+    chunk = _digest(extract, CHUNK_SIZE, CHUNK_OVERLAP, STREAM_SPLIT_CHARS, SEPARATORS)
+    embed = _digest(chunk, EMBEDDING_MODEL)
+    return {"file": file_hash, "extract": extract, "chunk": chunk, "embed": embed}
+
+
+class IngestCache:
+    """Extracted pages and chunks on disk, keyed by stage fingerprint.
+
+    Layout: ``<root>/<file hash>/pages-<extract fp>.jsonl`` and
+    ``chunks-<chunk fp>.jsonl``. Stages are recorded while they stream
+    through and only committed (renamed into place) once fully consumed,
+    so a failed or cancelled ingest never leaves a partial entry. The
+    embed stage is covered by the embedding cache, which is keyed by
+    chunk text and model.
+    """
+
+    def __init__(self, path: str = INGEST_CACHE_PATH, max_mb: int = INGEST_CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = max_mb * 1024 * 1024
+
+    def _file(self, fp: dict, stage: str) -> str:
+        key = fp["extract"] if stage == "pages" else fp["chunk"]
+        return os.path.join(self.path, fp["file"], f"{stage}-{key}.jsonl")
+
+    def has(self, fp: dict, stage: str) -> bool:
+        return os.path.exists(self._file(fp, stage))
+
+    def pages(self, fp: dict, progress=None):
+        """Replay cached ``(page_number, text)`` pairs, reporting progress like ``iter_pages``."""
+        path = self._file(fp, "pages")
+        os.utime(os.path.dirname(path))  # Mark recently used for pruning
+        with open(path, encoding="utf-8") as f:
+            num_pages = json.loads(f.readline())["num_pages"]
+            for line in f:
+                page_number, text = json.loads(line)
+                if progress is not None:
+                    progress(page_number, num_pages)
+                yield page_number, text
+        # Trailing blank pages aren't stored but still count as read
+        if progress is not None:
+            progress(num_pages, num_pages)
+
+    def chunks(self, fp: dict):
+        """Replay cached chunks as fresh Documents."""
+        path = self._file(fp, "chunks")
+        os.utime(os.path.dirname(path))
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                yield Document(page_content=record["text"], metadata=record["metadata"])
+
+    def num_pages(self, fp: dict) -> int:
+        with open(self._file(fp, "pages"), encoding="utf-8") as f:
+            return json.loads(f.readline())["num_pages"]
+
+    def record_pages(self, fp: dict, pages, num_pages):
+        """Pass pages through, saving them for next time.
+
+        Empty pages are skipped by ``iter_pages``, so the header takes the
+        document's page count from ``num_pages()``, called once every page
+        has been read. It is written last, over a fixed-width placeholder.
+        """
+        with self._recording(fp, "pages") as f:
+            f.write(_header(0))
+            for page_number, text in pages:
+                f.write(json.dumps([page_number, text]) + "\n")
+                yield page_number, text
+            f.seek(0)
+            f.write(_header(num_pages()))
+
+    def record_chunks(self, fp: dict, chunks):
+        """Pass chunks through, saving them (before ``add_document`` tags them) for next time."""
+        with self._recording(fp, "chunks") as f:
+            for chunk in chunks:
+                f.write(json.dumps({"text": chunk.page_content, "metadata": dict(chunk.metadata)}) + "\n")
+                yield chunk
+
+    @contextlib.contextmanager
+    def _recording(self, fp: dict, stage: str):
+        """A temp file rows are written to as they stream; renamed into place only on success."""
+        path = self._file(fp, stage)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                yield f
+            os.replace(tmp_path, path)
+        except BaseException:
+            # Failed, cancelled or abandoned (GeneratorExit): no partial entry
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        print(f"🗃️ Cached {stage} for {fp['file'][:12]}")
+        self.prune()
+
+    def prune(self):
+        """Drop the least recently used files' entries beyond ``max_bytes``."""
+        if not os.path.isdir(self.path):
+            return
+        entries = []
+        for name in os.listdir(self.path):
+            entry = os.path.join(self.path, name)
+            size = sum(f.stat().st_size for f in os.scandir(entry) if f.is_file())
+            entries.append((os.path.getmtime(entry), size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
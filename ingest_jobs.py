@@ -0,0 +1,232 @@
+import io
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from pdf_processor import PDFProcessor
+from ingest_cache import IngestCache, fingerprint
+from vector_store import VectorStore, IngestCancelled
+from config import INGEST_WORKERS, INGEST_EXTRACT_WORKERS, INGEST_JOB_HISTORY
+
+ACTIVE = ("queued", "running")
+
+
+def file_hash(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+class IngestJob:
+    """One queued upload and its live progress (read by UI/API polling)."""
+
+    def __init__(self, namespace: str, name: str, pdf_hash: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.namespace = namespace
+        self.name = name
+        self.file_hash = pdf_hash
+        self.fingerprint = fingerprint(pdf_hash)
+        self.replace_doc_id = None  # Same file indexed under older settings
+        self.reused = []            # Stages served from the ingest cache
+        self.status = "queued"      # queued | running | done | failed | cancelled
+        self.stage = "queued"       # queued | extracting | indexing | done
+        self.pages_done = 0
+        self.pages_total = 0
+        self.chunks_embedded = 0
+        self.doc_id = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status not in ACTIVE
+
+    @property
+    def fraction(self) -> float:
+        """Rough overall progress in [0, 1]: pages drive the first 90%."""
+        if self.status == "done":
+            return 1.0
+        if self.stage == "indexing":
+            return 0.9
+        return 0.9 * self.pages_done / self.pages_total if self.pages_total else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "namespace": self.namespace,
+            "name": self.name,
+            "file_hash": self.file_hash,
+            "status": self.status,
+            "stage": self.stage,
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+            "chunks_embedded": self.chunks_embedded,
+            "reused": self.reused,
+            "progress": round(self.fraction, 3),
+            "doc_id": self.doc_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestQueue:
+    """Background ingestion: a bounded worker pool fed by ``submit``.
+
+    Uploads are deduplicated by SHA-256 per namespace: a file that is
+    queued or being ingested returns that job, and one the index already
+    holds returns a finished job, instead of doing the work twice. A file indexed under different
+    extract/chunk/embed settings is re-ingested in place, redoing only the
+    stages whose fingerprint changed (see ``IngestCache``).
+    """
+
+    def __init__(self, max_workers: int = INGEST_WORKERS,
+                 extract_workers: int = INGEST_EXTRACT_WORKERS):
+        self.extract_workers = extract_workers
+        self.cache = IngestCache()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs = OrderedDict()  # job id -> IngestJob, oldest first
+        self._lock = threading.Lock()
+
+    def submit(self, namespace: str, name: str, pdf_bytes: bytes) -> IngestJob:
+        pdf_hash = file_hash(pdf_bytes)
+        fp = fingerprint(pdf_hash)
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                # Finished jobs don't count: the document may have been removed since
+                if (job.namespace, job.fingerprint) == (namespace, fp) and job.status in ACTIVE:
+                    print(f"♻️ {name} is already queued (job {job.id})")
+                    return job
+
+            job = IngestJob(namespace, name, pdf_hash)
+            indexed, info = self._indexed_doc(namespace, pdf_hash)
+            if indexed is not None and info.get("fingerprint") == job.fingerprint:
+                print(f"♻️ {name} is already indexed as {indexed}")
+                job.status = job.stage = "done"
+                job.doc_id = indexed
+                job.reused = ["pages", "chunks", "vectors"]
+                job.finished_at = job.created_at
+            elif indexed is not None:
+                print(f"🔁 {name} was indexed with other settings; updating {indexed}")
+                job.replace_doc_id = indexed
+            self._jobs[job.id] = job
+            self._trim()
+
+        if not job.finished:
+            self._pool.submit(self._run, job, pdf_bytes)
+            print(f"📥 Queued ingest of {name} (job {job.id})")
+        return job
+
+    def get(self, job_id: str) -> IngestJob:
+        return self._jobs.get(job_id)
+
+    def jobs(self, namespace: str = None) -> list[IngestJob]:
+        with self._lock:
+            return [j for j in self._jobs.values() if namespace is None or j.namespace == namespace]
+
+    def cancel(self, job_id: str) -> bool:
+        """Ask a queued or running job to stop; it ends at the next page or batch."""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_event.set()
+        return True
+
+    def _indexed_doc(self, namespace: str, pdf_hash: str):
+        for doc_id, info in VectorStore(namespace).documents.items():
+            if info.get("file_hash") == pdf_hash:
+                return doc_id, info
+        return None, None
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond INGEST_JOB_HISTORY."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - INGEST_JOB_HISTORY)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: IngestJob, pdf_bytes: bytes):
+        if job.cancel_event.is_set():
+            job.status = job.stage = "cancelled"
+            job.finished_at = time.time()
+            return
+
+        job.status, job.stage = "running", "extracting"
+        job.started_at = time.time()
+
+        def on_page(pages_done, pages_total):
+            job.pages_done, job.pages_total = pages_done, pages_total
+            if job.cancel_event.is_set():
+                raise IngestCancelled(f"Ingest of {job.name} cancelled")
+
+        def on_progress(stage, chunks_embedded):
+            job.chunks_embedded = chunks_embedded
+            if stage == "indexing":
+                job.stage = "indexing"
+
+        trace = metrics.start_trace("ingest", namespace=job.namespace, job_id=job.id)
+        try:
+            with trace.active():
+                job.doc_id = VectorStore(job.namespace).add_document(
+                    self._chunks(job, pdf_bytes, on_page),
+                    name=job.name,
+                    doc_id=job.replace_doc_id,
+                    metadata={"file_hash": job.file_hash, "fingerprint": job.fingerprint},
+                    progress=on_progress,
+                    cancel_event=job.cancel_event
+                )
+            job.status = job.stage = "done"
+            print(f"✅ Ingest job {job.id} done ({job.chunks_embedded} chunks)")
+        except IngestCancelled:
+            job.status = job.stage = "cancelled"
+            print(f"⏹️ Ingest job {job.id} cancelled")
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+            print(f"❌ Ingest job {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            trace.finish(status=job.status, pages=job.pages_total,
+                         chunks=job.chunks_embedded, reused=job.reused)
+
+    def _chunks(self, job: IngestJob, pdf_bytes: bytes, on_page):
+        """The job's chunk stream, starting from the latest cached stage."""
+        fp = job.fingerprint
+        if self.cache.has(fp, "chunks"):
+            job.reused = ["pages", "chunks"]
+            job.pages_done = job.pages_total = self.cache.num_pages(fp)
+            print(f"♻️ Reusing cached chunks for {job.name}")
+            return self.cache.chunks(fp)
+
+        processor = PDFProcessor(extract_workers=self.extract_workers)
+        if self.cache.has(fp, "pages"):
+            job.reused = ["pages"]
+            print(f"♻️ Reusing extracted pages for {job.name}; re-chunking")
+            pages = self.cache.pages(fp, progress=on_page)
+        else:
+            pages = self.cache.record_pages(
+                fp, processor.iter_pages(io.BytesIO(pdf_bytes), progress=on_page),
+                num_pages=lambda: job.pages_total
+            )
+        return self.cache.record_chunks(fp, processor.iter_chunks(pages))
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel_event.set()
+        self._pool.shutdown(wait=True)
+
+
+_ingest_queue = None
+_ingest_queue_lock = threading.Lock()
+
+
+def get_ingest_queue() -> IngestQueue:
+    """Return the process-wide ingest queue (shared by every session)."""
+    global _ingest_queue
+    with _ingest_queue_lock:
+        if _ingest_queue is None:
+            _ingest_queue = IngestQueue()
+        return _ingest_queue
@@ -0,0 +1,195 @@
+import os
+import re
+import json
+import math
+import numpy as np
+from collections import Counter
+from config import BM25_K1, BM25_B
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+PART_RE = re.compile(r"[-_./:]")
+STOPWORDS = frozenset(
+    "a an and are as at be by do does did for from has have how in is it of on or "
+    "say says said that the this to was were what when where which who why will with".split()
+)
+VOCAB_FILE = "bm25_vocab.json"
+ARRAYS = ("offsets", "postings", "tfs", "lengths")  # One bm25_<name>.npy each
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens. Identifiers like ``AB-1234`` or ``4.2.1`` stay
+    whole (exact matches score high) and their parts are indexed too."""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in PART_RE.split(token) if part and part not in STOPWORDS)
+    return tokens
+
+
+class LexicalIndex:
+    """BM25 inverted index over chunk texts, keyed by FAISS position.
+
+    Saved postings are one flat array per field: term ``t`` owns
+    ``postings[offsets[t]:offsets[t + 1]]`` (chunk positions, ascending)
+    and the matching ``tfs``. Files are memory-mapped on load. Chunks
+    added since the last save sit in small per-term tail lists and are
+    merged into the arrays by ``save``.
+    """
+
+    def __init__(self, path: str = None):
+        self.vocab = {}  # term -> term id
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._postings = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.uint16)
+        self._lengths = np.zeros(0, dtype=np.uint32)
+        self._tail = {}           # term id -> ([positions], [tfs]) not yet saved
+        self._tail_lengths = []
+        self._total_length = 0
+        if path and os.path.exists(os.path.join(path, VOCAB_FILE)):
+            self._open(path)
+
+    @classmethod
+    def build(cls, docstore) -> "LexicalIndex":
+        """Index every chunk of an existing docstore (for indexes saved before BM25)."""
+        index = cls()
+        index.add(docstore.document_at(p).page_content for p in range(len(docstore)))
+        return index
+
+    def _open(self, path: str):
+        with open(os.path.join(path, VOCAB_FILE), encoding="utf-8") as f:
+            self.vocab = {term: n for n, term in enumerate(json.load(f))}
+        arrays = {name: np.load(os.path.join(path, f"bm25_{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        self._offsets = arrays["offsets"]
+        self._postings = arrays["postings"]
+        self._tfs = arrays["tfs"]
+        self._lengths = arrays["lengths"]
+        self._total_length = int(np.sum(self._lengths, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self._lengths) + len(self._tail_lengths)
+
+    def add(self, texts):
+        """Index chunk texts at the next positions, in order."""
+        for text in texts:
+            position = len(self)
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                term_id = self.vocab.setdefault(term, len(self.vocab))
+                positions, tfs = self._tail.setdefault(term_id, ([], []))
+                positions.append(position)
+                tfs.append(min(tf, 65535))
+            length = sum(counts.values())
+            self._tail_lengths.append(length)
+            self._total_length += length
+
+    def _term_postings(self, term_id: int):
+        if term_id < len(self._offsets) - 1:
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            postings, tfs = self._postings[start:end], self._tfs[start:end]
+        else:
+            postings, tfs = self._postings[:0], self._tfs[:0]
+        if term_id in self._tail:
+            tail_positions, tail_tfs = self._tail[term_id]
+            postings = np.concatenate([postings, np.asarray(tail_positions, dtype=np.int32)])
+            tfs = np.concatenate([tfs, np.asarray(tail_tfs, dtype=np.uint16)])
+        return postings, tfs
+
+    def lengths(self) -> np.ndarray:
+        if not self._tail_lengths:
+            return np.asarray(self._lengths)
+        return np.concatenate([self._lengths, np.asarray(self._tail_lengths, dtype=np.uint32)])
+
+    def search(self, query: str, k: int) -> list[tuple]:
+        """Top ``k`` chunks by BM25 as ``(position, score)``, best first."""
+        n = len(self)
+        terms = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if n == 0 or not terms:
+            return []
+
+        lengths = self.lengths().astype(np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / (self._total_length / n))
+        scores = np.zeros(n, dtype=np.float32)
+        for term_id in terms:
+            postings, tfs = self._term_postings(term_id)
+            if not len(postings):
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            tf = tfs.astype(np.float32)
+            # Positions are unique within a term's postings, so += is safe
+            scores[postings] += idf * tf * (BM25_K1 + 1) / (tf + norm[postings])
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(p), float(scores[p])) for p in hits]
+
+    def _merged(self):
+        """Base arrays plus the tail, as (offsets, postings, tfs) ordered by term then position."""
+        num_terms = len(self.vocab)
+        base_counts = np.diff(self._offsets)
+        base_terms = np.repeat(np.arange(len(base_counts), dtype=np.int64), base_counts)
+        tail_terms = [np.full(len(p), t, dtype=np.int64) for t, (p, _) in self._tail.items()]
+        terms = np.concatenate([base_terms] + tail_terms)
+        postings = np.concatenate([np.asarray(self._postings)] + [
+            np.asarray(p, dtype=np.int32) for p, _ in self._tail.values()
+        ])
+        tfs = np.concatenate([np.asarray(self._tfs)] + [
+            np.asarray(f, dtype=np.uint16) for _, f in self._tail.values()
+        ])
+        # Tail positions all follow base positions, so a stable sort by term keeps each list ascending
+        order = np.argsort(terms, kind="stable")
+        counts = np.bincount(terms, minlength=num_terms)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return offsets, postings[order], tfs[order]
+
+    def remove_positions(self, doomed: list[int]):
+        """Drop chunks and shift later positions down (mirrors ``ChunkStore.keep_positions``)."""
+        if not len(doomed):
+            return
+        doomed = np.unique(np.asarray(doomed, dtype=np.int64))
+        offsets, postings, tfs = self._merged()
+        terms = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+        keep = ~np.isin(postings, doomed)
+        postings = postings[keep]
+        postings -= np.searchsorted(doomed, postings).astype(np.int32)
+
+        # Renumber the vocabulary so terms left without postings drop out
+        counts = np.bincount(terms[keep], minlength=len(offsets) - 1)
+        alive = counts > 0
+        terms_by_id = sorted(self.vocab, key=self.vocab.get)
+        self.vocab = {term: n for n, term in enumerate(t for t, a in zip(terms_by_id, alive) if a)}
+        self._offsets = np.concatenate([[0], np.cumsum(counts[alive])]).astype(np.int64)
+        self._postings = postings
+        self._tfs = tfs[keep]
+        self._lengths = np.delete(self.lengths(), doomed)
+        self._tail = {}
+        self._tail_lengths = []
+        self._total_length = int(np.sum(self._lengths, dtype=np.int64))
+
+    def nbytes(self) -> int:
+        """Memory not backed by the page cache: unsaved postings and the vocabulary."""
+        tail = sum(len(p) for p, _ in self._tail.values()) * 16
+        in_memory = 0 if isinstance(self._postings, np.memmap) else self._postings.nbytes * 2
+        return tail + in_memory + 100 * len(self.vocab)
+
+    def save(self, path: str):
+        offsets, postings, tfs = self._merged()
+        arrays = {"offsets": offsets, "postings": postings, "tfs": tfs, "lengths": self.lengths()}
+        for name, array in arrays.items():
+            file = os.path.join(path, f"bm25_{name}.npy")
+            with open(file + ".tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(file + ".tmp", file)
+
+        terms = sorted(self.vocab, key=self.vocab.get)
+        with open(os.path.join(path, VOCAB_FILE + ".tmp"), "w", encoding="utf-8") as f:
+            json.dump(terms, f)
+        os.replace(os.path.join(path, VOCAB_FILE + ".tmp"), os.path.join(path, VOCAB_FILE))
+
+        self._tail = {}
+        self._tail_lengths = []
+        self._open(path)
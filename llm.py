@@ -0,0 +1,131 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+import metrics
+from config import (
+    CHARS_PER_TOKEN,
+    GEMINI_API_KEY,
+    LLM_BACKEND,
+    LLM_TEMPERATURE,
+    LLM_MAX_TOKENS,
+    LLM_TIMEOUT_S,
+    LLM_MAX_INFLIGHT,
+    LLM_REQUESTS_PER_MINUTE
+)
+
+RATE_WINDOW_S = 60.0
+ASYNC_POLL_S = 0.01  # How often async waiters re-check for a free slot
+
+LLM_WAIT_SECONDS = metrics.histogram("llm_wait_seconds", "Time waiting for an LLM slot or the rate limit.")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (``CHARS_PER_TOKEN`` chars each); no tokenizer or API call."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def create_llm():
+    """Build the chat model selected by ``LLM_BACKEND``."""
+    if LLM_BACKEND == "stub":
+        from stub_llm import StubChatModel
+        print("🤖 Using local stub LLM (offline)")
+        return StubChatModel()
+    if LLM_BACKEND != "gemini":
+        raise ValueError(f"Unknown LLM_BACKEND: {LLM_BACKEND!r}")
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    print("🤖 Initializing Gemini model...")
+    # The same client serves invoke/stream and ainvoke/astream (async gRPC)
+    return ChatGoogleGenerativeAI(
+        model="gemini-1.5-flash",  # Faster and cheaper than gemini-pro
+        google_api_key=GEMINI_API_KEY,
+        temperature=LLM_TEMPERATURE,
+        max_output_tokens=LLM_MAX_TOKENS,
+        # Ends calls abandoned by a caller-side timeout, so they give back their limiter slot
+        timeout=LLM_TIMEOUT_S
+    )
+
+
+class LLMLimiter:
+    """Process-wide cap on in-flight LLM calls and calls started per minute.
+
+    Shared by threads (Streamlit sessions, batch pools) and event loops
+    alike, so it is built on threading primitives; async callers wait
+    with ``asyncio.sleep`` instead of blocking their loop.
+    """
+
+    def __init__(self, max_inflight: int = LLM_MAX_INFLIGHT,
+                 requests_per_minute: int = LLM_REQUESTS_PER_MINUTE):
+        self.max_inflight = max_inflight
+        self.requests_per_minute = requests_per_minute
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._starts = deque()  # Start times of calls in the last RATE_WINDOW_S
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.waited_s = 0.0
+
+    def _reserve(self) -> float:
+        """Record a call start now, or return how long to wait for the rate window."""
+        with self._lock:
+            now = time.monotonic()
+            while self._starts and now - self._starts[0] >= RATE_WINDOW_S:
+                self._starts.popleft()
+            if self.requests_per_minute and len(self._starts) >= self.requests_per_minute:
+                return RATE_WINDOW_S - (now - self._starts[0])
+            self._starts.append(now)
+            self.calls += 1
+            return 0.0
+
+    @contextmanager
+    def slot(self):
+        """Blocking: hold one LLM slot for the duration of a call."""
+        start = time.monotonic()
+        self._slots.acquire()
+        try:
+            while (delay := self._reserve()) > 0:
+                time.sleep(delay)
+            self._waited(time.monotonic() - start)
+            yield
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """Async: like ``slot`` but never blocks the event loop."""
+        start = time.monotonic()
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(ASYNC_POLL_S)
+        try:
+            while (delay := self._reserve()) > 0:
+                await asyncio.sleep(delay)
+            self._waited(time.monotonic() - start)
+            yield
+        finally:
+            self._slots.release()
+
+    def _waited(self, seconds: float):
+        self.waited_s += seconds
+        LLM_WAIT_SECONDS.record(seconds)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "waited_s": round(self.waited_s, 3),
+            "max_inflight": self.max_inflight,
+            "requests_per_minute": self.requests_per_minute,
+        }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_llm_limiter() -> LLMLimiter:
+    """Return the process-wide LLM limiter."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = LLMLimiter()
+        return _limiter
@@ -0,0 +1,251 @@
+import json
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+import psutil
+from config import METRICS_ENABLED, TRACE_LOG_PATH
+
+PREFIX = "querydocs_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+_metrics = {}  # name -> Counter | Histogram, in registration order
+_registry_lock = threading.Lock()
+_current_trace = contextvars.ContextVar("querydocs_trace", default=None)
+_trace_log_lock = threading.Lock()
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonic count per label set (``inc(amount, **labels)``)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(key)} {value}"
+
+
+class Histogram:
+    """Bucketed observations per label set, Prometheus style.
+
+    ``record`` and ``time`` also add the duration as a span to the active
+    request trace, if any; ``observe`` only updates the histogram.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.stage = name.removeprefix(PREFIX).removesuffix("_seconds")
+        self._series = {}  # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+
+    def record(self, seconds: float, **labels):
+        """Observe a duration and add it to the active trace."""
+        self.observe(seconds, **labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(":".join([self.stage, *map(str, labels.values())]), seconds)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {values[-1]}"
+            yield f"{self.name}_count{_format_labels(key)} {cumulative}"
+
+
+class _NullMetric:
+    """Stand-in for every metric when ``METRICS_ENABLED`` is off: all no-ops."""
+
+    def inc(self, amount: float = 1, **labels):
+        pass
+
+    def observe(self, value: float, **labels):
+        pass
+
+    def record(self, seconds: float, **labels):
+        pass
+
+    def time(self, **labels):
+        return nullcontext()
+
+
+_NULL = _NullMetric()
+
+
+def _register(cls, name: str, *args):
+    if not METRICS_ENABLED:
+        return _NULL
+    with _registry_lock:
+        if name not in _metrics:
+            _metrics[name] = cls(name, *args)
+        return _metrics[name]
+
+
+def counter(name: str, help: str) -> Counter:
+    """Get or create the counter ``querydocs_<name>_total``."""
+    return _register(Counter, f"{PREFIX}{name}_total", help)
+
+
+def histogram(name: str, help: str, buckets=LATENCY_BUCKETS) -> Histogram:
+    """Get or create the histogram ``querydocs_<name>``."""
+    return _register(Histogram, f"{PREFIX}{name}", help, buckets)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (v0.0.4)."""
+    lines = []
+    with _registry_lock:
+        metrics = list(_metrics.values())
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    rss = f"{PREFIX}process_resident_memory_bytes"
+    lines.append(f"# HELP {rss} Resident set size of this process.")
+    lines.append(f"# TYPE {rss} gauge")
+    lines.append(f"{rss} {psutil.Process().memory_info().rss}")
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = histogram("request_seconds", "End-to-end time of a traced operation.")
+CACHE_LOOKUPS = counter("cache_lookups", "Cache lookups, by cache and result (hit, miss).")
+
+
+class Trace:
+    """Stage timings of one request, written as a JSON line to ``TRACE_LOG_PATH``."""
+
+    def __init__(self, operation: str, **attrs):
+        self.operation = operation
+        self.attrs = attrs
+        self.spans = {}  # stage -> milliseconds (repeated stages add up)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+
+    def add(self, stage: str, seconds: float):
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds * 1000
+
+    def annotate(self, **attrs):
+        self.attrs.update(attrs)
+
+    @contextmanager
+    def active(self):
+        """Make this the trace that ``Histogram.time`` and ``annotate`` report to.
+
+        Don't ``yield`` from a generator inside this block: the trace would
+        leak into the consumer's context.
+        """
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def finish(self, **attrs):
+        elapsed = time.perf_counter() - self._start
+        self.attrs.update(attrs)
+        REQUEST_SECONDS.observe(elapsed, operation=self.operation)
+        if TRACE_LOG_PATH:
+            record = {
+                "ts": self.started_at,
+                "operation": self.operation,
+                "total_ms": round(elapsed * 1000, 2),
+                "spans_ms": {stage: round(ms, 2) for stage, ms in self.spans.items()},
+                "rss_mb": round(psutil.Process().memory_info().rss / 1024 ** 2, 1),
+                **self.attrs,
+            }
+            with _trace_log_lock, open(TRACE_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+class _NullTrace:
+    def add(self, stage: str, seconds: float):
+        pass
+
+    def annotate(self, **attrs):
+        pass
+
+    def active(self):
+        return nullcontext(self)
+
+    def finish(self, **attrs):
+        pass
+
+
+def start_trace(operation: str, **attrs):
+    """A new ``Trace`` (a no-op one when metrics are off); call ``finish`` when done."""
+    return Trace(operation, **attrs) if METRICS_ENABLED else _NullTrace()
+
+
+@contextmanager
+def trace(operation: str, **attrs):
+    """Trace a block: ``with trace("answer", namespace=ns) as t: ...``."""
+    current = start_trace(operation, **attrs)
+    try:
+        with current.active():
+            yield current
+    except Exception as e:
+        current.annotate(error=str(e))
+        raise
+    finally:
+        current.finish()
+
+
+def annotate(**attrs):
+    """Attach attributes (e.g. prompt tokens, cache hit) to the active trace."""
+    current = _current_trace.get()
+    if current is not None:
+        current.annotate(**attrs)
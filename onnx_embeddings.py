@@ -0,0 +1,161 @@
+import os
+import json
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from config import ONNX_MODEL_PATH, ONNX_THREADS, ONNX_MIN_COSINE, MAX_EMBED_BATCH
+
+META_FILE = "meta.json"
+MODEL_FILE = "model-int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+OPSET = 14
+# Checked at export: int8 vectors must stay within ONNX_MIN_COSINE of these
+CHECK_SENTENCES = [
+    "The supplier shall deliver the goods within thirty days of the order.",
+    "What is the termination notice period?",
+    "Clause 12.7 limits liability to the fees paid in the previous year.",
+    "Invoices are payable in euros by bank transfer.",
+    "AB-1234",
+    "Quarterly revenue grew by 4.2% compared to last year.",
+]
+
+
+def model_dir(model_name: str, path: str = ONNX_MODEL_PATH) -> str:
+    return os.path.join(path, model_name.replace("/", "__"))
+
+
+def export_quantized(model_name: str, path: str = ONNX_MODEL_PATH) -> str:
+    """Export ``model_name`` to ONNX, quantize weights to int8 and verify it.
+
+    Needs torch and sentence-transformers (only here, not at inference).
+    Raises if the int8 model drifts further than ``ONNX_MIN_COSINE`` from
+    the original on ``CHECK_SENTENCES``. Returns the model directory.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    target = model_dir(model_name, path)
+    os.makedirs(target, exist_ok=True)
+    print(f"📦 Exporting {model_name} to ONNX (int8)...")
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    pooling = next(m for m in st_model if isinstance(m, Pooling))
+    if pooling.get_pooling_mode_str() != "mean":
+        raise Exception(f"Only mean pooling is supported, {model_name} uses {pooling.get_pooling_mode_str()}")
+    transformer = st_model[0].auto_model.eval()
+    st_model.tokenizer.save_pretrained(target)  # Writes tokenizer.json (fast tokenizer)
+
+    sample = st_model.tokenizer(["export"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    fp32_file = os.path.join(target, "model-fp32.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[n] for n in names),
+            fp32_file,
+            input_names=names,
+            output_names=["token_embeddings"],
+            dynamic_axes={n: {0: "batch", 1: "tokens"} for n in names + ["token_embeddings"]},
+            opset_version=OPSET,
+        )
+    quantize_dynamic(fp32_file, os.path.join(target, MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_file)
+
+    meta = {
+        "model": model_name,
+        "inputs": names,
+        "max_seq_length": st_model.max_seq_length,
+        "pad_token": st_model.tokenizer.pad_token,
+        "pad_id": st_model.tokenizer.pad_token_id,
+        "normalize": any(isinstance(m, Normalize) for m in st_model),
+    }
+    meta_file = os.path.join(target, META_FILE)
+    with open(meta_file, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    reference = st_model.encode(CHECK_SENTENCES, convert_to_numpy=True)
+    candidate = np.asarray(OnnxEmbeddings(target).embed_documents(CHECK_SENTENCES))
+    cosine = np.sum(_unit(reference) * _unit(candidate), axis=1)
+    if cosine.min() < ONNX_MIN_COSINE:
+        os.remove(meta_file)  # Not a usable export; retry next time
+        raise Exception(
+            f"int8 model drifted too far from {model_name}: cosine {cosine.min():.4f} "
+            f"< ONNX_MIN_COSINE={ONNX_MIN_COSINE}"
+        )
+    meta["min_cosine"] = round(float(cosine.min()), 5)
+    with open(meta_file, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    print(f"✅ ONNX model ready (min cosine vs. original {cosine.min():.4f})")
+    return target
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an int8 ONNX export, run by onnxruntime on CPU.
+
+    Mirrors sentence-transformers' mean pooling (and normalization, if the
+    model has it), so vectors are interchangeable with the original model
+    within ``ONNX_MIN_COSINE``. Texts are batched by length to cut padding.
+    Needs only onnxruntime and tokenizers at inference time.
+    """
+
+    def __init__(self, path: str, threads: int = ONNX_THREADS, batch_size: int = MAX_EMBED_BATCH):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(self.meta["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.meta["pad_id"], pad_token=self.meta["pad_token"])
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads  # 0 lets onnxruntime pick
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(path, MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        arrays = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {n: arrays[n] for n in self.meta["inputs"]})[0]
+
+        mask = arrays["attention_mask"][:, :, None].astype(np.float32)
+        vectors = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return _unit(vectors) if self.meta["normalize"] else vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        # Similar lengths share a batch, so little compute goes to padding
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        by_length = np.concatenate([
+            self._embed_batch([texts[i] for i in order[start:start + self.batch_size]])
+            for start in range(0, len(texts), self.batch_size)
+        ])
+        vectors = np.empty_like(by_length, dtype=np.float32)
+        vectors[order] = by_length
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def load_onnx_embeddings(model_name: str, path: str = ONNX_MODEL_PATH) -> OnnxEmbeddings:
+    """The int8 ONNX model for ``model_name``, exporting it on first use."""
+    target = model_dir(model_name, path)
+    if not os.path.exists(os.path.join(target, META_FILE)):
+        export_quantized(model_name, path)
+    return OnnxEmbeddings(target)
@@ -1,82 +1,95 @@
-import PyPDF2
+import io
 import gc
+import multiprocessing
+from bisect import bisect_right
+import PyPDF2
+from concurrent.futures import ProcessPoolExecutor
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
+import metrics
 from config import (
     CHUNK_SIZE, 
     CHUNK_OVERLAP, 
     MAX_CHUNKS, 
     MAX_PAGES,
-    MAX_FILE_SIZE_MB
+    MAX_FILE_SIZE_MB,
+    EXTRACT_WORKERS,
+    PARALLEL_EXTRACT_MIN_PAGES,
+    STREAM_MAX_PAGES
 )
 
+# Buffer this much page text before splitting in the streaming path
+STREAM_SPLIT_CHARS = CHUNK_SIZE * 10
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]  # Better splitting
+
+PAGES_EXTRACTED = metrics.counter("pages_extracted", "PDF pages read, by result (text, empty, error).")
+CHUNKS_CREATED = metrics.counter("chunks_created", "Chunks produced by the streaming splitter.")
+
+# Per-worker reader, opened once from the PDF bytes by the pool initializer
+_worker_pdf_reader = None
+
+
+def _pool_context():
+    """Start method for extraction workers: never fork.
+
+    Extraction runs on an ingest thread inside a multithreaded server;
+    forking it can deadlock a child on a lock another thread held (stdout,
+    logging, the allocator). Workers get the PDF bytes from the
+    initializer, so nothing relies on fork inheritance. The forkserver
+    preloads this module, so each worker starts without re-importing it.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def _init_extract_worker(pdf_bytes: bytes):
+    global _worker_pdf_reader
+    _worker_pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+
+
+def _extract_page_range(start: int, stop: int) -> list[tuple]:
+    """Worker: extract pages [start, stop) from this worker's own reader."""
+    return _extract_pages(_worker_pdf_reader, start, stop)
+
+
+def _extract_pages(pdf_reader, start: int, stop: int) -> list[tuple]:
+    """Extract pages as (index, text, error) so one bad page doesn't sink the rest."""
+    results = []
+    for i in range(start, stop):
+        try:
+            results.append((i, pdf_reader.pages[i].extract_text(), None))
+        except Exception as e:
+            results.append((i, None, str(e)))
+    return results
+
 
 class PDFProcessor:
-    def __init__(self):
-        """Initialize text splitter with optimal settings."""
+    def __init__(self, extract_workers: int = EXTRACT_WORKERS):
+        """Initialize text splitter with optimal settings.
+
+        ``extract_workers`` > 1 extracts pages in a process pool.
+        """
+        self.extract_workers = extract_workers
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=CHUNK_SIZE,
             chunk_overlap=CHUNK_OVERLAP,
             length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]  # Better splitting
+            separators=SEPARATORS
         )
     
     def extract_text_from_pdf(self, pdf_file) -> str:
         """Extract text with strict memory limits."""
         try:
-            # Check file size
-            pdf_file.seek(0, 2)  # Seek to end
-            file_size_bytes = pdf_file.tell()
-            pdf_file.seek(0)  # Reset to start
-            
-            file_size_mb = file_size_bytes / (1024 * 1024)
-            
-            if file_size_mb > MAX_FILE_SIZE_MB:
-                raise Exception(
-                    f"File too large: {file_size_mb:.1f}MB. "
-                    f"Maximum: {MAX_FILE_SIZE_MB}MB for your system."
-                )
-            
-            print(f"📄 Processing PDF ({file_size_mb:.1f}MB)...")
-            
-            # Read PDF
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            # Check encryption
-            if pdf_reader.is_encrypted:
-                raise Exception("PDF is password-protected")
-            
-            # Check page count
-            num_pages = len(pdf_reader.pages)
-            print(f"📖 Total pages: {num_pages}")
-            
-            if num_pages > MAX_PAGES:
-                print(f"⚠️ Limiting to first {MAX_PAGES} pages")
-                num_pages = MAX_PAGES
-            
-            # Extract text page by page
-            text_parts = []
-            for i in range(num_pages):
-                try:
-                    page = pdf_reader.pages[i]
-                    page_text = page.extract_text()
-                    
-                    if page_text and page_text.strip():
-                        text_parts.append(page_text)
-                        
-                        # Progress indicator
-                        if (i + 1) % 5 == 0:
-                            print(f"  Processed {i + 1}/{num_pages} pages")
-                    
-                except Exception as e:
-                    print(f"  ⚠️ Skipping page {i + 1}: {e}")
-                    continue
+            text_parts = [text for _, text in self.iter_pages(pdf_file, max_pages=MAX_PAGES)]
             
             # Combine text
             full_text = "\n\n".join(text_parts)
             
             # Clear memory
-            del pdf_reader, text_parts
+            del text_parts
             gc.collect()
             
             # Validate extracted text
@@ -91,6 +104,153 @@ class PDFProcessor:
             
         except Exception as e:
             raise Exception(f"PDF extraction failed: {str(e)}")
+
+    def iter_pages(self, pdf_file, max_pages: int = STREAM_MAX_PAGES, progress=None):
+        """Yield ``(page_number, text)`` one page at a time (1-based, empty pages skipped).
+
+        ``max_pages=None`` reads the whole document. ``progress(pages_done,
+        num_pages)`` is called after each page, including skipped ones.
+        """
+        # Check file size
+        pdf_file.seek(0, 2)  # Seek to end
+        file_size_bytes = pdf_file.tell()
+        pdf_file.seek(0)  # Reset to start
+        
+        file_size_mb = file_size_bytes / (1024 * 1024)
+        
+        if file_size_mb > MAX_FILE_SIZE_MB:
+            raise Exception(
+                f"File too large: {file_size_mb:.1f}MB. "
+                f"Maximum: {MAX_FILE_SIZE_MB}MB for your system."
+            )
+        
+        print(f"📄 Processing PDF ({file_size_mb:.1f}MB)...")
+        
+        # Read PDF
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        
+        # Check encryption
+        if pdf_reader.is_encrypted:
+            raise Exception("PDF is password-protected")
+        
+        # Check page count
+        num_pages = len(pdf_reader.pages)
+        print(f"📖 Total pages: {num_pages}")
+        
+        if max_pages is not None and num_pages > max_pages:
+            print(f"⚠️ Limiting to first {max_pages} pages")
+            num_pages = max_pages
+        
+        # Extract text page by page
+        if self.extract_workers > 1 and num_pages >= PARALLEL_EXTRACT_MIN_PAGES:
+            pdf_file.seek(0)
+            page_results = self._extract_parallel(pdf_file.read(), num_pages)
+        else:
+            page_results = (
+                _extract_pages(pdf_reader, i, i + 1)[0] for i in range(num_pages)
+            )
+
+        for i, page_text, error in page_results:
+            if progress is not None:
+                progress(i + 1, num_pages)
+            if error is not None:
+                PAGES_EXTRACTED.inc(result="error")
+                print(f"  ⚠️ Skipping page {i + 1}: {error}")
+                continue
+
+            PAGES_EXTRACTED.inc(result="text" if page_text and page_text.strip() else "empty")
+            if page_text and page_text.strip():
+                yield i + 1, page_text
+                
+                # Progress indicator
+                if (i + 1) % 5 == 0:
+                    print(f"  Processed {i + 1}/{num_pages} pages")
+    
+    def _extract_parallel(self, pdf_bytes: bytes, num_pages: int):
+        """Split the page range across a process pool; yields results in page order."""
+        workers = min(self.extract_workers, num_pages)
+        # A few ranges per worker keeps the pool busy when page cost is uneven
+        step = max(1, -(-num_pages // (workers * 4)))
+        starts = range(0, num_pages, step)
+        stops = [min(start + step, num_pages) for start in starts]
+        print(f"⚡ Extracting {num_pages} pages with {workers} workers...")
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=_pool_context(),
+            initializer=_init_extract_worker,
+            initargs=(pdf_bytes,)
+        ) as pool:
+            for page_range in pool.map(_extract_page_range, starts, stops):
+                yield from page_range
+
+    def iter_chunks(self, pages):
+        """Split a page stream into chunks without joining the whole document.
+
+        Text is buffered only until it's worth splitting; the last piece is
+        carried over because it may continue on the next page. Each chunk's
+        metadata records its page range and character span in the document
+        text (pages joined by blank lines), so citations never need the PDF.
+        """
+        buffer = ""
+        buffer_start = 0   # Document offset of buffer[0]
+        doc_length = 0
+        page_starts = []   # Document offset where each page begins
+        page_numbers = []
+        total_chars = 0
+        for page_number, page_text in pages:
+            separator = "\n\n" if doc_length else ""
+            page_starts.append(doc_length + len(separator))
+            page_numbers.append(page_number)
+            buffer += separator + page_text
+            doc_length += len(separator) + len(page_text)
+            total_chars += len(page_text.strip())
+            if len(buffer) < STREAM_SPLIT_CHARS:
+                continue
+
+            pieces = self._split_with_offsets(buffer)
+            CHUNKS_CREATED.inc(len(pieces) - 1)
+            for piece, offset in pieces[:-1]:
+                yield self._make_chunk(piece, buffer_start + offset, page_starts, page_numbers)
+            carry_offset = pieces[-1][1]
+            buffer = buffer[carry_offset:]
+            buffer_start += carry_offset
+
+        if total_chars < 100:
+            raise Exception(
+                "PDF contains very little text. "
+                "Please ensure it's not a scanned image."
+            )
+
+        pieces = self._split_with_offsets(buffer)
+        CHUNKS_CREATED.inc(len(pieces))
+        for piece, offset in pieces:
+            yield self._make_chunk(piece, buffer_start + offset, page_starts, page_numbers)
+
+    def _split_with_offsets(self, text: str) -> list[tuple]:
+        """Split ``text`` and locate each piece, as (piece, start offset)."""
+        pieces = []
+        search_from = 0
+        for piece in self.text_splitter.split_text(text):
+            offset = text.find(piece, search_from)
+            if offset < 0:
+                offset = search_from
+            pieces.append((piece, offset))
+            # Next piece starts after this one, minus the shared overlap
+            search_from = max(search_from, offset + len(piece) - CHUNK_OVERLAP)
+        return pieces
+
+    def _make_chunk(self, piece: str, start: int, page_starts: list, page_numbers: list) -> Document:
+        end = start + len(piece)
+        first = bisect_right(page_starts, start) - 1
+        last = bisect_right(page_starts, max(start, end - 1)) - 1
+        return Document(page_content=piece, metadata={
+            "page": page_numbers[first],
+            "page_end": page_numbers[last],
+            "start_char": start,
+            "end_char": end,
+            "page_char": start - page_starts[first],  # Offset within the start page
+        })
     
     def create_chunks(self, text: str) -> list[Document]:
         """Create text chunks with strict limits."""
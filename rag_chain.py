@@ -1,21 +1,75 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
+import metrics
+from llm import create_llm, estimate_tokens, get_llm_limiter
 from vector_store import VectorStore
-from config import GEMINI_API_KEY, LLM_TEMPERATURE, LLM_MAX_TOKENS
+from answer_cache import get_answer_cache
+from context_builder import build_context
+from conversation import ConversationMemory, format_turns, is_follow_up
+from config import (
+    DEFAULT_NAMESPACE,
+    ANSWER_CACHE_ENABLED,
+    LLM_MAX_CONCURRENCY,
+    LLM_TIMEOUT_S,
+    MEMORY_REWRITE,
+    MEMORY_SUMMARY_TOKENS,
+    METRICS_ENABLED
+)
+
+GENERAL_ANSWER_PREFIX = "ℹ️ This is a general answer (not from PDF):\n\n"
+RAG_ERROR_PREFIX = "Error processing question: "
+GENERAL_ERROR_ANSWER = "Sorry, I couldn't generate an answer."
+
+PROMPT_TOKENS = metrics.histogram(
+    "prompt_tokens", "Estimated prompt tokens per LLM call, by chain (rag, general, rewrite, summary).",
+    metrics.TOKEN_BUCKETS
+)
+LLM_SECONDS = metrics.histogram("llm_seconds", "LLM call time after the limiter, by mode.")
+LLM_TTFT_SECONDS = metrics.histogram("llm_ttft_seconds", "Time from stream start to the first token.")
+
+
+def _call_with_timeout(fn, timeout: float):
+    """Run ``fn()`` but give up after ``timeout`` seconds.
+
+    A timed-out call is abandoned: the caller's worker (e.g. one of the
+    ``answer_questions`` pool) is free right away, but the call runs on in
+    a daemon thread and keeps its ``LLMLimiter`` slot until it returns.
+    The Gemini client has its own ``LLM_TIMEOUT_S`` request timeout, so
+    that happens within about ``LLM_TIMEOUT_S`` and timeouts can't pile up
+    until ``LLM_MAX_INFLIGHT`` is used up.
+    """
+    outcome = {}
+
+    def run():
+        try:
+            outcome["value"] = fn()
+        except Exception as e:
+            outcome["error"] = e
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    worker.join(timeout)
+    if worker.is_alive():
+        raise TimeoutError(f"LLM call timed out after {timeout}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
 
 
 class RAGChain:
-    def __init__(self):
-        """Initialize RAG chain with optimized LLM settings."""
-        print("🤖 Initializing Gemini model...")
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",  # Faster and cheaper than gemini-pro
-            google_api_key=GEMINI_API_KEY,
-            temperature=LLM_TEMPERATURE,
-            max_output_tokens=LLM_MAX_TOKENS
-        )
-        self.vector_store = VectorStore()
+    def __init__(self, namespace: str = DEFAULT_NAMESPACE, llm=None):
+        """Initialize RAG chain over one namespaced index (session or tenant).
+
+        ``llm`` overrides the configured chat model (see ``llm.create_llm``).
+        Every LLM call goes through the process-wide ``LLMLimiter``.
+        """
+        self.llm = llm if llm is not None else create_llm()
+        self.limiter = get_llm_limiter()
+        self.vector_store = VectorStore(namespace)
+        self.answer_cache = get_answer_cache() if ANSWER_CACHE_ENABLED else None
         print("✅ RAG chain ready!")
         
         # Optimized RAG prompt
@@ -30,7 +84,7 @@ Instructions:
 - Answer ONLY using information from the context above
 - Be concise and direct
 - If the answer isn't in the context, say: "This information is not in the uploaded PDF."
-- Cite specific details from the context
+- Cite specific details from the context, referring to passages by their [number]
 
 Answer:"""
         
@@ -41,72 +95,534 @@ This question is not covered in the PDF. Provide a brief, helpful answer.
 
 Answer:"""
 
-    def answer_question(self, question: str):
-        """Answer using RAG or fallback to general knowledge."""
-        try:
-            # Try to find relevant context
-            relevant_docs = self.vector_store.similarity_search(question)
+        # Follow-ups ("what about section 4?") are made standalone before retrieval
+        self.rewrite_prompt_template = """Conversation so far:
+{history}
+
+Follow-up question: {question}
+
+Rewrite the follow-up as a standalone question that can be understood without the conversation. Keep names, numbers and section references. If it is already standalone, repeat it unchanged. Reply with the question only.
+
+Standalone question:"""
+
+        self.summary_prompt_template = """Summary of the conversation so far:
+{summary}
+
+New turns:
+{turns}
+
+Update the summary with the new turns in at most {max_words} words. Keep the topics, documents, sections and facts the user asked about.
+
+Updated summary:"""
+
+        # Build prompts and chains once, not on every question
+        self.rag_prompt = PromptTemplate(
+            input_variables=["context", "question"],
+            template=self.rag_prompt_template
+        )
+        self.fallback_prompt = PromptTemplate(
+            input_variables=["question"],
+            template=self.fallback_prompt_template
+        )
+        self.rewrite_prompt = PromptTemplate(
+            input_variables=["history", "question"],
+            template=self.rewrite_prompt_template
+        )
+        self.summary_prompt = PromptTemplate(
+            input_variables=["summary", "turns", "max_words"],
+            template=self.summary_prompt_template
+        )
+        self.rag_chain = self.rag_prompt | self.llm
+        self.fallback_chain = self.fallback_prompt | self.llm
+        self.rewrite_chain = self.rewrite_prompt | self.llm
+        self.summary_chain = self.summary_prompt | self.llm
+        # chain -> (metrics label, prompt) for prompt size metrics
+        self._prompts = [
+            (self.rag_chain, "rag", self.rag_prompt),
+            (self.fallback_chain, "general", self.fallback_prompt),
+            (self.rewrite_chain, "rewrite", self.rewrite_prompt),
+            (self.summary_chain, "summary", self.summary_prompt),
+        ]
+
+    def answer_question(self, question: str, doc_ids: list[str] = None,
+                        return_sources: bool = False, memory=None):
+        """Answer using RAG or fallback to general knowledge.
+
+        ``doc_ids`` optionally scopes retrieval to a subset of documents.
+        With ``return_sources`` the result is ``(answer, type, sources)``,
+        where sources are compact references (see ``_source_refs``).
+        Repeated and near-duplicate questions are served from the answer cache.
+        With a ``ConversationMemory``, follow-ups are rewritten using it
+        (see ``rewrite_question``) and the turn, as asked, is added to it.
+        """
+        with metrics.trace("answer", namespace=self.vector_store.namespace) as trace:
+            try:
+                asked, question = question, self.rewrite_question(question, memory)
+                # Embed once: the vector serves the cache lookup and the search
+                embedding = self.vector_store.embed_query(question)
+                scope, cached = self._cache_lookup(question, embedding, doc_ids)
+                if cached is not None:
+                    result = cached["answer"], cached["type"], cached["sources"]
+                    self._remember(memory, asked, result[0])
+                    return result if return_sources else result[:2]
+
+                # Single retrieval pass: the docs found here are the RAG context
+                relevant_docs = self.vector_store.similarity_search(
+                    question, embedding=embedding, doc_ids=doc_ids
+                )
             
-            if relevant_docs:
-                # Use RAG with PDF context
-                print("📄 Using PDF context...")
-                response = self._answer_with_rag(question)
-                return response, "pdf"
-            else:
-                # Fallback to general AI
-                print("🌐 Using general knowledge...")
-                response = self._answer_general(question)
-                return response, "general"
+                if relevant_docs:
+                    # Use RAG with PDF context
+                    print("📄 Using PDF context...")
+                    context, sources = self._build_context(relevant_docs)
+                    response = self._answer_with_rag(question, context)
+                    result = response, "pdf", sources
+                else:
+                    # Fallback to general AI
+                    print("🌐 Using general knowledge...")
+                    response = self._answer_general(question)
+                    result = response, "general", []
+
+                self._cache_store(scope, question, embedding, result)
+                self._remember(memory, asked, result[0])
                 
+            except Exception as e:
+                print(f"❌ Error: {e}")
+                result = f"Sorry, I encountered an error: {str(e)}", "general", []
+
+            trace.annotate(type=result[1])
+        return result if return_sources else result[:2]
+
+    def answer_questions(self, questions: list[str], doc_ids: list[str] = None,
+                         max_concurrency: int = LLM_MAX_CONCURRENCY,
+                         timeout: float = LLM_TIMEOUT_S) -> list[dict]:
+        """Answer many questions at once.
+
+        All questions are embedded in one model batch and searched with one
+        batched FAISS call; LLM calls then run ``max_concurrency`` at a time,
+        each limited to ``timeout`` seconds. Returns one dict per question,
+        in input order: ``question``, ``answer``, ``type``, ``sources`` and
+        ``error`` (None on success). A failed question doesn't fail the batch.
+        """
+        with metrics.trace("answer_batch", namespace=self.vector_store.namespace,
+                           questions=len(questions)):
+            results = [
+                {"question": q, "answer": None, "type": None, "sources": [], "error": None}
+                for q in questions
+            ]
+            if not questions:
+                return results
+
+            try:
+                embeddings = self.vector_store.embed_queries(questions)
+                pending = []
+                for i, (question, embedding) in enumerate(zip(questions, embeddings)):
+                    scope, cached = self._cache_lookup(question, embedding, doc_ids)
+                    if cached is not None:
+                        results[i].update(answer=cached["answer"], type=cached["type"],
+                                          sources=cached["sources"])
+                    else:
+                        pending.append((i, scope))
+
+                searched = self.vector_store.similarity_search_batch(
+                    [embeddings[i] for i, _ in pending], doc_ids=doc_ids,
+                    queries=[questions[i] for i, _ in pending]
+                )
+            except Exception as e:
+                print(f"❌ Batch retrieval error: {e}")
+                for result in results:
+                    if result["answer"] is None:
+                        result["error"] = str(e)
+                return results
+
+            print(f"📚 Answering {len(pending)}/{len(questions)} questions "
+                  f"({max_concurrency} concurrent LLM calls)...")
+            with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+                futures = {
+                    pool.submit(self._answer_one, questions[i], relevant_docs, timeout): (i, scope)
+                    for (i, scope), relevant_docs in zip(pending, searched)
+                }
+                for future in as_completed(futures):
+                    i, scope = futures[future]
+                    try:
+                        answer, answer_type, sources = future.result()
+                    except Exception as e:
+                        print(f"❌ Question {i + 1} failed: {e}")
+                        results[i]["error"] = str(e)
+                        continue
+                    results[i].update(answer=answer, type=answer_type, sources=sources)
+                    self._cache_store(scope, questions[i], embeddings[i], (answer, answer_type, sources))
+
+            return results
+
+    def _answer_one(self, question: str, relevant_docs, timeout: float):
+        """One batched answer; unlike ``_answer_with_rag`` errors propagate."""
+        if relevant_docs:
+            context, sources = self._build_context(relevant_docs)
+            inputs = {"context": context, "question": question}
+            response = _call_with_timeout(lambda: self._invoke(self.rag_chain, inputs), timeout)
+            return response.content, "pdf", sources
+
+        response = _call_with_timeout(
+            lambda: self._invoke(self.fallback_chain, {"question": question}), timeout
+        )
+        return GENERAL_ANSWER_PREFIX + response.content, "general", []
+
+    def stream_answer(self, question: str, cancel_event=None, doc_ids: list[str] = None,
+                      memory=None):
+        """Stream an answer token by token.
+
+        Yields ``("sources", refs)`` once retrieval is done (PDF answers
+        only), ``("token", text)`` events as Gemini produces them and a final
+        ``("done", "pdf" | "general")`` event. Setting ``cancel_event``
+        (a ``threading.Event``) stops generation at the next token. A cached
+        answer is yielded as a single token. ``memory`` works as in
+        ``answer_question``; cancelled answers aren't remembered.
+        """
+        # Activated only around code that doesn't yield (see ``Trace.active``)
+        trace = metrics.start_trace("stream", namespace=self.vector_store.namespace)
+        try:
+            with trace.active():
+                asked, question = question, self.rewrite_question(question, memory)
+                embedding = self.vector_store.embed_query(question)
+                scope, cached = self._cache_lookup(question, embedding, doc_ids)
+                if cached is None:
+                    relevant_docs = self.vector_store.similarity_search(
+                        question, embedding=embedding, doc_ids=doc_ids
+                    )
+                    source, chain, inputs, sources = self._stream_plan(question, relevant_docs)
+                    self._record_prompt(chain, inputs)
+            if cached is not None:
+                self._remember(memory, asked, cached["answer"])
+                if cached["type"] == "pdf":
+                    yield "sources", cached["sources"]
+                yield "token", cached["answer"]
+                yield "done", cached["type"]
+                return
+
+            trace.annotate(type=source)
+            if sources:
+                yield "sources", sources
+            parts = [] if source == "pdf" else [GENERAL_ANSWER_PREFIX]
+            if parts:
+                yield "token", GENERAL_ANSWER_PREFIX
+
+            cancelled = False
+            with self.limiter.slot():
+                start, first_token_at = time.perf_counter(), None
+                stream = chain.stream(inputs)
+                try:
+                    for chunk in stream:
+                        if cancel_event is not None and cancel_event.is_set():
+                            print("⏹️ Answer cancelled")
+                            cancelled = True
+                            break
+                        if chunk.content:
+                            first_token_at = first_token_at or time.perf_counter()
+                            parts.append(chunk.content)
+                            yield "token", chunk.content
+                finally:
+                    # Closes the underlying HTTP stream on cancel / early exit
+                    stream.close()
+                    self._record_stream(trace, start, first_token_at)
+
+            if not cancelled:
+                self._cache_store(scope, question, embedding, ("".join(parts), source, sources))
+                self._remember(memory, asked, "".join(parts))
+            yield "done", source
+
         except Exception as e:
-            print(f"❌ Error: {e}")
-            return f"Sorry, I encountered an error: {str(e)}", "general"
+            print(f"❌ Streaming error: {e}")
+            trace.annotate(error=str(e))
+            yield "token", f"Sorry, I encountered an error: {str(e)}"
+            yield "done", "general"
+        finally:
+            trace.finish()
+
+    async def aanswer_question(self, question: str, doc_ids: list[str] = None,
+                               return_sources: bool = False, memory=None):
+        """Async ``answer_question`` for servers running many requests on one event loop.
+
+        Embedding, cache lookup and FAISS run on worker threads and the LLM
+        call uses the model's async client, so a slow answer never blocks
+        the loop.
+        """
+        with metrics.trace("aanswer", namespace=self.vector_store.namespace) as trace:
+            try:
+                asked, question = question, await self.arewrite_question(question, memory)
+                embedding = await self.vector_store.aembed_query(question)
+                scope, cached = await asyncio.to_thread(self._cache_lookup, question, embedding, doc_ids)
+                if cached is not None:
+                    result = cached["answer"], cached["type"], cached["sources"]
+                    self._remember(memory, asked, result[0])
+                    return result if return_sources else result[:2]
+
+                relevant_docs = await self.vector_store.asimilarity_search(
+                    question, embedding=embedding, doc_ids=doc_ids
+                )
+
+                if relevant_docs:
+                    print("📄 Using PDF context...")
+                    context, sources = self._build_context(relevant_docs)
+                    inputs = {"context": context, "question": question}
+                    response = await self._ainvoke(self.rag_chain, inputs)
+                    result = response.content, "pdf", sources
+                else:
+                    print("🌐 Using general knowledge...")
+                    response = await self._ainvoke(self.fallback_chain, {"question": question})
+                    result = GENERAL_ANSWER_PREFIX + response.content, "general", []
+
+                self._cache_store(scope, question, embedding, result)
+                self._remember(memory, asked, result[0])
 
-    def _answer_with_rag(self, question: str):
-        """Answer using RAG chain with PDF context."""
+            except Exception as e:
+                print(f"❌ Error: {e}")
+                result = f"Sorry, I encountered an error: {str(e)}", "general", []
+
+            trace.annotate(type=result[1])
+        return result if return_sources else result[:2]
+
+    async def astream_answer(self, question: str, cancel_event=None, doc_ids: list[str] = None,
+                             memory=None):
+        """Async ``stream_answer``: same events, produced without blocking the loop.
+
+        ``cancel_event`` may be a ``threading.Event`` or an ``asyncio.Event``.
+        """
+        trace = metrics.start_trace("astream", namespace=self.vector_store.namespace)
         try:
-            # Get retriever
-            retriever = self.vector_store.get_retriever()
-            if not retriever:
-                return "PDF index not found. Please upload a PDF first."
-            
-            # Create prompt
-            prompt = PromptTemplate(
-                input_variables=["context", "question"],
-                template=self.rag_prompt_template
-            )
-            
-            # Create RAG chain
-            chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=retriever,
-                chain_type_kwargs={"prompt": prompt},
-                return_source_documents=False  # Save memory
-            )
-            
-            # Get response
-            response = chain.invoke({"query": question})
-            return response["result"]
+            with trace.active():
+                asked, question = question, await self.arewrite_question(question, memory)
+                embedding = await self.vector_store.aembed_query(question)
+                scope, cached = await asyncio.to_thread(self._cache_lookup, question, embedding, doc_ids)
+                if cached is None:
+                    relevant_docs = await self.vector_store.asimilarity_search(
+                        question, embedding=embedding, doc_ids=doc_ids
+                    )
+                    source, chain, inputs, sources = self._stream_plan(question, relevant_docs)
+                    self._record_prompt(chain, inputs)
+            if cached is not None:
+                self._remember(memory, asked, cached["answer"])
+                if cached["type"] == "pdf":
+                    yield "sources", cached["sources"]
+                yield "token", cached["answer"]
+                yield "done", cached["type"]
+                return
+
+            trace.annotate(type=source)
+            if sources:
+                yield "sources", sources
+            parts = [] if source == "pdf" else [GENERAL_ANSWER_PREFIX]
+            if parts:
+                yield "token", GENERAL_ANSWER_PREFIX
+
+            cancelled = False
+            async with self.limiter.aslot():
+                start, first_token_at = time.perf_counter(), None
+                stream = chain.astream(inputs)
+                try:
+                    async for chunk in stream:
+                        if cancel_event is not None and cancel_event.is_set():
+                            print("⏹️ Answer cancelled")
+                            cancelled = True
+                            break
+                        if chunk.content:
+                            first_token_at = first_token_at or time.perf_counter()
+                            parts.append(chunk.content)
+                            yield "token", chunk.content
+                finally:
+                    await stream.aclose()
+                    self._record_stream(trace, start, first_token_at)
+
+            if not cancelled:
+                self._cache_store(scope, question, embedding, ("".join(parts), source, sources))
+                self._remember(memory, asked, "".join(parts))
+            yield "done", source
+
+        except Exception as e:
+            print(f"❌ Streaming error: {e}")
+            trace.annotate(error=str(e))
+            yield "token", f"Sorry, I encountered an error: {str(e)}"
+            yield "done", "general"
+        finally:
+            trace.finish()
+
+    def _stream_plan(self, question: str, relevant_docs):
+        """Pick the chain for a streamed answer: ``(source, chain, inputs, sources)``."""
+        if relevant_docs:
+            print("📄 Streaming from PDF context...")
+            context, sources = self._build_context(relevant_docs)
+            return "pdf", self.rag_chain, {"context": context, "question": question}, sources
+        print("🌐 Streaming general answer...")
+        return "general", self.fallback_chain, {"question": question}, []
+
+    def _needs_rewrite(self, question: str, memory) -> bool:
+        return MEMORY_REWRITE and bool(memory) and is_follow_up(question)
+
+    @staticmethod
+    def _rewritten(question: str, response) -> str:
+        """First line of the model's reply, or the original if that's empty."""
+        lines = response.content.strip().splitlines()
+        rewritten = lines[0].strip().strip('"') if lines else ""
+        if not rewritten:
+            return question
+        print(f"🔁 Follow-up rewritten: {rewritten}")
+        metrics.annotate(rewritten=True)
+        return rewritten
+
+    def rewrite_question(self, question: str, memory=None) -> str:
+        """Standalone form of a follow-up question, used for retrieval, the answer and the cache.
+
+        Only questions that look like follow-ups (``conversation.is_follow_up``)
+        cost an LLM call; others, or any question if the call fails, are
+        returned unchanged.
+        """
+        if not self._needs_rewrite(question, memory):
+            return question
+        try:
+            response = self._invoke(self.rewrite_chain, {"history": memory.render(), "question": question})
+        except Exception as e:
+            print(f"⚠️ Question rewrite failed: {e}")
+            return question
+        return self._rewritten(question, response)
+
+    async def arewrite_question(self, question: str, memory=None) -> str:
+        """Async ``rewrite_question``."""
+        if not self._needs_rewrite(question, memory):
+            return question
+        try:
+            inputs = {"history": memory.render(), "question": question}
+            response = await self._ainvoke(self.rewrite_chain, inputs)
+        except Exception as e:
+            print(f"⚠️ Question rewrite failed: {e}")
+            return question
+        return self._rewritten(question, response)
+
+    def summarize_conversation(self, summary: str, turns) -> str:
+        """Fold ``(question, answer)`` turns into ``summary`` (a ``ConversationMemory`` summarizer)."""
+        response = self._invoke(self.summary_chain, {
+            "summary": summary or "(none yet)",
+            "turns": format_turns(turns),
+            "max_words": MEMORY_SUMMARY_TOKENS * 3 // 4,
+        })
+        return response.content
+
+    def new_memory(self):
+        """A ``ConversationMemory`` summarized by this chain's LLM."""
+        return ConversationMemory(summarize=self.summarize_conversation)
+
+    @staticmethod
+    def _remember(memory, question: str, answer: str):
+        """Add a finished turn to ``memory``; error replies are left out, as in the cache."""
+        if memory is None or not answer.strip():
+            return
+        if answer.startswith(RAG_ERROR_PREFIX) or answer == GENERAL_ERROR_ANSWER:
+            return
+        memory.add_turn(question, answer.removeprefix(GENERAL_ANSWER_PREFIX))
+
+    def _invoke(self, chain, inputs: dict):
+        """Blocking LLM call under the process-wide limiter."""
+        self._record_prompt(chain, inputs)
+        with self.limiter.slot(), LLM_SECONDS.time(mode="invoke"):
+            return chain.invoke(inputs)
+
+    async def _ainvoke(self, chain, inputs: dict):
+        """Async LLM call under the process-wide limiter."""
+        self._record_prompt(chain, inputs)
+        async with self.limiter.aslot():
+            with LLM_SECONDS.time(mode="ainvoke"):
+                return await chain.ainvoke(inputs)
+
+    def _record_prompt(self, chain, inputs: dict):
+        """Estimated prompt size for metrics; skipped entirely when they're off."""
+        if not METRICS_ENABLED:
+            return
+        kind, prompt = next((k, p) for c, k, p in self._prompts if c is chain)
+        tokens = estimate_tokens(prompt.format(**inputs))
+        PROMPT_TOKENS.observe(tokens, chain=kind)
+        metrics.annotate(prompt_tokens=tokens)
+
+    @staticmethod
+    def _record_stream(trace, start: float, first_token_at: float = None):
+        """LLM time and time to first token of one streamed answer."""
+        elapsed = time.perf_counter() - start
+        LLM_SECONDS.observe(elapsed, mode="stream")
+        trace.add("llm:stream", elapsed)
+        if first_token_at is not None:
+            LLM_TTFT_SECONDS.observe(first_token_at - start)
+            trace.add("llm_ttft", first_token_at - start)
+
+    def _cache_lookup(self, question: str, embedding, doc_ids: list[str] = None):
+        """Return ``(scope, cached entry or None)`` for this index version and doc filter."""
+        if self.answer_cache is None:
+            return None, None
+        scope = self.answer_cache.scope(
+            self.vector_store.namespace, self.vector_store.index_version, doc_ids
+        )
+        cached = self.answer_cache.lookup(scope, question, embedding)
+        metrics.annotate(answer_cache="miss" if cached is None else "hit")
+        if cached is not None:
+            print(f"⚡ Answer cache hit ({self.answer_cache.stats()['hit_rate']:.0%} hit rate)")
+        return scope, cached
+
+    def _cache_store(self, scope, question: str, embedding, result):
+        """Cache a finished answer; error replies are not cached."""
+        answer, answer_type, sources = result
+        if self.answer_cache is None or not answer.strip():
+            return
+        if answer.startswith(RAG_ERROR_PREFIX) or answer == GENERAL_ERROR_ANSWER:
+            return
+        self.answer_cache.store(scope, question, embedding, answer, answer_type, sources)
+
+    def _build_context(self, relevant_docs) -> tuple[str, list[dict]]:
+        """Prompt context within the token budget (see ``context_builder``) and its citations."""
+        context, passages = build_context(relevant_docs)
+        metrics.annotate(context_chunks=len(relevant_docs), context_passages=len(passages))
+        return context, self._source_refs(passages)
+
+    def _source_refs(self, passages) -> list[dict]:
+        """Compact citations: enough to locate the span without re-reading the PDF.
+
+        A passage of merged chunks spans ``chunk_index`` to ``chunk_end``.
+        """
+        documents = self.vector_store.documents
+        refs = []
+        for n, passage in enumerate(passages, start=1):
+            first, last = passage.docs[0].metadata, passage.docs[-1].metadata
+            refs.append({
+                "ref": n,
+                "doc_id": passage.doc_id,
+                "name": documents.get(passage.doc_id, {}).get("name"),
+                "chunk_index": first.get("chunk_index"),
+                "chunk_end": last.get("chunk_index"),
+                "page": passage.page,
+                "page_end": passage.page_end,
+                "start_char": passage.start,
+                "end_char": passage.end,
+                "page_char": first.get("page_char"),
+                "score": round(passage.score, 3),
+            })
+        return refs
+
+    def _answer_with_rag(self, question: str, context: str):
+        """Answer using the already-built PDF context."""
+        try:
+            response = self._invoke(self.rag_chain, {
+                "context": context,
+                "question": question
+            })
+            return response.content
             
         except Exception as e:
             print(f"❌ RAG error: {e}")
-            return f"Error processing question: {str(e)}"
+            return f"{RAG_ERROR_PREFIX}{str(e)}"
 
     def _answer_general(self, question: str):
         """Answer general questions without PDF context."""
         try:
-            prompt = PromptTemplate(
-                input_variables=["question"],
-                template=self.fallback_prompt_template
-            )
-            
-            formatted_prompt = prompt.format(question=question)
-            response = self.llm.invoke(formatted_prompt)
+            response = self._invoke(self.fallback_chain, {"question": question})
             
-            prefix = "ℹ️ This is a general answer (not from PDF):\n\n"
-            return prefix + response.content
+            return GENERAL_ANSWER_PREFIX + response.content
             
         except Exception as e:
             print(f"❌ General answer error: {e}")
-            return "Sorry, I couldn't generate an answer."
\ No newline at end of file
+            return GENERAL_ERROR_ANSWER
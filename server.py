@@ -0,0 +1,162 @@
+"""Headless HTTP API for QueryDocs (ingest, query, streaming query).
+
+Run with ``python server.py`` (or ``uvicorn server:app``). One long-lived
+process keeps the embedding model, chat model and loaded indexes warm
+across requests; use a single worker per process.
+"""
+import json
+import asyncio
+import threading
+from typing import Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+import metrics
+from embeddings import warmup_embeddings
+from index_cache import get_index_cache
+from answer_cache import get_answer_cache
+from llm import create_llm, get_llm_limiter
+from ingest_jobs import get_ingest_queue
+from rag_chain import RAGChain
+from config import SERVER_HOST, SERVER_PORT
+
+
+class QueryRequest(BaseModel):
+    question: str
+    doc_ids: Optional[list[str]] = None
+
+
+class Service:
+    """Warm state shared by all requests: one chat model, one RAGChain per namespace."""
+
+    def __init__(self):
+        self.llm = None
+        self.chains = {}
+        self.chains_lock = threading.Lock()
+        # CPU-bound ingest runs on the background queue, never on the event loop
+        self.ingest_queue = get_ingest_queue()
+
+    def start(self):
+        print("🚀 Warming up models...")
+        warmup_embeddings()
+        self.llm = create_llm()
+
+    def stop(self):
+        self.ingest_queue.shutdown()
+
+    def chain(self, namespace: str) -> RAGChain:
+        with self.chains_lock:
+            if namespace not in self.chains:
+                try:
+                    self.chains[namespace] = RAGChain(namespace, llm=self.llm)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+            return self.chains[namespace]
+
+
+service = Service()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    service.start()
+    yield
+    service.stop()
+
+
+app = FastAPI(title="QueryDocs API", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "namespaces": len(service.chains),
+        "index_cache": get_index_cache().stats(),
+        "answer_cache": get_answer_cache().stats(),
+        "llm": get_llm_limiter().stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Counters and histograms in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/namespaces/{namespace}/documents", status_code=202)
+async def ingest_document(namespace: str, file: UploadFile = File(...)):
+    """Queue an upload; poll ``GET /jobs/{job_id}`` for progress."""
+    service.chain(namespace)  # Validate the namespace before reading the upload
+    pdf_bytes = await file.read()
+    job = await asyncio.to_thread(service.ingest_queue.submit, namespace, file.filename, pdf_bytes)
+    return job.to_dict()
+
+
+@app.get("/namespaces/{namespace}/jobs")
+async def list_jobs(namespace: str):
+    return [job.to_dict() for job in service.ingest_queue.jobs(namespace)]
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = service.ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = service.ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return {"cancelled": service.ingest_queue.cancel(job_id), **job.to_dict()}
+
+
+@app.get("/namespaces/{namespace}/documents")
+async def list_documents(namespace: str):
+    documents = await asyncio.to_thread(service.chain(namespace).vector_store.list_documents)
+    return {
+        doc_id: {k: v for k, v in info.items() if k != "chunk_ids"}
+        for doc_id, info in documents.items()
+    }
+
+
+@app.delete("/namespaces/{namespace}/documents/{doc_id}")
+async def remove_document(namespace: str, doc_id: str):
+    vector_store = service.chain(namespace).vector_store
+    try:
+        await asyncio.to_thread(vector_store.remove_document, doc_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown document: {doc_id}")
+    return {"removed": doc_id}
+
+
+@app.post("/namespaces/{namespace}/query")
+async def query(namespace: str, request: QueryRequest):
+    answer, answer_type, sources = await service.chain(namespace).aanswer_question(
+        request.question, doc_ids=request.doc_ids, return_sources=True
+    )
+    return {"answer": answer, "type": answer_type, "sources": sources}
+
+
+@app.post("/namespaces/{namespace}/query/stream")
+async def query_stream(namespace: str, request: QueryRequest):
+    """Newline-delimited JSON events: ``{"event": "sources"|"token"|"done", "data": ...}``.
+
+    A client disconnect closes the generator, which stops the LLM stream.
+    """
+    chain = service.chain(namespace)
+
+    async def events():
+        async for event, data in chain.astream_answer(request.question, doc_ids=request.doc_ids):
+            yield json.dumps({"event": event, "data": data}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT, workers=1)
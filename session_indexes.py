@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+import shutil
+from config import FAISS_INDEX_PATH, SESSION_INDEX_TTL_S
+
+SESSION_PREFIX = "session-"  # Anonymous per-browser-session namespaces
+
+
+def prune_session_indexes(ttl_s: float = SESSION_INDEX_TTL_S, root: str = FAISS_INDEX_PATH) -> int:
+    """Delete anonymous session indexes unused for ``ttl_s`` seconds; returns how many.
+
+    Tenant and default namespaces are kept. An index in use has its
+    directory touched by ``VectorStore``, which restarts its clock. Only
+    needs the filesystem, so the app can run it without importing FAISS.
+    """
+    if not os.path.isdir(root):
+        return 0
+    # Loaded indexes only exist once the index stack has been imported
+    index_cache = sys.modules.get("index_cache")
+    cutoff = time.time() - ttl_s
+    removed = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if not name.startswith(SESSION_PREFIX) or not os.path.isdir(path):
+            continue
+        if os.path.getmtime(path) >= cutoff:
+            continue
+        if index_cache is not None:
+            index_cache.get_index_cache().invalidate(path)
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    if removed:
+        print(f"🧹 Removed {removed} expired session indexes")
+    return removed
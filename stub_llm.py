@@ -0,0 +1,47 @@
+import time
+import asyncio
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from config import STUB_LLM_LATENCY_S, STUB_LLM_TOKEN_DELAY_S
+
+
+class StubChatModel(BaseChatModel):
+    """Offline stand-in for Gemini with a fixed latency, sync and async.
+
+    Replies are a canned sentence that echoes the prompt size, streamed a
+    word at a time, so the RAG pipeline can be load-tested without an API key.
+    """
+
+    latency: float = STUB_LLM_LATENCY_S
+    token_delay: float = STUB_LLM_TOKEN_DELAY_S
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _reply(self, messages) -> str:
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        return f"Stub answer generated offline for a {prompt_chars}-character prompt."
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for n, word in enumerate(self._reply(messages).split(" ")):
+            if n:
+                time.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if not n else " " + word))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for n, word in enumerate(self._reply(messages).split(" ")):
+            if n:
+                await asyncio.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if not n else " " + word))
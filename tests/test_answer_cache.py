@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from answer_cache import AnswerCache, key_terms
+
+SCOPE = AnswerCache.scope("ns", 1.0)
+
+
+def vector(seed: int, noise: float = 0.0) -> np.ndarray:
+    base = np.random.default_rng(seed).normal(size=64)
+    if noise:
+        base += np.random.default_rng(seed + 1000).normal(scale=noise, size=64)
+    return base
+
+
+@pytest.fixture
+def cache():
+    return AnswerCache(max_entries=100, ttl_s=3600, similarity=0.95)
+
+
+def test_near_duplicate_hits(cache):
+    cache.store(SCOPE, "What is the notice period?", vector(1), "30 days", "pdf")
+    entry = cache.lookup(SCOPE, "Whats the notice period", vector(1, noise=0.05))
+    assert entry is not None and entry["answer"] == "30 days"
+    assert cache.semantic_hits == 1
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("What were the fees in 2023?", "What were the fees in 2024?"),
+    ("Is clause 12.7 binding?", "Is clause 12.8 binding?"),
+    ("Does the warranty cover water damage?", "Doesn't the warranty cover water damage?"),
+    ("Are refunds allowed after delivery?", "Are refunds not allowed after delivery?"),
+])
+def test_near_miss_questions_do_not_collide(cache, stored, asked):
+    # Same embedding on purpose: only the key terms tell them apart
+    cache.store(SCOPE, stored, vector(2), "answer for the stored question", "pdf")
+    assert cache.lookup(SCOPE, asked, vector(2)) is None
+
+
+def test_lookup_is_scoped(cache):
+    cache.store(SCOPE, "What is the notice period?", vector(3), "30 days", "pdf")
+    other = AnswerCache.scope("ns", 1.0, ["doc-a"])
+    assert cache.lookup(other, "What is the notice period?", vector(3)) is None
+
+
+def test_evicted_entries_leave_the_vector_index():
+    cache = AnswerCache(max_entries=3, ttl_s=3600, similarity=0.95)
+    for n in range(10):
+        cache.store(SCOPE, f"question {n}", vector(n), f"answer {n}", "pdf")
+    assert len(cache._vectors[SCOPE]) == 3
+    assert cache.lookup(SCOPE, "question 0 again", vector(0)) is None
+    assert cache.lookup(SCOPE, "question 9 again", vector(9))["answer"] == "answer 9"
+
+
+def test_new_index_version_drops_old_entries(cache):
+    cache.store(SCOPE, "What is the notice period?", vector(4), "30 days", "pdf")
+    newer = AnswerCache.scope("ns", 2.0)
+    assert cache.lookup(newer, "What is the notice period?", vector(4)) is None
+    assert SCOPE not in cache._vectors
+
+
+def test_key_terms():
+    assert key_terms("Fees in 2023, not 2024?") == ("2023", "2024", "not")
+    assert key_terms("Is clause 12.7 due on 01/02/2024?") == ("01/02/2024", "12.7")
+    assert key_terms("What is the notice period?") == ()
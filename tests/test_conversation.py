@@ -0,0 +1,67 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from conversation import ConversationMemory, is_follow_up
+
+
+@pytest.mark.parametrize("question", [
+    "What about clause 4.2?",
+    "And the notice period?",
+    "Does that also apply to subcontractors?",
+    "What are their payment terms?",
+    "Is it binding after termination?",
+    "How does the latter differ from the previous version?",
+    "Why?",
+])
+def test_follow_ups(question):
+    assert is_follow_up(question)
+
+
+@pytest.mark.parametrize("question", [
+    "What does clause 12 say about liability?",
+    "Is there a penalty for late delivery?",
+    "Which party pays the costs if the contract is terminated early?",
+    "How long is the warranty and what does it cover?",
+    "Are subcontractors also bound by the confidentiality clause?",
+])
+def test_standalone_questions(question):
+    assert not is_follow_up(question)
+
+
+def test_memory_stays_bounded():
+    memory = ConversationMemory(window_tokens=100, summary_tokens=20)
+    for turn in range(50):
+        memory.add_turn(f"Question {turn} about the contract?", "An answer " * 10)
+    assert len(memory.turns) < 50
+    assert memory
+
+
+def test_memory_keeps_the_question_as_asked(tmp_path, monkeypatch):
+    import embeddings
+    import vector_store
+    from bench_ingest_throughput import _hash_embeddings
+    from llm import LLMLimiter
+    from rag_chain import RAGChain
+    from stub_llm import StubChatModel
+
+    monkeypatch.setattr(embeddings, "_embeddings", _hash_embeddings())
+    monkeypatch.setattr(vector_store, "FAISS_INDEX_PATH", str(tmp_path))
+    chain = RAGChain("tests", llm=StubChatModel())
+    chain.limiter = LLMLimiter(requests_per_minute=None)
+    chain.answer_cache = None
+    memory = chain.new_memory()
+
+    rewrites = []
+    rewrite = chain.rewrite_question
+    monkeypatch.setattr(chain, "rewrite_question",
+                        lambda q, m=None: rewrites.append(rewrite(q, m)) or rewrites[-1])
+
+    chain.answer_question("What does clause 4.2 say about invoices?", memory=memory)
+    chain.answer_question("And what about delivery?", memory=memory)
+    assert rewrites[-1] != "And what about delivery?"
+    assert [q for q, _ in memory.turns] == [
+        "What does clause 4.2 say about invoices?", "And what about delivery?"
+    ]
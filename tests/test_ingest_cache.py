@@ -0,0 +1,40 @@
+import os
+import pytest
+from langchain.schema import Document
+from ingest_cache import IngestCache, fingerprint
+
+# Pages 2, 4 and 5 are blank, so iter_pages never yields them
+PAGES = [(1, "first page"), (3, "third page")]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return IngestCache(str(tmp_path))
+
+
+def test_pages_keep_the_real_page_count(cache):
+    fp = fingerprint("blank-pages")
+    assert list(cache.record_pages(fp, iter(PAGES), num_pages=lambda: 5)) == PAGES
+    assert cache.num_pages(fp) == 5
+
+    progress = []
+    assert list(cache.pages(fp, progress=lambda done, total: progress.append((done, total)))) == PAGES
+    assert progress == [(1, 5), (3, 5), (5, 5)]
+
+
+def test_chunks_round_trip(cache):
+    fp = fingerprint("chunks")
+    chunks = [Document(page_content=f"chunk {i}", metadata={"page": i}) for i in range(3)]
+    assert list(cache.record_chunks(fp, iter(chunks))) == chunks
+    assert [(c.page_content, c.metadata) for c in cache.chunks(fp)] == [
+        (c.page_content, c.metadata) for c in chunks
+    ]
+
+
+def test_abandoned_recording_leaves_nothing(cache, tmp_path):
+    fp = fingerprint("cancelled")
+    recording = cache.record_pages(fp, iter(PAGES), num_pages=lambda: 5)
+    next(recording)
+    recording.close()
+    assert not cache.has(fp, "pages")
+    assert os.listdir(tmp_path / fp["file"]) == []
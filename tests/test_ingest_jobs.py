@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_ingest_throughput import _hash_embeddings
+from synthetic_pdf import make_pdf
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    import embeddings
+    import vector_store
+    from ingest_cache import IngestCache
+    from ingest_jobs import IngestQueue
+
+    monkeypatch.setattr(embeddings, "_embeddings", _hash_embeddings())
+    monkeypatch.setattr(vector_store, "FAISS_INDEX_PATH", str(tmp_path / "indexes"))
+    queue = IngestQueue(max_workers=1)
+    queue.cache = IngestCache(str(tmp_path / "ingest_cache"))
+    return queue
+
+
+def wait(job, timeout: float = 60):
+    deadline = time.time() + timeout
+    while not job.finished:
+        assert time.time() < deadline, f"job {job.id} still {job.status}"
+        time.sleep(0.05)
+    return job
+
+
+def test_duplicate_upload_returns_active_or_indexed_job(queue):
+    pdf = make_pdf(3)
+    first = queue.submit("tests", "a.pdf", pdf)
+    assert queue.submit("tests", "a.pdf", pdf) is first or first.finished
+    wait(first)
+    assert first.status == "done"
+
+    again = queue.submit("tests", "a.pdf", pdf)
+    assert again.status == "done" and again.doc_id == first.doc_id
+
+
+def test_reupload_after_remove_reindexes(queue):
+    from vector_store import VectorStore
+
+    pdf = make_pdf(3)
+    first = wait(queue.submit("tests", "a.pdf", pdf))
+    VectorStore("tests").remove_document(first.doc_id)
+    assert VectorStore("tests").documents == {}
+
+    again = wait(queue.submit("tests", "a.pdf", pdf))
+    assert again is not first
+    assert again.status == "done"
+    assert again.doc_id in VectorStore("tests").documents
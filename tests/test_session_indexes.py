@@ -0,0 +1,33 @@
+import os
+import sys
+import time
+from index_cache import IndexCache, LoadedIndex
+from session_indexes import prune_session_indexes
+
+
+def test_prunes_only_expired_session_indexes(tmp_path):
+    for name in ("session-old", "session-new", "tenant-acme"):
+        (tmp_path / name).mkdir()
+    stale = time.time() - 7200
+    for name in ("session-old", "tenant-acme"):
+        os.utime(tmp_path / name, (stale, stale))
+
+    assert prune_session_indexes(ttl_s=3600, root=str(tmp_path)) == 1
+    assert sorted(os.listdir(tmp_path)) == ["session-new", "tenant-acme"]
+
+
+def test_pruning_does_not_import_the_index_stack(tmp_path):
+    import subprocess
+    code = ("import sys, session_indexes; session_indexes.prune_session_indexes(root=sys.argv[1]); "
+            "print(sorted(m for m in ('faiss', 'vector_store', 'index_cache') if m in sys.modules))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code, str(tmp_path)], cwd=root,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_index_cache_forgets_load_locks():
+    cache = IndexCache()
+    for n in range(20):
+        cache.get(f"session-{n}", LoadedIndex)
+    assert cache._load_locks == {}
@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+import pytest
+from langchain.schema import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_ingest_throughput import _hash_embeddings
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    import embeddings
+    import vector_store
+
+    monkeypatch.setattr(embeddings, "_embeddings", _hash_embeddings())
+    monkeypatch.setattr(vector_store, "FAISS_INDEX_PATH", str(tmp_path))
+    store = vector_store.VectorStore("tests")
+    store.add_document([Document(page_content=f"invoice terms clause {i}", metadata={"page": 1})
+                        for i in range(5)], name="existing")
+    return store
+
+
+def test_search_runs_while_a_document_is_ingested(store):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_chunks():
+        yield Document(page_content="delivery schedule", metadata={"page": 1})
+        started.set()
+        release.wait(10)  # Extraction of a long PDF still going on
+        yield Document(page_content="delivery penalties", metadata={"page": 2})
+
+    ingest = threading.Thread(target=store.add_document, args=(slow_chunks(),), kwargs={"name": "new"})
+    ingest.start()
+    try:
+        assert started.wait(10)
+        done = threading.Event()
+        existing = next(iter(store.list_documents()))
+
+        def read():
+            store.similarity_search("invoice terms")
+            store.get_chunk(existing, 0)
+            done.set()
+
+        threading.Thread(target=read, daemon=True).start()
+        # Neither may wait for the ingest to finish
+        assert done.wait(5)
+    finally:
+        release.set()
+        ingest.join()
+
+    assert {info["name"] for info in store.list_documents().values()} == {"existing", "new"}
+    new_id = next(d for d, info in store.list_documents().items() if info["name"] == "new")
+    assert store.get_chunk(new_id, 1).page_content == "delivery penalties"
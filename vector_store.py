@@ -1,141 +1,472 @@
 import os
-import shutil
+import re
 import gc
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain.schema import Document
+import json
+import time
+import uuid
+import asyncio
+import numpy as np
+from itertools import islice
+import metrics
+from embeddings import get_embeddings
+from index_cache import LoadedIndex, get_index_cache
+from ann_index import (
+    delete_ids,
+    metric_of,
+    prepare_vectors,
+    range_radius,
+    rebuild_if_needed,
+    similarities
+)
+from index_builder import IndexBuilder, adaptive_batch_size
+from index_storage import load_index, make_writable, read_manifest, save_index
+from lexical_index import LexicalIndex
 from config import (
-    FAISS_INDEX_PATH, 
-    SIMILARITY_THRESHOLD, 
+    FAISS_INDEX_PATH,
+    DEFAULT_NAMESPACE,
+    NAMESPACE_PATTERN,
+    SIMILARITY_THRESHOLD,
+    COSINE_THRESHOLD,
     TOP_K_RESULTS,
-    EMBEDDING_MODEL,
-    BATCH_SIZE
+    RANGE_SEARCH,
+    RANGE_MAX_RESULTS,
+    HYBRID_SEARCH,
+    HYBRID_CANDIDATES,
+    RRF_K,
+    BM25_MIN_SCORE
 )
 
+REGISTRY_FILE = "documents.json"
+TOUCH_INTERVAL_S = 60  # How often use refreshes an index directory's mtime (its TTL clock)
+
+EMBED_SECONDS = metrics.histogram("embed_seconds", "Embedding model calls, by kind (documents, query, queries).")
+CHUNKS_INDEXED = metrics.counter("chunks_indexed", "Chunks embedded and added to an index.")
+INDEX_UPDATE_SECONDS = metrics.histogram("index_update_seconds", "Index writes, by step (commit, save).")
+SEARCH_SECONDS = metrics.histogram("search_seconds", "Index search incl. score filtering, by mode (dense, hybrid).")
+SEARCH_RESULTS = metrics.histogram(
+    "search_results", "Chunks returned per query after filtering.", metrics.COUNT_BUCKETS
+)
+
+
+def valid_namespace(namespace: str) -> bool:
+    return re.fullmatch(NAMESPACE_PATTERN, namespace) is not None
+
+
+class IngestCancelled(Exception):
+    """Raised by ``add_document`` when its ``cancel_event`` is set."""
+
 
 class VectorStore:
-    def __init__(self):
-        """Initialize with smallest embedding model for low RAM."""
-        print(f"Loading embedding model: {EMBEDDING_MODEL}")
-        self.embeddings = SentenceTransformerEmbeddings(
-            model_name=EMBEDDING_MODEL,
-            model_kwargs={
-                'device': 'cpu',
-            },
-            encode_kwargs={
-                'batch_size': BATCH_SIZE,  # Process in small batches
-            }
-        )
-        self.vectorstore = None
-        print("✅ Embedding model loaded (CPU mode)")
-
-    def create_vectorstore(self, chunks: list[Document]):
-        """Create FAISS index with memory optimization."""
+    def __init__(self, namespace: str = DEFAULT_NAMESPACE):
+        """Attach to one namespaced index (per session or tenant).
+
+        The embedding model and loaded indexes are shared process-wide, so
+        creating a VectorStore is cheap.
+        """
+        if not valid_namespace(namespace):
+            raise ValueError(f"Invalid index namespace: {namespace!r}")
+        self.embeddings = get_embeddings()
+        self.namespace = namespace
+        self.index_path = os.path.join(FAISS_INDEX_PATH, namespace)
+        self.index_cache = get_index_cache()
+        self._touched_at = 0.0
+
+    @property
+    def vectorstore(self):
+        return self._loaded().vectorstore
+
+    @property
+    def documents(self) -> dict:
+        return self._loaded().documents
+
+    @property
+    def index_version(self) -> float:
+        """Changes every time this namespace's index is saved."""
+        return self._loaded().version
+
+    def _loaded(self) -> LoadedIndex:
+        """This namespace's index, from the in-memory LRU or disk on a miss."""
+        now = time.time()
+        if now - self._touched_at > TOUCH_INTERVAL_S and os.path.isdir(self.index_path):
+            # Keeps a session index in use from being pruned (see session_indexes.prune_session_indexes)
+            os.utime(self.index_path)
+            self._touched_at = now
+        return self.index_cache.get(self.index_path, self._read_from_disk)
+
+    def add_document(self, chunks, name: str = None, doc_id: str = None,
+                     metadata: dict = None, progress=None, cancel_event=None) -> str:
+        """Add one document's chunks to this namespace's index.
+
+        ``chunks`` may be a list or any iterable (e.g. the streaming ingest
+        pipeline); it is embedded in batches sized to available RAM, so
+        model activations are bounded by the batch. The document's vectors
+        (dim x 4 bytes per chunk) and chunk Documents are held until the end
+        and indexed in one call (see ``IndexBuilder``), as the index and
+        the unsaved chunk store would hold them anyway until the save. Only
+        the new chunks are embedded; existing vectors are kept. Re-adding an
+        existing ``doc_id`` replaces that document. Returns the doc id.
+
+        Chunks are read and embedded without the index lock; it is held
+        only to add them to the index and save it, so searches on this
+        namespace wait for that step, not the whole ingest.
+
+        ``progress(stage, chunks_embedded)`` reports "embedding" after each
+        batch and "indexing" once all chunks are embedded. Setting
+        ``cancel_event`` stops between batches with ``IngestCancelled`` and
+        leaves the index as it was.
+        """
+        doc_id = doc_id or uuid.uuid4().hex[:12]
+        print(f"Adding chunks to FAISS index (doc {doc_id})...")
         try:
-            print(f"Creating FAISS index with {len(chunks)} chunks...")
-
-            # Clear old index
-            if os.path.exists(FAISS_INDEX_PATH):
-                shutil.rmtree(FAISS_INDEX_PATH)
-                print("🗑️ Cleared old index")
-
-            # Process in batches to avoid memory spikes
-            print("📦 Processing chunks in batches...")
-            all_vectorstores = []
-            
-            for i in range(0, len(chunks), BATCH_SIZE):
-                batch = chunks[i:i + BATCH_SIZE]
-                print(f"  Batch {i//BATCH_SIZE + 1}/{(len(chunks)-1)//BATCH_SIZE + 1}")
-                
-                batch_vs = FAISS.from_documents(
-                    documents=batch,
-                    embedding=self.embeddings
-                )
-                all_vectorstores.append(batch_vs)
-                
-                # Clear memory after each batch
-                gc.collect()
-
-            # Merge all batches
-            print("🔗 Merging batches...")
-            self.vectorstore = all_vectorstores[0]
-            for vs in all_vectorstores[1:]:
-                self.vectorstore.merge_from(vs)
-            
-            # Save to disk
-            print("💾 Saving index...")
-            os.makedirs(FAISS_INDEX_PATH, exist_ok=True)
-            self.vectorstore.save_local(FAISS_INDEX_PATH)
-            
-            # Clear memory
-            gc.collect()
-            print("✅ FAISS index created successfully!")
-            
-            return self.vectorstore
+            # Embedding (and the extraction feeding ``chunks``) runs without the
+            # index lock, so searches on this namespace go on during a long ingest
+            batch_size = adaptive_batch_size()
+            builder = IndexBuilder(len(chunks) if hasattr(chunks, "__len__") else 0)
+            lexical_texts = []
+            print(f"📦 Embedding chunks in batches of {batch_size}...")
+            chunk_iter = iter(chunks)
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise IngestCancelled(f"Ingest of {name or doc_id} cancelled")
+                batch = list(islice(chunk_iter, batch_size))
+                if not batch:
+                    break
 
+                ids = []
+                for chunk in batch:
+                    chunk.metadata["doc_id"] = doc_id
+                    chunk.metadata["chunk_index"] = builder.count + len(ids)
+                    ids.append(f"{doc_id}:{chunk.metadata['chunk_index']}")
+
+                texts = [chunk.page_content for chunk in batch]
+                with EMBED_SECONDS.time(kind="documents"):
+                    vectors = self.embeddings.embed_documents(texts)
+                builder.add(ids, batch, vectors)
+                lexical_texts.extend(texts)
+                print(f"  Embedded {builder.count} chunks")
+                if progress is not None:
+                    progress("embedding", builder.count)
+
+            # Persist any newly cached chunk embeddings
+            if hasattr(self.embeddings, "cache"):
+                self.embeddings.cache.flush()
+                print(f"🗃️ Embedding cache stats: {self.embeddings.cache.stats()}")
         except Exception as e:
-            print(f"❌ Error creating vector store: {e}")
-            if os.path.exists(FAISS_INDEX_PATH):
-                shutil.rmtree(FAISS_INDEX_PATH)
+            print(f"❌ Error adding document: {e}")
             raise
 
-    def load_vectorstore(self):
-        """Load FAISS index from disk."""
+        if progress is not None:
+            progress("indexing", builder.count)
+        entry = self._loaded()
         try:
-            if not os.path.exists(FAISS_INDEX_PATH):
-                print("⚠️ No FAISS index found")
+            with entry.lock:
+                if entry.vectorstore is not None:
+                    make_writable(entry.vectorstore, self.index_path)
+                if doc_id in entry.documents:
+                    self._remove_locked(entry, doc_id)
+
+                chunk_ids = builder.ids
+                CHUNKS_INDEXED.inc(builder.count)
+                with INDEX_UPDATE_SECONDS.time(step="commit"):
+                    entry.vectorstore = builder.commit(entry.vectorstore, self.embeddings)
+                # BM25 positions follow the FAISS labels just added
+                entry.lexical.add(lexical_texts)
+
+                entry.documents[doc_id] = {
+                    **(metadata or {}),
+                    "name": name or doc_id,
+                    "num_chunks": len(chunk_ids),
+                    "chunk_ids": chunk_ids,
+                    "added_at": time.time(),
+                }
+
+                with INDEX_UPDATE_SECONDS.time(step="save"):
+                    self._save(entry)
+            del builder, lexical_texts
+            gc.collect()
+
+            # Index grew; re-measure it against the memory budget
+            self.index_cache.put(self.index_path, entry)
+            print(f"✅ Document added ({len(entry.documents)} in index)")
+            return doc_id
+
+        except Exception as e:
+            print(f"❌ Error adding document: {e}")
+            # Drop partial in-memory changes; the on-disk index is untouched
+            self.index_cache.invalidate(self.index_path)
+            raise
+
+    def remove_document(self, doc_id: str):
+        """Remove a document's vectors and registry entry."""
+        entry = self._loaded()
+        with entry.lock:
+            if doc_id not in entry.documents:
+                raise KeyError(f"Unknown document: {doc_id}")
+            make_writable(entry.vectorstore, self.index_path)
+            self._remove_locked(entry, doc_id)
+            if entry.vectorstore is not None:
+                rebuild_if_needed(entry.vectorstore)
+            self._save(entry)
+        self.index_cache.put(self.index_path, entry)
+
+    def _remove_locked(self, entry: LoadedIndex, doc_id: str):
+        info = entry.documents.pop(doc_id)
+        print(f"🗑️ Removing document {info['name']} ({info['num_chunks']} chunks)")
+        if entry.vectorstore is not None and info["chunk_ids"]:
+            entry.lexical.remove_positions(delete_ids(entry.vectorstore, info["chunk_ids"]))
+
+    def get_chunk(self, doc_id: str, chunk_index: int):
+        """Fetch a stored chunk (text + metadata) by its citation reference."""
+        entry = self._loaded()
+        # Under the lock: a save in progress reopens the chunk store's mmaps
+        with entry.lock:
+            if entry.vectorstore is None:
                 return None
-            
-            print("📂 Loading FAISS index...")
-            self.vectorstore = FAISS.load_local(
-                folder_path=FAISS_INDEX_PATH,
-                embeddings=self.embeddings,
-                allow_dangerous_deserialization=True
-            )
-            print("✅ Index loaded!")
-            return self.vectorstore
-            
+            chunk = entry.vectorstore.docstore.search(f"{doc_id}:{chunk_index}")
+        # Docstores return an error string for unknown ids
+        return chunk if not isinstance(chunk, str) else None
+
+    def list_documents(self) -> dict:
+        """Per-document metadata keyed by doc id."""
+        return dict(self.documents)
+
+    def _save(self, entry: LoadedIndex):
+        """Write the index and the document registry to disk."""
+        print("💾 Saving index...")
+        os.makedirs(self.index_path, exist_ok=True)
+        if entry.vectorstore is not None:
+            entry.lexical.save(self.index_path)
+            entry.version = save_index(self.index_path, entry.vectorstore)["updated_at"]
+        else:
+            entry.version = time.time()
+
+        # Write-then-rename so a crash never leaves a half-written registry
+        registry_path = os.path.join(self.index_path, REGISTRY_FILE)
+        with open(registry_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entry.documents, f, indent=2)
+        os.replace(registry_path + ".tmp", registry_path)
+        gc.collect()
+
+    def _read_from_disk(self) -> LoadedIndex:
+        """Cache loader: map the saved index and read the registry, or start empty."""
+        if read_manifest(self.index_path) is None and not os.path.exists(
+            os.path.join(self.index_path, "index.pkl")
+        ):
+            print(f"⚠️ No FAISS index found for '{self.namespace}'")
+            return LoadedIndex()
+
+        try:
+            print(f"📂 Loading FAISS index '{self.namespace}'...")
+            vectorstore = load_index(self.index_path, self.embeddings)
+            if vectorstore is None:
+                return LoadedIndex()
+
+            documents = {}
+            registry_path = os.path.join(self.index_path, REGISTRY_FILE)
+            if os.path.exists(registry_path):
+                with open(registry_path, encoding="utf-8") as f:
+                    documents = json.load(f)
+            lexical = LexicalIndex(self.index_path)
+            if len(lexical) != len(vectorstore.docstore):
+                # Saved before BM25 existed (or interrupted mid-save): rebuild from the chunks
+                print("🔤 Building BM25 index for existing chunks...")
+                lexical = LexicalIndex.build(vectorstore.docstore)
+                lexical.save(self.index_path)
+
+            print(f"✅ Index loaded! ({len(documents)} documents)")
+            version = read_manifest(self.index_path)["updated_at"]
+            return LoadedIndex(vectorstore, documents, version, lexical)
+
         except Exception as e:
             print(f"❌ Error loading index: {e}")
-            return None
+            return LoadedIndex()
+
+    def load_vectorstore(self):
+        """Make sure the index is resident; returns the FAISS store or None."""
+        return self.vectorstore
 
-    def similarity_search(self, query: str, k: int = None):
-        """Search with score filtering."""
+    def embed_query(self, query: str) -> list[float]:
+        """Embed a query once so callers can reuse the vector."""
+        with EMBED_SECONDS.time(kind="query"):
+            return self.embeddings.embed_query(query)
+
+    def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        """Embed many queries in one model batch (bypasses the chunk embedding cache)."""
+        model = self.embeddings.embeddings if hasattr(self.embeddings, "cache") else self.embeddings
+        with EMBED_SECONDS.time(kind="queries"):
+            return model.embed_documents(queries)
+
+    def similarity_search(self, query: str, k: int = None, embedding: list[float] = None,
+                          doc_ids: list[str] = None):
+        """Search with score filtering.
+
+        Pass a precomputed ``embedding`` to skip re-embedding the query, and
+        ``doc_ids`` to restrict results to those documents. With
+        ``RANGE_SEARCH``, ``k`` only caps how many above-threshold chunks
+        come back.
+        """
         if k is None:
-            k = TOP_K_RESULTS
-            
-        if not self.vectorstore:
-            self.load_vectorstore()
-            if not self.vectorstore:
-                return []
+            k = RANGE_MAX_RESULTS if RANGE_SEARCH else TOP_K_RESULTS
+
+        entry = self._loaded()
+        if entry.vectorstore is None:
+            return []
 
         try:
-            # Get results with scores
-            results = self.vectorstore.similarity_search_with_score(query, k=k)
-            
-            # FAISS returns distance (lower is better)
-            # Convert to similarity and filter
-            filtered = []
-            for doc, distance in results:
-                # Convert distance to similarity (0-1 scale)
-                similarity = 1 / (1 + distance)
-                if similarity >= SIMILARITY_THRESHOLD:
-                    filtered.append((doc, similarity))
-            
-            print(f"🔍 Found {len(filtered)}/{len(results)} relevant results")
+            if embedding is None:
+                embedding = self.embed_query(query)
+
+            mode = "hybrid" if HYBRID_SEARCH else "dense"
+            with SEARCH_SECONDS.time(mode=mode), entry.lock:
+                if HYBRID_SEARCH:
+                    dense = self._dense_candidates(entry, [embedding], HYBRID_CANDIDATES, doc_ids)[0]
+                    filtered = self._fuse(entry, query, dense, k, doc_ids)
+                else:
+                    results = self._dense_candidates(entry, [embedding], k, doc_ids, above_threshold=True)[0]
+                    docstore = entry.vectorstore.docstore
+                    filtered = [(docstore.document_at(p), s) for p, s in results]
+
+            SEARCH_RESULTS.observe(len(filtered), mode=mode)
+            print(f"🔍 {mode.capitalize()} search: {len(filtered)} relevant results")
             return filtered
 
         except Exception as e:
             print(f"❌ Search error: {e}")
             return []
 
+    def similarity_search_batch(self, embeddings: list[list[float]], k: int = None,
+                                doc_ids: list[str] = None, queries: list[str] = None) -> list[list]:
+        """Score-filtered results for many query vectors with one FAISS call.
+
+        Returns one result list per query, in order. Pass the query
+        ``queries`` texts to fuse in BM25 results when ``HYBRID_SEARCH`` is
+        on. Unlike ``similarity_search``, errors are raised to the caller.
+        """
+        if k is None:
+            k = RANGE_MAX_RESULTS if RANGE_SEARCH else TOP_K_RESULTS
+
+        entry = self._loaded()
+        if entry.vectorstore is None or not len(embeddings):
+            return [[] for _ in embeddings]
+
+        hybrid = HYBRID_SEARCH and queries is not None
+        mode = "hybrid" if hybrid else "dense"
+        with SEARCH_SECONDS.time(mode=mode), entry.lock:
+            if hybrid:
+                dense = self._dense_candidates(entry, embeddings, HYBRID_CANDIDATES, doc_ids)
+                batch = [self._fuse(entry, q, d, k, doc_ids) for q, d in zip(queries, dense)]
+            else:
+                dense = self._dense_candidates(entry, embeddings, k, doc_ids, above_threshold=True)
+                docstore = entry.vectorstore.docstore
+                batch = [[(docstore.document_at(p), s) for p, s in results] for results in dense]
+
+        for results in batch:
+            SEARCH_RESULTS.observe(len(results), mode=mode)
+        print(f"🔍 Batch search: {sum(map(len, batch))} relevant results for {len(batch)} queries")
+        return batch
+
+    @staticmethod
+    def _threshold(index) -> float:
+        """Minimum similarity for ``index``'s metric."""
+        return COSINE_THRESHOLD if metric_of(index) == "cosine" else SIMILARITY_THRESHOLD
+
+    def _dense_candidates(self, entry: LoadedIndex, embeddings, k: int,
+                          doc_ids: list[str] = None, above_threshold: bool = False) -> list[list]:
+        """Top ``k`` ``(position, similarity)`` per query vector, best first.
+
+        All queries go through one FAISS call; scores are converted and
+        thresholded as arrays. With ``above_threshold`` only chunks clearing
+        the metric's threshold are kept, and with ``RANGE_SEARCH`` a range
+        search finds all of them (no over-fetch needed for ``doc_ids``).
+        """
+        index = entry.vectorstore.index
+        queries = prepare_vectors(embeddings, metric_of(index))
+        threshold = self._threshold(index)
+
+        if above_threshold and RANGE_SEARCH:
+            lims, raw, labels = index.range_search(queries, range_radius(index, threshold))
+            scores = similarities(index, raw)
+            rows = [(labels[a:b], scores[a:b]) for a, b in zip(lims[:-1], lims[1:])]
+        else:
+            # Filtering by document happens after search, so over-fetch when scoped
+            fetch_k = max(20, k * 10) if doc_ids else k
+            raw, labels = index.search(queries, max(1, min(fetch_k, index.ntotal)))
+            scores = similarities(index, raw)
+            keep = labels >= 0
+            if above_threshold:
+                keep &= scores >= threshold
+            rows = [(l[m], s[m]) for l, s, m in zip(labels, scores, keep)]
+
+        candidates = []
+        for labels, scores in rows:
+            order = np.argsort(-scores, kind="stable")
+            labels, scores = labels[order], scores[order]
+            if doc_ids:
+                kept = self._in_documents(entry, labels, set(doc_ids), k)
+                labels, scores = labels[kept], scores[kept]
+            candidates.append(list(zip(labels[:k].tolist(), scores[:k].tolist())))
+        return candidates
+
+    @staticmethod
+    def _in_documents(entry: LoadedIndex, positions: np.ndarray, wanted: set, k: int) -> list[int]:
+        """Indices of the first ``k`` ``positions`` whose chunk belongs to ``wanted``."""
+        docstore = entry.vectorstore.docstore
+        kept = []
+        for n, position in enumerate(positions):
+            if docstore.document_at(int(position)).metadata.get("doc_id") in wanted:
+                kept.append(n)
+                if len(kept) == k:
+                    break
+        return kept
+
+    def _fuse(self, entry: LoadedIndex, query: str, dense: list, k: int,
+              doc_ids: list[str] = None) -> list:
+        """Reciprocal rank fusion of dense and BM25 candidates.
+
+        A chunk is relevant if it clears the dense similarity threshold or
+        ``BM25_MIN_SCORE`` (lexical), so exact identifiers that embed poorly
+        still count. Scores are the fused score relative to the best
+        possible (ranked first by both), in (0, 1].
+        """
+        docstore = entry.vectorstore.docstore
+        threshold = self._threshold(entry.vectorstore.index)
+        wanted = set(doc_ids or ())
+        lexical = entry.lexical.search(query, HYBRID_CANDIDATES * (10 if wanted else 1))
+        if wanted:
+            lexical = [
+                (p, s) for p, s in lexical
+                if docstore.document_at(p).metadata.get("doc_id") in wanted
+            ][:HYBRID_CANDIDATES]
+
+        fused = {}
+        relevant = set()
+        for rank, (position, similarity) in enumerate(dense, start=1):
+            fused[position] = fused.get(position, 0.0) + 1 / (RRF_K + rank)
+            if similarity >= threshold:
+                relevant.add(position)
+        for rank, (position, score) in enumerate(lexical, start=1):
+            fused[position] = fused.get(position, 0.0) + 1 / (RRF_K + rank)
+            if score >= BM25_MIN_SCORE:
+                relevant.add(position)
+
+        best = 2 / (RRF_K + 1)
+        ranked = sorted(relevant, key=lambda p: -fused[p])[:k]
+        return [(docstore.document_at(p), fused[p] / best) for p in ranked]
+
+    async def aembed_query(self, query: str) -> list[float]:
+        """``embed_query`` on a worker thread, so the event loop keeps serving."""
+        return await asyncio.to_thread(self.embed_query, query)
+
+    async def asimilarity_search(self, query: str, k: int = None, embedding: list[float] = None,
+                                 doc_ids: list[str] = None):
+        """``similarity_search`` on a worker thread (embedding and FAISS are CPU-bound)."""
+        return await asyncio.to_thread(self.similarity_search, query, k, embedding, doc_ids)
+
     def get_retriever(self):
         """Get retriever for RAG chain."""
-        if not self.vectorstore:
-            self.load_vectorstore()
-        
-        if self.vectorstore:
-            return self.vectorstore.as_retriever(
+        vectorstore = self.vectorstore
+        if vectorstore:
+            return vectorstore.as_retriever(
                 search_kwargs={"k": TOP_K_RESULTS}
             )
         return None
\ No newline at end of file